@@ -5,65 +5,9 @@ import pandas as pd
 import numpy as np
 
 # FUNCTIONS NEEDED IN THIS DATABASE
-def BerrCalc(Bvalues, DataQuality):
-    # determine the error class as defined by Dymond & Smith, 1980
-    # class I: estimated precision < 2% or < 1 cm^3 mol^-1, whichever is greater
-    # class II: estimated precision < 10% or < 15 cm^3 mol^-1, whichever is greater
-    # class III: estimated precision > 10% or > 15 cm^3 mol^-1, whichever is greater
-    if (DataQuality == 1):
-        percentError = 0.02;
-        cm3mol1Error = 1;
-    elif (DataQuality == 2):
-        percentError = 0.10;
-        cm3mol1Error = 15;
-    elif (DataQuality == 3):
-        percentError = 0.20;
-        cm3mol1Error = 30;
-    # initialize B error vector
-    BerrReturn = np.zeros(len(Bvalues));
-    
-    # determine the error and assign it to the vector, element by element
-    for ii in range(len(Bvalues)):
-        percentEstimate = abs(Bvalues[ii])*percentError;
-        cm3mol1Estimate = cm3mol1Error;
-        BerrReturn[ii] = max(percentEstimate, cm3mol1Estimate);
-    return BerrReturn
-
-def Bcalc(T, sigma, epsilon, mu, calcMethod):
-    # Calculate the second coefficient of the virial equation of state using
-    # Lennard Jones / Stockmayer parameters
-    # T in Kelvin, sigma in Angstroms, epsilon in Kelvin, mu in Debyes
-    # Only one method (calcMethod = "Inf") works with confidence right now, and
-    # that method involves a full integration of the intermolecular potential 
-    
-    # basic definitions needed in this function
-    N_A = 6.022140E23 # Avagadro's number
-    k_B = 1.38064852E-23 # Boltzmann constant
-    epsilon_0 = 8.8541878176E-12 # permittivity of free space 
-    pi = np.pi # pi
-    
-    if (calcMethod == "Inf"):
-        # use the full integration of the potential to infinity (or in this case 100 angstroms)
-        # This can apply to either a Lennard-Jones fluid or a Stockmayer fluid
-        # However, using the Stockmayer expression with a permanent dipole results in erraneously low values of 
-        # B, so for now, mu = 0.0
-        # 
-        # Set up a grid from 0 to 100 Angstroms
-        radius = np.linspace(0.0001, 100.0001, 10000)
-        # non-dimensionalize the grid by the collision diameter, sigma
-        r_star = np.array(radius/sigma)
-        # nondimensionalize the dipole moment by the well depth and collision diameter
-        # take the maximum value of the nondimensional dipole moment, defined by Kee (pp 496, 2003)
-        # the electric constant must be in here to be truly nondimensional, but then disagrees with tabulated results 
-        # The 1.0E-18 is to convert to statC, the 1.0E7 is convert to ergs, and the 1.0E-8 is to convert to cm 
-        delta_max = (((mu*1.0E-18)**2.0))/(2.0*epsilon*k_B*(1.0E7)*((sigma*1.0E-8)**3.0))
-        constantConvert = 1.0/(4*pi*epsilon_0*8.998E9) # divide delta_max by this number to convert for statC
-        # as a sanity check, this should give something close to unity 
-
-        # create the integral 
-        integral_expression = np.array((r_star**2.0)*(np.exp(-4.0*(r_star**(-12.0) - r_star**(-6.0) - (delta_max*constantConvert)*(r_star**(-3.0)))*(epsilon/T)) -1))
-        B_result = 0.6022140*(-2.0*pi*(sigma**3.0))*np.trapz(integral_expression, x=r_star)
-    return B_result
+# (kept in virialFunctions.py so they can be used without loading the data below)
+from virialFunctions import *
+from virialStore import VirialStore, databaseBlocks
 
 # to do: function that determines virial coefficient from PVT data...?
 
@@ -3126,5 +3070,9 @@ dataT.append(np.array([398.15, 398.15]))
 dataB.append(np.array([-72.0, -72.0]))
 dataBerr.append(np.array([0.3, 0.3]))
 
-
-
+# COMPILE THE DATA INTO A COLUMNAR STORE
+# contiguous T, B and Berr columns with integer-coded species, references and data classes;
+# species and datasets are views of the columns (the lists above are kept as they are);
+# the compilation of every dataset is parsed from the comments above its entry
+dataStore = VirialStore.fromLists(speciesName, dataRef, dataRefID, dataClass, dataT, dataB, dataBerr, \
+    compilation=[block['compilation'] for block in databaseBlocks()])
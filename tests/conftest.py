@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+# The modules of the database sit at the top of the repository rather than in a
+# package, so the tests import them from there
+
+# Headers for Python
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
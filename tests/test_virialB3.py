@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the third virial coefficient of virialB3.py
+
+# Headers for Python
+import numpy as np
+import pytest
+from virialB3 import B3DipoleTruncation, B3LogSinhc, B3Sphere, B3TableBuild, B3TableEval, B3calc, \
+    B3starCalc, B3starInterp, B3starRemainder
+
+def test_literature():
+    # C*(T*) of the Lennard-Jones fluid, Hirschfelder, Curtiss and Bird Table I-C
+    np.testing.assert_allclose(B3starCalc(np.array([1.0, 2.0])), [0.4297, 0.4371], atol=1.0E-4)
+
+def test_table():
+    table = B3TableBuild()
+    Tstar = np.array([0.35, 0.9, 1.0, 2.0, 17.0, 600.0])
+    Cstar = B3starCalc(Tstar)
+    # the error bound of the table is relative to 1 + |C*|
+    assert np.all(np.abs(B3TableEval(table, Tstar) - Cstar) <= table['error']*(1.0 + np.abs(Cstar)))
+
+def test_shapes():
+    assert np.ndim(B3calc(300.0, 3.7, 95.0, 0.0, "Quad")) == 0
+    assert B3calc(np.full((2, 2), 300.0), 3.7, 95.0, 0.0, "Quad").shape == (2, 2)
+    np.testing.assert_allclose(B3starCalc(np.array([1.0, 2.0]), 0.0), B3starCalc(np.array([1.0, 2.0])))
+    with pytest.raises(ValueError):
+        B3calc(300.0, 3.7, 95.0, 0.0, "Inf")
+
+def test_dipole_range():
+    # polar points beyond delta*/T* = 0.25, or outside 0.3 < T* < 30, raise ValueError
+    # by every method, before any table is needed
+    for Tstar, deltaStar in [(1.0, 0.3), (0.2, 0.01), (40.0, 1.0)]:
+        with pytest.raises(ValueError, match='only computed'):
+            B3starCalc(np.array([Tstar]), np.array([deltaStar]))
+        with pytest.raises(ValueError, match='only computed'):
+            B3starInterp(np.array([Tstar]), np.array([deltaStar]))
+    # water at room temperature is far outside the range
+    with pytest.raises(ValueError):
+        B3calc(300.0, 2.65, 380.0, 1.85, "Quad")
+    # the Lennard-Jones C* has no such limit
+    assert np.isfinite(B3starCalc(np.array([0.2, 40.0]))).all()
+
+def test_truncation():
+    # the terms the truncated C* leaves out, averaged over all orientations, stay below
+    # B3DipoleTruncation at the edge of the range, and fall off as (delta*/T*)^4 or
+    # faster, so the O(delta*^2) and three-body terms of B3starCalc are complete
+    remainder = B3starRemainder(2.0, 0.5)
+    assert abs(remainder) < B3DipoleTruncation*(1.0 + abs(B3starCalc(np.array([2.0]), np.array([0.5]))[0] + remainder))
+    assert abs(remainder/B3starRemainder(2.0, 0.25)) > 12.0
+
+def test_orientations():
+    directions, weights = B3Sphere(6)
+    np.testing.assert_allclose(np.sum(weights), 1.0)
+    np.testing.assert_allclose(np.sum(directions**2.0, axis=1), 1.0)
+    np.testing.assert_allclose(np.dot(weights, directions), 0.0, atol=1.0E-14)
+    np.testing.assert_allclose(np.dot(weights, directions[:, 2]**2.0), 1.0/3.0)
+    y = np.array([1.0E-6, 0.1, 1.0, 10.0, 100.0])
+    np.testing.assert_allclose(B3LogSinhc(y), np.log(np.sinh(y)/y), rtol=1.0E-10, atol=1.0E-15)
+    assert np.isfinite(B3LogSinhc(np.array([1.0E4])))
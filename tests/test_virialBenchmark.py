@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the benchmark runner of virialBenchmark.py, with the timed runs kept short
+
+# Headers for Python
+import json
+from virialBenchmark import benchmarkCases, benchmarkTime, compareBenchmarks, runBenchmarks
+
+def test_time():
+    calls = []
+    seconds, number = benchmarkTime(lambda: calls.append(1), minTime=0.01, repeat=2)
+    assert seconds > 0.0
+    assert number >= 10
+    assert len(calls) >= 2*number
+
+def test_cases():
+    names = [name for name, function in benchmarkCases('Series')]
+    assert names == ['Bcalc_Series_10', 'Bcalc_Series_100', 'Bcalc_Series_1000', 'Bcalc_Series_10000', \
+        'Bcalc_Series_100000']
+    assert benchmarkCases('no such benchmark') == []
+
+def test_run_and_compare():
+    current = runBenchmarks('Bcalc_Table_10', minTime=0.001, repeat=1)
+    assert sorted(current['results']) == ['Bcalc_Table_10', 'Bcalc_Table_100', 'Bcalc_Table_1000', \
+        'Bcalc_Table_10000', 'Bcalc_Table_100000']
+    json.dumps(current)
+    baseline = {'results': {'Bcalc_Table_10': {'seconds': 0.5*current['results']['Bcalc_Table_10']['seconds']}, \
+        'Bcalc_Table_100': {'seconds': 2.0*current['results']['Bcalc_Table_100']['seconds']}, \
+        'Bcalc_Inf_10': {'seconds': 1.0}}}
+    comparison = compareBenchmarks(current, baseline, threshold=0.25)
+    assert [(name, regressed) for name, before, after, ratio, regressed in comparison] == \
+        [('Bcalc_Table_10', True), ('Bcalc_Table_100', False)]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the species file exporter of virialExport.py
+
+# Headers for Python
+import io
+import os
+import numpy as np
+from virialExport import exportDirectory, exportFileName, exportSpecies
+from virialStore import databaseSpecies, load
+
+def readText(path):
+    with io.open(path, encoding='ascii', newline='') as exported:
+        return exported.read()
+
+def test_files(tmp_path):
+    directory = str(tmp_path)
+    store = load(databaseSpecies())
+    written = exportSpecies(store, directory, 'allvirialData.txt')
+    assert len(written) == len(store.speciesNames) + 1
+    for name in store.speciesNames:
+        # the same text np.savetxt has always written, and the files in the repository
+        reference = io.BytesIO()
+        np.savetxt(reference, np.column_stack(store.speciesData(name)), fmt='%10.5f')
+        text = readText(os.path.join(directory, exportFileName(name)))
+        assert text == reference.getvalue().decode('ascii')
+        assert text == readText(os.path.join(exportDirectory, exportFileName(name)))
+    combined = readText(os.path.join(directory, 'allvirialData.txt')).splitlines()
+    assert len(combined) == len(store)
+    assert combined[0].split()[0] == store.speciesNames[0]
+
+def test_unchanged_files_are_kept(tmp_path):
+    directory = str(tmp_path)
+    store = load(['Ar', 'CO'])
+    assert len(exportSpecies(store, directory)) == 2
+    assert exportSpecies(store, directory) == []
+    path = os.path.join(directory, exportFileName('Ar'))
+    with io.open(path, 'a', encoding='ascii') as exported:
+        exported.write(u'edited\n')
+    assert exportSpecies(store, directory) == [path]
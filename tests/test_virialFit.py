@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the fitters of virialFit.py on synthetic data and on the database
+
+# Headers for Python
+import numpy as np
+from virialFit import gelmanRubin, lsqFit, mcmcFit, mvnString
+from virialFunctions import Bcalc, BcalcGradient
+from virialParameters import parameterRegistry
+
+# temperatures [K] of the synthetic data and their uncertainty [cm^3/mol]
+testT = np.linspace(150.0, 900.0, 30)
+testBerr = np.ones(30)
+
+def test_gradient():
+    # the analytic derivatives of B against central differences, with and without a dipole
+    for mu in (0.0, 1.2):
+        B, dBdsigma, dBdepsilon = BcalcGradient(testT, 3.0, 300.0, mu)
+        np.testing.assert_allclose(B, Bcalc(testT, 3.0, 300.0, mu, "Table"), rtol=1.0E-12)
+        np.testing.assert_allclose(dBdsigma, (Bcalc(testT, 3.0 + 1.0E-5, 300.0, mu, "Table") - \
+            Bcalc(testT, 3.0 - 1.0E-5, 300.0, mu, "Table"))/2.0E-5, rtol=1.0E-6, atol=1.0E-6)
+        np.testing.assert_allclose(dBdepsilon, (Bcalc(testT, 3.0, 300.0 + 1.0E-3, mu, "Table") - \
+            Bcalc(testT, 3.0, 300.0 - 1.0E-3, mu, "Table"))/2.0E-3, rtol=1.0E-6, atol=1.0E-8)
+
+def test_lsq_recovers_parameters():
+    fit = lsqFit('synthetic', data=(testT, Bcalc(testT, 3.6, 150.0, 0.0, "Table"), testBerr))
+    np.testing.assert_allclose(fit['mean'], [3.6, 150.0], rtol=1.0E-8)
+    assert fit['chi2'] < 1.0E-12
+    fit = lsqFit('synthetic', data=(testT, Bcalc(testT, 3.0, 300.0, 1.2, "Table"), testBerr), mu=1.2)
+    np.testing.assert_allclose(fit['mean'], [3.0, 300.0], rtol=1.0E-8)
+
+def test_lsq_database():
+    # the least-squares fit of CH4 lands on the MCMC estimate of the notebook
+    fit = lsqFit('CH4')
+    np.testing.assert_allclose(fit['mean'], parameterRegistry.get('CH4', 'MCMC')['mean'], rtol=1.0E-3)
+    assert mvnString(fit).startswith('np.random.multivariate_normal((3.862, 146.2), ')
+
+def test_mcmc_agrees_with_lsq():
+    random = np.random.RandomState(0)
+    data = (testT, Bcalc(testT, 3.6, 150.0, 0.0, "Table") + random.standard_normal(testT.size), testBerr)
+    lsq = lsqFit('synthetic', data=data)
+    mcmc = mcmcFit('synthetic', data=data, nSteps=3000, nBurn=1000, processes=1)
+    std = np.sqrt(np.diag(lsq['cov']))
+    assert np.all(np.abs(mcmc['mean'] - lsq['mean']) < 0.5*std)
+    np.testing.assert_allclose(np.sqrt(np.diag(mcmc['cov'])), std, rtol=0.2)
+    assert np.all(mcmc['Rhat'] < 1.05)
+    assert all(0.1 < rate < 0.7 for rate in mcmc['acceptance'])
+    # the same seed gives the same samples
+    again = mcmcFit('synthetic', data=data, nSteps=3000, nBurn=1000, processes=1)
+    np.testing.assert_array_equal(again['samples'], mcmc['samples'])
+
+def test_gelman_rubin():
+    random = np.random.RandomState(1)
+    assert np.all(gelmanRubin(random.standard_normal((4, 2000, 2))) < 1.01)
+    shifted = random.standard_normal((4, 2000, 2)) + np.arange(4)[:, np.newaxis, np.newaxis]
+    assert np.all(gelmanRubin(shifted) > 1.5)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the second virial coefficient engines of virialFunctions.py
+
+# Headers for Python
+import warnings
+import numpy as np
+import pytest
+from virialFunctions import Bcalc, BcalcBatch, BcalcCache, BcalcTableBound, BerrCalc, BstarCalc, BstarQuad, \
+    BstarSeries
+
+# temperatures [K] and Lennard-Jones parameters (about those of N2) the engines are compared at
+testT = np.array([150.0, 300.0, 600.0, 1200.0])
+testSigma = 3.7
+testEpsilon = 95.0
+
+def test_methods_agree():
+    # "Quad", "Table" and "Series" all give the integral to infinity, "Inf" stops at
+    # 100 Angstroms; BcalcTableBound covers that difference
+    B_inf = Bcalc(testT, testSigma, testEpsilon, 0.0, "Inf")
+    B_quad = Bcalc(testT, testSigma, testEpsilon, 0.0, "Quad")
+    B_table = Bcalc(testT, testSigma, testEpsilon, 0.0, "Table")
+    B_series = Bcalc(testT, testSigma, testEpsilon, 0.0, "Series")
+    np.testing.assert_allclose(B_table, B_series, rtol=1.0E-9, atol=1.0E-9)
+    np.testing.assert_allclose(B_quad, B_series, rtol=1.0E-9, atol=1.0E-9)
+    bound = BcalcTableBound(testT, testSigma, testEpsilon)
+    assert np.all(np.abs(B_table - B_inf) <= bound)
+    # the bound is tight: nearly all of it is the tail "Inf" leaves out
+    assert np.all(np.abs(B_table - B_inf) > 0.9*bound)
+
+def test_dipole_methods_agree():
+    B_inf = Bcalc(testT, 2.6, 400.0, 1.8, "Inf")
+    B_quad = Bcalc(testT, 2.6, 400.0, 1.8, "Quad")
+    B_table = Bcalc(testT, 2.6, 400.0, 1.8, "Table")
+    np.testing.assert_allclose(B_table, B_quad, rtol=1.0E-8)
+    np.testing.assert_allclose(B_inf, B_quad, rtol=1.0E-4)
+
+def test_shapes():
+    assert np.ndim(Bcalc(300.0, testSigma, testEpsilon, 0.0, "Table")) == 0
+    assert Bcalc(np.ones((2, 3))*300.0, testSigma, testEpsilon, 0.0, "Table").shape == (2, 3)
+    B_batch = BcalcBatch(testT, np.array([testSigma, 3.0]), np.array([testEpsilon, 120.0]), 0.0, "Table")
+    assert B_batch.shape == (2, testT.size)
+    np.testing.assert_allclose(B_batch[1], Bcalc(testT, 3.0, 120.0, 0.0, "Table"), rtol=1.0E-12)
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        Bcalc(testT, testSigma, testEpsilon, 0.0, "Simpson")
+    with pytest.raises(ValueError):
+        Bcalc(testT, 2.6, 400.0, 1.8, "Series")
+
+def test_series_literature():
+    # B*(T*) of the Lennard-Jones fluid, Hirschfelder, Curtiss and Bird Table I-B
+    np.testing.assert_allclose(BstarSeries(np.array([1.0, 2.0, 10.0])), [-2.5381, -0.6276, 0.4609], atol=1.0E-4)
+    np.testing.assert_allclose(BstarSeries(np.array([0.7, 5.0])), BstarCalc(np.array([0.7, 5.0])), rtol=1.0E-9)
+
+def test_quad_warns():
+    # BstarQuad warns, and still returns its last estimate, when it runs out of iterations
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        Bstar, error, evaluations = BstarQuad(np.array([1.0]), 0.0, 0.0, 1.0E-14, maxIterations=1)
+    assert any(issubclass(warning.category, RuntimeWarning) for warning in caught)
+    assert abs(Bstar[0] - BstarSeries(np.array([1.0]))[0]) < 1.0E-5
+
+def test_cache():
+    cache = BcalcCache(maxSize=6)
+    first = cache(testT, testSigma, testEpsilon, 0.0, "Table")
+    np.testing.assert_array_equal(cache(testT, testSigma, testEpsilon, 0.0, "Table"), first)
+    assert cache.stats()['hits'] == testT.size
+    cache(testT, 3.0, 120.0, 0.0, "Table")
+    assert cache.stats()['size'] == 6
+    assert cache.stats()['evictions'] == 2
+
+def test_Berr():
+    # class I: 2% or 1 cm^3/mol, class II: 10% or 15 cm^3/mol, whichever is greater
+    np.testing.assert_allclose(BerrCalc(np.array([-100.0, -20.0]), 1), [2.0, 1.0])
+    np.testing.assert_allclose(BerrCalc(np.array([-100.0, -20.0]), np.array([2, 1])), [15.0, 1.0])
+    with pytest.raises(ValueError):
+        BerrCalc(np.array([-100.0]), 7)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the dataset index of virialIndex.py against a scan of every dataset
+
+# Headers for Python
+import io
+import shutil
+import numpy as np
+import pytest
+import virialStore
+from virialIndex import DatasetIndex, indexKeys, loadIndex
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / 'databaseExp.py')
+    shutil.copy(virialStore.databasePath, path)
+    return path
+
+def scan(store, **filters):
+    # dataset numbers matching filters, one dataset at a time
+    matching = []
+    for k in range(store.nDatasets()):
+        info = store.datasetInfo(k)
+        info['compilation'] = info['compilationIndex']
+        info['reference'] = info['ref']
+        if all(info[kind] == key for kind, key in filters.items()):
+            matching.append(k)
+    return matching
+
+def test_lookup(source, tmp_path):
+    index = loadIndex(str(tmp_path / 'snapshot'), source)
+    store = index.store
+    assert index.keys('species') == sorted(store.speciesNames)
+    for kind in indexKeys:
+        assert sum(index.lookup(kind, key).size for key in index.keys(kind)) == store.nDatasets()
+    for name in store.speciesNames:
+        assert index.lookup('species', name).tolist() == scan(store, species=name)
+        T, B, Berr = index.points(index.lookup('species', name))
+        np.testing.assert_array_equal(B, store.speciesData(name)[1])
+    for year in index.keys('compilationYear'):
+        assert index.select(species='CH4', compilationYear=year).tolist() == \
+            scan(store, species='CH4', compilationYear=year)
+    assert index.select(species='CH4', dataClass='no such class').size == 0
+    assert index.lookup('species', 'XeF6').size == 0
+    with pytest.raises(KeyError):
+        index.lookup('author', 'Michels')
+
+def test_points_of_scattered_datasets(source, tmp_path):
+    index = loadIndex(str(tmp_path / 'snapshot'), source)
+    datasets = index.select(dataClass='class I')[::3]
+    T, B, Berr = index.points(datasets)
+    np.testing.assert_array_equal(B, np.concatenate([index.store.dataset(k)[1] for k in datasets]))
+
+def test_saved_and_rebuilt(source, tmp_path):
+    path = str(tmp_path / 'snapshot')
+    built = loadIndex(path, source)
+    loaded = loadIndex(path, source, rebuild=False)
+    assert loaded.runs == built.runs
+    np.testing.assert_array_equal(loaded.datasets, built.datasets)
+    # an edit of the source makes both the snapshot and the index stale
+    with io.open(source, 'a', encoding='utf-8') as databaseFile:
+        databaseFile.write(u'\n# edited\n')
+    with pytest.raises(ValueError):
+        loadIndex(path, source, rebuild=False)
+    assert loadIndex(path, source).runs == built.runs
+    assert isinstance(loadIndex(path, source, rebuild=False), DatasetIndex)
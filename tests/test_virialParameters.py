@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the parameter set registry of virialParameters.py
+
+# Headers for Python
+import numpy as np
+import pytest
+from virialFunctions import Bcalc
+from virialParameters import ParameterRegistry, parameterEntries, parameterRegistry
+
+def test_get():
+    entry = parameterRegistry.get('CH4', 'MCMC')
+    assert (entry['sigma'], entry['epsilon'], entry['mu']) == (3.861, 146.2, 0.0)
+    np.testing.assert_array_equal(entry['mean'], [3.861, 146.2])
+    assert entry['cov'].shape == (2, 2)
+    assert np.all(np.isnan(parameterRegistry.get('H2O', 'MCMC')['cov']))
+    with pytest.raises(KeyError):
+        parameterRegistry.get('C2H5OH', 'CHEMKIN')
+
+def test_select():
+    assert len(parameterRegistry) == len(parameterEntries)
+    assert [parameterRegistry.source[kk] for kk in parameterRegistry.select('CH4')] == ['MCMC', 'CHEMKIN']
+    assert len(parameterRegistry.select(['CH4', 'N2'], 'CHEMKIN')) == 2
+    assert len(parameterRegistry.select(source='MCMC')) == sum(entry[1] == 'MCMC' for entry in parameterEntries)
+
+def test_evaluate():
+    T = np.array([300.0, 600.0])
+    B = parameterRegistry.evaluate(T, 'N2')
+    assert B.shape == (2, 2)
+    np.testing.assert_allclose(B[1], Bcalc(T, 3.621, 97.53, 0.0, "Table"), rtol=1.0E-12)
+    grids = {'CO2': np.array([250.0, 350.0, 450.0]), 'Ar': np.array([100.0])}
+    B = parameterRegistry.evaluate(grids, source='MCMC')
+    assert sorted(B) == [('Ar', 'MCMC'), ('CO2', 'MCMC')]
+    np.testing.assert_allclose(B[('CO2', 'MCMC')], Bcalc(grids['CO2'], 4.316, 200.2, 0.0, "Table"), rtol=1.0E-12)
+
+def test_invalid_entries():
+    with pytest.raises(ValueError):
+        ParameterRegistry([("CH4", "guess", 3.8, 150.0, 0.0, None)])
+    with pytest.raises(ValueError):
+        ParameterRegistry([("CH4", "MCMC", 3.8, 150.0, 0.0, None)]*2)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the figure renderer of virialPlots.py
+
+# Headers for Python
+import os
+import numpy as np
+import pytest
+from virialParameters import parameterRegistry
+from virialPlots import plotFingerprint, plotFormula, plotJobs, plotTemperatures, renderPlots
+
+def test_jobs():
+    jobs = plotJobs(['CH4', 'H2O'])
+    assert [job['fileName'] for job in jobs] == ['CH4_B2.png', 'CH4_MVN.png', 'H2O_B2.png']
+    B2 = jobs[0]
+    assert B2['labels'] == ['MCMC estimate', 'CHEMKIN database']
+    np.testing.assert_array_equal(B2['arrays'][3], plotTemperatures('CH4'))
+    np.testing.assert_allclose(B2['arrays'][4], parameterRegistry.evaluate(plotTemperatures('CH4'), 'CH4', 'MCMC')[0])
+    assert jobs[1]['arrays'][0].shape == (1000,)
+    assert plotFormula('C2H5OH') == 'C$_2$H$_5$OH'
+
+def test_fingerprint():
+    job = plotJobs(['Ar'])[0]
+    fingerprint = plotFingerprint(job)
+    assert plotFingerprint(plotJobs(['Ar'])[0]) == fingerprint
+    job['arrays'][1] = job['arrays'][1] + 1.0E-9
+    assert plotFingerprint(job) != fingerprint
+
+def test_render(tmp_path):
+    pytest.importorskip('matplotlib')
+    directory = str(tmp_path)
+    assert sorted(renderPlots(['Ar'], directory, processes=1)) == ['Ar_B2.png', 'Ar_MVN.png']
+    assert renderPlots(['Ar'], directory, processes=1) == []
+    os.remove(os.path.join(directory, 'Ar_MVN.png'))
+    assert renderPlots(['Ar'], directory, processes=1) == ['Ar_MVN.png']
+    assert sorted(renderPlots(['Ar'], directory, processes=2, force=True)) == ['Ar_B2.png', 'Ar_MVN.png']
+    with open(os.path.join(directory, 'Ar_B2.png'), 'rb') as figure:
+        assert figure.read(8) == b'\x89PNG\r\n\x1a\n'
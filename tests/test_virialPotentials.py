@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the potential models of virialPotentials.py
+
+# Headers for Python
+import numpy as np
+import pytest
+from virialFunctions import Bcalc, BstarQuad, BstarSeries
+from virialPotentials import potentialRegistry
+
+# temperatures [K] and (sigma, epsilon) the models are evaluated at
+testT = np.array([120.0, 300.0, 900.0])
+testSigma = 3.5
+testEpsilon = 120.0
+
+def test_reduced_form():
+    # every model has u*(1) = 0 and a well 1 deep
+    r_star = np.linspace(0.9, 3.0, 200001)
+    for potential in [potentialRegistry.get(name) for name in potentialRegistry.names()]:
+        u_star = potential.reduced(r_star)
+        if (potential.name != "SquareWell"):
+            np.testing.assert_allclose(potential.reduced(np.array(1.0)), 0.0, atol=1.0E-9)
+        np.testing.assert_allclose(np.min(u_star), -1.0, atol=1.0E-6)
+
+def test_limits_are_Lennard_Jones():
+    # Mie with n = 12 and Kihara with no core are the Lennard-Jones potential
+    B = Bcalc(testT, testSigma, testEpsilon, 0.0, "Series")
+    for potential in [potentialRegistry.get('Mie', n=12.0), potentialRegistry.get('Kihara', a=0.0)]:
+        np.testing.assert_allclose(Bcalc(testT, testSigma, testEpsilon, 0.0, "Quad", potential=potential), \
+            B, rtol=1.0E-8, atol=1.0E-8)
+
+def test_square_well():
+    potential = potentialRegistry.get('SquareWell', wellRange=1.6)
+    Tstar = np.array([0.8, 1.5, 4.0])
+    Bstar, error, evaluations = BstarQuad(Tstar, 0.0, 0.0, 1.0E-10, potential=potential)
+    np.testing.assert_allclose(Bstar, potential.BstarCalc(Tstar), rtol=1.0E-6)
+    for calcMethod in ("Inf", "Quad", "Table"):
+        np.testing.assert_allclose(Bcalc(testT, testSigma, testEpsilon, 0.0, calcMethod, potential=potential), \
+            (2.0/3.0)*np.pi*0.6022140*testSigma**3.0*potential.BstarCalc(testT/testEpsilon), rtol=1.0E-12)
+
+def test_table():
+    potential = potentialRegistry.get('Mie', n=14.0)
+    B_table = Bcalc(testT, testSigma, testEpsilon, 0.0, "Table", potential=potential)
+    np.testing.assert_allclose(B_table, Bcalc(testT, testSigma, testEpsilon, 0.0, "Quad", potential=potential), \
+        rtol=1.0E-7)
+    # a harder repulsion makes the molecules smaller, so B is larger at high T
+    assert B_table[-1] > Bcalc(testT[-1], testSigma, testEpsilon, 0.0, "Series")
+    Bstar, dBstar = potential.Bstar(np.array([1.0, 2000.0]), derivative=True)
+    step = 1.0E-4*np.array([1.0, 2000.0])
+    np.testing.assert_allclose(dBstar, (potential.Bstar(np.array([1.0, 2000.0]) + step) - \
+        potential.Bstar(np.array([1.0, 2000.0]) - step))/(2.0*step), rtol=1.0E-5)
+
+def test_registry():
+    assert potentialRegistry.get('Kihara', a=0.2) is potentialRegistry.get('Kihara', a=0.2)
+    assert potentialRegistry.get('Mie') is potentialRegistry.get('Mie', n=12.0)
+    assert potentialRegistry.get('LJ').Bstar(np.array([2.0])) == pytest.approx(BstarSeries(np.array([2.0]))[0])
+    with pytest.raises(KeyError):
+        potentialRegistry.get('Morse')
+    with pytest.raises(ValueError):
+        potentialRegistry.get('Mie', n=5.0)
+    with pytest.raises(ValueError):
+        potentialRegistry.get('Kihara', sigma=1.0)
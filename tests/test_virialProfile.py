@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the profiling hooks of virialProfile.py
+
+# Headers for Python
+import json
+import multiprocessing
+import numpy as np
+import pytest
+from virialFunctions import Bcalc
+from virialProfile import Profiler, profileMap, profiled, profiler
+
+@profiled('squareValue', suffix='label')
+def squareValue(value, label='plain'):
+    return value*value
+
+def poolTask(value):
+    # a task for the pool, recording a stage and a counter in its worker
+    profiler.count('poolTask values', value)
+    return squareValue(value, 'pool')
+
+@pytest.fixture
+def enabled():
+    profiler.reset()
+    profiler.enable()
+    yield profiler
+    profiler.disable()
+    profiler.reset()
+
+def test_disabled():
+    profiler.reset()
+    assert squareValue(3) == 9
+    profiler.count('poolTask values', 4)
+    with profiler.stage('testStage'):
+        pass
+    assert profiler.report() == {'stages': {}, 'counters': {}, 'events': 0, 'dropped': 0}
+
+def test_stages(enabled):
+    # an argument left at its default adds nothing to the stage name
+    squareValue(2)
+    squareValue(3, label='other')
+    squareValue(4, 'other')
+    with profiler.stage('testStage', species='CO2'):
+        profiler.count('testCounter', 5)
+    report = profiler.report()
+    assert report['stages']['squareValue']['calls'] == 1
+    assert report['stages']['squareValue other']['calls'] == 2
+    assert report['stages']['testStage']['calls'] == 1
+    assert report['counters'] == {'testCounter': 5}
+    trace = profiler.chromeTrace()['traceEvents']
+    assert [event['name'] for event in trace if event['ph'] == 'X'] == \
+        ['squareValue', 'squareValue other', 'squareValue other', 'testStage']
+    assert [event['args'] for event in trace if event['name'] == 'testStage'] == [{'species': 'CO2'}]
+    json.dumps(profiler.chromeTrace(), default=str)
+
+def test_Bcalc_counts(enabled):
+    Bcalc(np.array([300.0, 400.0]), 3.7, 95.0, 0.0, "Inf")
+    assert profiler.report()['counters']['Bcalc Inf integrand evaluations'] > 0
+
+def test_merge_and_limit():
+    first = Profiler(maxEvents=3)
+    first.enable()
+    for ii in range(2):
+        first.record('a', 0.0, 1.0)
+    second = Profiler()
+    second.record('a', 0.0, 3.0)
+    second.record('b', 0.0, 0.5)
+    second.count('c', 2)
+    second.enable()
+    second.count('c', 2)
+    first.merge(second.data())
+    assert first.stages['a'] == [3, 5.0, 1.0, 3.0]
+    assert first.counters == {'c': 2}
+    assert len(first.events) == 3
+    assert first.dropped == 1
+
+def test_pool(enabled):
+    pool = multiprocessing.Pool(2)
+    try:
+        assert profileMap(pool, poolTask, [1, 2, 3]) == [1, 4, 9]
+        assert list(profileMap(pool, poolTask, [4], lazy=True)) == [16]
+    finally:
+        pool.close()
+        pool.join()
+    report = profiler.report()
+    assert report['stages']['squareValue pool']['calls'] == 4
+    assert report['counters']['poolTask values'] == 10
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the temperature-range queries of virialQuery.py against masks over the store
+
+# Headers for Python
+import numpy as np
+import pytest
+from virialQuery import TemperatureIndex
+from virialStore import load
+
+@pytest.fixture(scope='module')
+def store():
+    return load(['CO2', 'CH4', 'N2'])
+
+def expected(store, species, Tmin, Tmax, BerrMax=None, dataClass=None):
+    # positions of the matching points in the store, sorted by T (stable within equal T)
+    T = store.T
+    mask = (store.speciesCode == store.speciesIndex(species)) & (T >= Tmin) & (T <= Tmax)
+    if BerrMax is not None:
+        mask &= (store.Berr < BerrMax)
+    if dataClass is not None:
+        mask &= (np.asarray(store.classNames)[store.classCode] == dataClass)
+    positions = np.flatnonzero(mask)
+    return positions[np.argsort(T[positions], kind='mergesort')]
+
+def test_range(store):
+    index = TemperatureIndex.fromStore(store)
+    for species, Tmin, Tmax in [('CO2', 300.0, 400.0), ('CH4', 0.0, 1.0E4), ('N2', 273.15, 273.15), ('CO2', 400.0, 300.0)]:
+        query = index.query(species, Tmin, Tmax)
+        positions = expected(store, species, Tmin, Tmax)
+        np.testing.assert_array_equal(query.positions(), positions)
+        assert len(query) == positions.size
+        T, B, Berr = query.data()
+        np.testing.assert_array_equal(B, store.B[positions])
+        assert np.all(np.diff(T) >= 0.0)
+    assert len(index.query('N2')) == store.speciesData('N2')[0].size
+    assert len(index.query('N2', Tmin=300.0)) == expected(store, 'N2', 300.0, np.inf).size
+
+def test_filters(store):
+    index = TemperatureIndex.fromStore(store)
+    query = index.query('CO2', 250.0, 500.0).where(BerrMax=5.0)
+    np.testing.assert_array_equal(query.positions(), expected(store, 'CO2', 250.0, 500.0, BerrMax=5.0))
+    query = query.where(dataClass='class I')
+    np.testing.assert_array_equal(query.positions(), expected(store, 'CO2', 250.0, 500.0, 5.0, 'class I'))
+    datasets = query.datasets()
+    assert all(store.datasetInfo(k)['species'] == 'CO2' for k in datasets)
+    reference = store.datasetInfo(datasets[0])['ref']
+    filtered = query.where(reference=[reference])
+    assert len(filtered) > 0
+    assert all(store.references[code] == reference for code in filtered.column('referenceCode'))
+    assert len(query.where(reference='no such reference')) == 0
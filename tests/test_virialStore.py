@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the columnar store, the lazy loader and the snapshot of virialStore.py,
+# run on a copy of databaseExp.py so that it can be edited
+
+# Headers for Python
+import io
+import os
+import shutil
+import numpy as np
+import pytest
+import virialStore
+from virialStore import buildSnapshot, databaseSpecies, load, loadSnapshot
+
+# a B value of CH4 (the first in the file), and what the tests change it to
+testOldValue = '-54.07'
+testNewValue = '-154.07'
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / 'databaseExp.py')
+    shutil.copy(virialStore.databasePath, path)
+    return path
+
+def editSource(path):
+    # change one B value of the source in place; the size changes too, so the edit
+    # shows in the stamp even within the resolution of the modification time
+    with io.open(path, encoding='utf-8') as databaseFile:
+        text = databaseFile.read()
+    with io.open(path, 'w', encoding='utf-8') as databaseFile:
+        databaseFile.write(text.replace(testOldValue, testNewValue, 1))
+
+def assertStoresEqual(store, other):
+    assert store.speciesNames == other.speciesNames
+    assert store.references == other.references
+    assert store.nDatasets() == other.nDatasets()
+    for column in virialStore.snapshotColumns:
+        np.testing.assert_array_equal(getattr(store, column), getattr(other, column))
+
+def test_load(source):
+    store = load('CH4', source)
+    T, B, Berr = store.speciesData('CH4')
+    assert T.size == B.size == Berr.size > 0
+    assert float(testOldValue) in B
+    assert np.all(Berr > 0.0)
+    with pytest.raises(KeyError):
+        load('XeF6', source)
+
+def test_reload_after_edit(source):
+    assert float(testOldValue) in load('CH4', source).speciesData('CH4')[1]
+    editSource(source)
+    B = load('CH4', source).speciesData('CH4')[1]
+    assert float(testNewValue) in B
+    assert float(testOldValue) not in B
+
+def test_snapshot_round_trip(source, tmp_path):
+    path = buildSnapshot(str(tmp_path / 'snapshot'), source)
+    assertStoresEqual(loadSnapshot(path, source), load(databaseSpecies(source), source))
+
+def test_snapshot_stale(source, tmp_path):
+    path = buildSnapshot(str(tmp_path / 'snapshot'), source)
+    editSource(source)
+    with pytest.raises(ValueError, match='stale'):
+        loadSnapshot(path, source)
+    # skipping the check still loads the old data
+    assert float(testOldValue) in loadSnapshot(path, None).speciesData('CH4')[1]
+    rebuilt = loadSnapshot(path, source, rebuild=True)
+    assert float(testNewValue) in rebuilt.speciesData('CH4')[1]
+    assertStoresEqual(rebuilt, load(databaseSpecies(source), source))
+
+def test_snapshot_needs_source(tmp_path):
+    with pytest.raises(ValueError):
+        loadSnapshot(str(tmp_path / 'snapshot'), None, rebuild=True)
+    with pytest.raises(ValueError):
+        buildSnapshot(str(tmp_path / 'snapshot'), None)
+    with pytest.raises(ValueError, match='no snapshot'):
+        loadSnapshot(str(tmp_path / 'snapshot'), virialStore.databasePath)
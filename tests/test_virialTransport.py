@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the CHEMKIN transport file reader and writer of virialTransport.py
+
+# Headers for Python
+import io
+import numpy as np
+import pytest
+from virialFunctions import Bcalc
+from virialTransport import transportBcalc, transportEntries, transportParse, transportReplace, writeTransport
+
+# a small transport file: keywords, a comment line, three entries (one with a comment)
+# and a line of another species of the mechanism
+testTransport = u'''TRANSPORT
+! species  geometry  epsilon    sigma       mu    alpha   zrot
+AR               0   136.500    3.330    0.000    0.000    0.000
+CH4              2   141.400    3.746    0.000    2.600   13.000 ! GRI-Mech
+H2O              2   572.400    2.605    1.844    0.000    4.000
+OH               1    80.000    2.750    0.000    0.000    0.000
+END
+'''
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / 'tran.dat')
+    with io.open(path, 'w', encoding='utf-8', newline='') as transportFile:
+        transportFile.write(testTransport)
+    return path
+
+def fieldEnds(line):
+    # the column every field of an entry ends at
+    data = line.partition('!')[0]
+    return [index + 1 for index in range(len(data)) if (data[index] != ' ') and \
+        ((index + 1 == len(data)) or (data[index + 1] == ' '))]
+
+def test_parse():
+    entry = transportParse('CH4   2   141.400    3.746    0.000    2.600   13.000 ! GRI-Mech')
+    assert entry['name'] == 'CH4'
+    assert entry['geometry'] == 2
+    assert (entry['epsilon'], entry['sigma'], entry['zrot']) == (141.4, 3.746, 13.0)
+    assert entry['comment'] == 'GRI-Mech'
+    assert transportParse('! comment only') is None
+    assert transportParse('END') is None
+    with pytest.raises(ValueError, match='line 7'):
+        transportParse('CH4   2   141.400    3.746', 7)
+
+def test_replace_keeps_columns():
+    line = 'CH4              2   141.400    3.746    0.000    2.600   13.000 ! GRI-Mech'
+    replaced = transportReplace(line, {'sigma': 3.81234, 'epsilon': 150.0})
+    assert fieldEnds(replaced) == fieldEnds(line)
+    assert replaced.endswith('! GRI-Mech')
+    entry = transportParse(replaced)
+    assert (entry['sigma'], entry['epsilon'], entry['mu'], entry['zrot']) == (3.812, 150.0, 0.0, 13.0)
+    # a value wider than its field pushes only that field to the right
+    wide = transportReplace(line, {'epsilon': 123456.0})
+    assert transportParse(wide)['epsilon'] == 123456.0
+    assert fieldEnds(wide)[3:] == [end + len(wide) - len(line) for end in fieldEnds(line)[3:]]
+
+def test_write(source, tmp_path):
+    destination = str(tmp_path / 'updated.dat')
+    changed = writeTransport(source, destination, {'CH4': (3.8, 150.0), 'Ar': {'mean': (3.4, 120.0)}}, \
+        speciesNames=['Ar', 'CH4', 'H2O'], note='fitted')
+    assert sorted(changed) == ['Ar', 'CH4']
+    with io.open(destination, encoding='utf-8', newline='') as transportFile:
+        lines = transportFile.read().split('\n')
+    original = testTransport.split('\n')
+    assert len(lines) == len(original)
+    for line, old in zip(lines, original):
+        if line.startswith(('AR', 'CH4')):
+            assert fieldEnds(line) == fieldEnds(old)
+            assert line.endswith('fitted')
+        else:
+            assert line == old
+    entries = dict((entry['name'], entry) for entry in transportEntries(destination))
+    assert (entries['CH4']['sigma'], entries['CH4']['epsilon']) == (3.8, 150.0)
+    assert entries['CH4']['comment'] == 'GRI-Mech; fitted'
+
+def test_Bcalc(source):
+    T = np.array([300.0, 600.0])
+    names, B = transportBcalc(source, T, chunkSize=2)
+    assert names == ['AR', 'CH4', 'H2O', 'OH']
+    assert B.shape == (4, 2)
+    np.testing.assert_allclose(B[1], Bcalc(T, 3.746, 141.4, 0.0, "Table"), rtol=1.0E-12)
+    names, B_dipole = transportBcalc(source, T, useDipole=True)
+    np.testing.assert_allclose(B_dipole[2], Bcalc(T, 2.605, 572.4, 1.844, "Table"), rtol=1.0E-12)
+    assert np.all(B_dipole[2] < B[2])
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the uncertainty bands of virialUncertainty.py
+
+# Headers for Python
+import numpy as np
+from virialFunctions import Bcalc
+from virialUncertainty import linearizedBands, propagateBands, quantileMerge, quantileSummary, quantileValues
+
+# percentiles the quantile summaries are checked at
+testPercentiles = (1.0, 2.5, 25.0, 50.0, 75.0, 97.5, 99.0)
+# a (sigma, epsilon) fit of CH4 and its covariance
+testMean = np.array([3.75, 148.0])
+testCov = np.array([[1.0E-4, -2.0E-3], [-2.0E-3, 1.0]])
+
+def rankError(values, estimates, percentiles):
+    # largest distance, as a fraction of the samples, between the rank of every estimate
+    # in its column of values and the percentile it estimates
+    ranks = np.array([[np.mean(values[:, column] < estimates[kk, column]) for column in range(values.shape[1])] \
+        for kk in range(len(percentiles))])
+    return np.max(np.abs(ranks - np.asarray(percentiles)[:, np.newaxis]/100.0))
+
+def test_small_summaries_are_exact():
+    random = np.random.RandomState(0)
+    values = random.standard_normal((300, 2))
+    summary = quantileMerge(quantileSummary(values[:100], 1000), quantileSummary(values[100:], 1000), 1000)
+    np.testing.assert_array_equal(summary[0], np.sort(values, axis=0))
+    np.testing.assert_array_equal(summary[1], np.ones(300))
+
+def test_merge_matches_percentiles():
+    # 40,000 samples of three differently shaped distributions merged in blocks of
+    # 2,500 into summaries of 400 points stay within a few 1/400 of the exact ranks
+    random = np.random.RandomState(1)
+    values = np.column_stack((random.standard_normal(40000), random.exponential(size=40000), \
+        random.uniform(size=40000)**3.0))
+    summary = None
+    for start in range(0, values.shape[0], 2500):
+        block = quantileSummary(values[start:start+2500], 400)
+        summary = block if summary is None else quantileMerge(summary, block, 400)
+    assert summary[0].shape == (400, 3)
+    np.testing.assert_allclose(np.sum(summary[1]), values.shape[0])
+    estimates = quantileValues(summary, testPercentiles)
+    assert rankError(values, estimates, testPercentiles) < 2.0/400
+    np.testing.assert_allclose(estimates, np.percentile(values, testPercentiles, axis=0), rtol=0.05, atol=0.01)
+
+def test_bands():
+    T = np.array([200.0, 400.0, 800.0])
+    sampled = propagateBands(testMean, testCov, T, nSamples=20000, percentiles=(15.87, 50.0, 84.13), \
+        blockSize=3000, summarySize=1000)
+    linearized = linearizedBands(testMean, testCov, T)
+    B = Bcalc(T, testMean[0], testMean[1], 0.0, "Table")
+    np.testing.assert_allclose(linearized['mean'], B, rtol=1.0E-12)
+    np.testing.assert_allclose(sampled['bands'][1], B, rtol=1.0E-2, atol=0.05)
+    np.testing.assert_allclose(sampled['std'], linearized['std'], rtol=0.05)
+    np.testing.assert_allclose(0.5*(sampled['bands'][2] - sampled['bands'][0]), linearized['std'], rtol=0.05)
+    # the same seed gives the same bands, in one process or several
+    again = propagateBands(testMean, testCov, T, nSamples=20000, percentiles=(15.87, 50.0, 84.13), \
+        blockSize=3000, summarySize=1000, processes=2)
+    np.testing.assert_allclose(again['bands'], sampled['bands'], rtol=1.0E-12)
@@ -0,0 +1,596 @@
+# -*- coding: utf-8 -*-
+
+# Third virial coefficient B3(T) of Lennard-Jones and Stockmayer fluids, next to Bcalc
+# In reduced form B3 = b0^2*C*(T*, delta*), b0 = (2/3)*pi*N_A*sigma^3 as for B, and
+#     C* = -6 int int int f(a)*f(b)*f(c)*a*b*c da db dc
+# over the triangles of sides a, b, c (reduced distances, |a - b| <= c <= a + b), f the
+# Mayer function of a pair. With h(r) = r*f(r) and G(s) = int_0^s h, the inner integral
+# over c is G(a + b) - G(|a - b|), which leaves a double integral over (a, b): B3starCalc
+# evaluates it on a fixed product of Gauss-Legendre panels (the tail beyond B3TailStart
+# in t = 1/r*), all pairs of nodes at once, with G from the same panels.
+# A Stockmayer pair is taken with the dipole-dipole energy averaged over the orientations
+# of the two molecules (dipoleMayer, as for B), which is exact to O(delta*^2); the leading
+# three-body term of the orientations, (delta*/T*)^3*K(T*), is added (B3starTriplet) and
+# the terms of O(delta*^4) beyond the pair averages are left out. Both depend on delta*
+# only through delta*/T*, and so do the terms left out, which grow as (delta*/T*)^4:
+# polar C* is only computed where B3starRemainder, the full orientation average of the
+# three-body Mayer product, shows them to be small (see B3DipoleCouplingRange).
+# The direct integral costs milliseconds per point, so B3calc interpolates tables of C*
+# in ln(T*) (and delta*/T*) by default. They are built once, over a pool of processes (see
+# B3TableBuild), and kept next to this file for later sessions.
+#
+#     from virialB3 import B3calc
+#     B3 = B3calc(T, sigma, epsilon, mu, "Table")      # cm^6/mol^2
+#
+# Usage: python virialB3.py [--processes N] [--dipole] [--check]
+# builds (or rebuilds) the tables and prints their error bounds; --check measures the
+# truncation of the Stockmayer C* along the edge of its range
+
+# Headers for Python
+import argparse
+import multiprocessing
+import os
+import numpy as np
+from virialFunctions import BstarCalc, BstarDipoleTableClenshaw, BstarInterp, BstarTableClenshaw, deltaCalc, \
+    dipoleMayer
+from virialProfile import profileMap, profiled, profiler
+
+# radial panels of the (a, b) integrals of B3starCalc in r*: three over the core, ten
+# over the well and eight more out to B3TailStart, B3PanelOrder Gauss-Legendre nodes each;
+# beyond B3TailStart they run over t = 1/r* on B3TailOrder nodes
+B3TailStart = 5.0
+B3PanelEdges = np.concatenate((np.linspace(0.0, 0.6, 4)[:-1], np.linspace(0.6, 1.6, 11)[:-1], \
+    np.linspace(1.6, B3TailStart, 9)))
+B3PanelOrder = 12
+B3TailOrder = 16
+# panels on which G(s) = int_0^s h is interpolated, finer than those of the (a, b)
+# integrals as G is needed at every a + b and |a - b|: in r* up to B3TailStart and in
+# t = 1/r* beyond it, B3CumulativeOrder nodes each
+B3CumulativeEdges = np.concatenate((np.array([0.0]), np.linspace(0.5, 2.5, 41), np.linspace(2.5, B3TailStart, 6)[1:]))
+B3CumulativeTailEdges = np.linspace(0.0, 1.0/B3TailStart, 5)
+B3CumulativeOrder = 12
+# nodes and weights of the panels above, computed on first use
+B3Geometry = None
+
+# reduced temperature range and layout of the tabulated C*: Chebyshev polynomials in
+# ln(T*), and delta*/T* for the Stockmayer table, on equally spaced pieces, of
+# C*/(1 - B*)^3 with the Lennard-Jones B*; -C* grows with (1 - B*)^3 at low T*, and the
+# ratio stays between -0.3 and 2; outside them B3starCalc is used
+B3TableRange = (0.3, 1000.0)
+B3TablePieces = 8
+B3TableDegree = 12
+# ranges of T* and delta*/T* over which the Stockmayer C* is computed at all, and
+# tabulated: B3starRemainder puts the terms of O(delta*^4) left out below
+# B3DipoleTruncation relative to 1 + |C*| there (at most 6.8E-3, near T* = 0.9 where C*
+# changes sign; python virialB3.py --check measures them at B3DipoleCheckTstar along the
+# upper edge). They grow as (delta*/T*)^4, fastest around T* = 1 and again at high T*,
+# where the molecules come closer, so beyond these ranges B3calc raises ValueError
+# rather than return them
+B3DipoleTstarRange = (0.3, 30.0)
+B3DipoleCouplingRange = (0.0, 0.25)
+B3DipoleTruncation = 1.0E-2
+B3DipoleCheckTstar = (0.3, 0.4, 0.5, 0.7, 0.8, 0.9, 1.0, 1.2, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0)
+B3DipoleTablePieces = (6, 2)
+B3DipoleTableDegree = (12, 8)
+# quadrature of B3starRemainder: the sides a, b from molecule 1 on B3RemainderOrder
+# Gauss-Legendre nodes per panel of B3RemainderEdges (and in t = 1/r* beyond), the third
+# side on as many per piece of its range split at B3RemainderSideEdges, and the dipoles of
+# molecules 1 and 2 on a product rule of B3RemainderOrientations nodes in cos(theta) by
+# twice as many in phi (that of molecule 3 is averaged exactly); B3RemainderChunk
+# triangles are evaluated together
+B3RemainderEdges = np.array([0.0, 0.7, 0.85, 1.0, 1.2, 1.6, 2.2, 3.0, B3TailStart])
+B3RemainderSideEdges = np.array([0.8, 0.95, 1.1, 1.4, 2.0, 3.0])
+B3RemainderOrder = 6
+B3RemainderOrientations = 6
+B3RemainderChunk = 64
+# files the tables are kept in once built; bump B3TableVersion when the way C* is
+# computed changes, so that older files are rebuilt
+B3TablePath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'virialB3Table.npz')
+B3DipoleTablePath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'virialB3DipoleTable.npz')
+B3TableVersion = 1
+# built or loaded on first use, then shared
+B3Table = None
+B3DipoleTable = None
+# reduced temperatures handed to a worker at a time while building a table
+B3BuildChunk = 4
+
+def B3Panels(edges, order):
+    # Gauss-Legendre nodes and weights of every panel between consecutive edges, each
+    # of shape (panels, order)
+    nodes, weights = np.polynomial.legendre.leggauss(order)
+    half = 0.5*np.diff(edges)[:, np.newaxis]
+    return 0.5*(edges[1:] + edges[:-1])[:, np.newaxis] + half*nodes, half*weights
+
+def B3Locate(edges, order, points):
+    # For every point, the panel it falls in and the weights of the values at the
+    # panel's order Gauss-Legendre nodes giving the integral of their interpolating
+    # polynomial from the lower edge of the panel to the point, shape (points, order)
+    nodes = np.polynomial.legendre.leggauss(order)[0]
+    piece = np.clip(np.searchsorted(edges, points) - 1, 0, edges.size - 2)
+    half = 0.5*(edges[piece+1] - edges[piece])
+    z = np.clip((points - edges[piece])/half - 1.0, -1.0, 1.0)
+    # integrals from -1 to z of the Legendre polynomials, then of the Lagrange ones
+    integrals = np.zeros((points.size, order))
+    for kk in range(order):
+        unit = np.zeros(order)
+        unit[kk] = 1.0
+        integrals[:, kk] = np.polynomial.legendre.legval(z, np.polynomial.legendre.legint(unit, lbnd=-1.0))
+    inverse = np.linalg.inv(np.polynomial.legendre.legvander(nodes, order - 1))
+    return piece, half[:, np.newaxis]*np.dot(integrals, inverse)
+
+def B3Points(points):
+    # points at which G is needed, located on the panels of G: those up to B3TailStart
+    # in r* (inner, with their panels and weights) and those beyond in t = 1/r* (tail)
+    inner = np.nonzero(points <= B3TailStart)[0]
+    tail = np.nonzero(points > B3TailStart)[0]
+    innerPiece, innerWeights = B3Locate(B3CumulativeEdges, B3CumulativeOrder, points[inner])
+    tailPiece, tailWeights = B3Locate(B3CumulativeTailEdges, B3CumulativeOrder, 1.0/points[tail])
+    return {'s': points, 'inner': inner, 'tail': tail, 'innerPiece': innerPiece, 'innerWeights': innerWeights, \
+        'tailPiece': tailPiece, 'tailWeights': tailWeights}
+
+def B3GeometryBuild():
+    # Nodes of B3starCalc: the radial nodes r with weights w, and the panels of G
+    # For the pair term, the pairs of nodes a <= b (first, second) with the weight
+    # w_a*w_b of both orders, and G at a + b and |a - b| ('pairPoints'). For the
+    # three-body term the sides are ordered instead, a <= b <= c, with b = a + u over
+    # every pair of nodes (a, u), and G at b and a + b ('tripletPoints').
+    r, w = B3Panels(B3PanelEdges, B3PanelOrder)
+    t, tw = B3Panels(np.array([0.0, 1.0/B3TailStart]), B3TailOrder)
+    r = np.concatenate((r.ravel(), 1.0/t.ravel()))
+    w = np.concatenate((w.ravel(), (tw/(t**2.0)).ravel()))
+    first, second = np.triu_indices(r.size)
+    pairWeights = w[first]*w[second]*np.where(first == second, 1.0, 2.0)
+    side = np.repeat(r, r.size)
+    middle = side + np.tile(r, r.size)
+    cumulative, cumulativeWeights = B3Panels(B3CumulativeEdges, B3CumulativeOrder)
+    cumulativeTail, cumulativeTailWeights = B3Panels(B3CumulativeTailEdges, B3CumulativeOrder)
+    return {'r': r, 'first': first, 'second': second, 'pairWeights': pairWeights, \
+        'pairPoints': B3Points(np.concatenate((r[first] + r[second], np.abs(r[first] - r[second])))), \
+        'side': side, 'middle': middle, 'tripletWeights': np.outer(w, w).ravel(), \
+        'tripletPoints': B3Points(np.concatenate((middle, side + middle))), \
+        'cumulative': cumulative, 'cumulativeWeights': cumulativeWeights, \
+        'cumulativeTail': cumulativeTail, 'cumulativeTailWeights': cumulativeTailWeights}
+
+def B3GeometryGet():
+    # Return the shared nodes of B3starCalc, computing them the first time they are needed
+    global B3Geometry
+    if (B3Geometry is None):
+        B3Geometry = B3GeometryBuild()
+    return B3Geometry
+
+def B3Cumulative(geometry, points, inner, tail, farPowers=None):
+    # G(s) = int_0^s g at the points of B3Points for each of K functions g; inner holds
+    # g at the cumulative nodes, shape (K, panels, order), and tail (g(1/t) - t^-p)/t^2
+    # at the cumulative tail nodes, where g tends to r*^p far out (farPowers, p != -1;
+    # None if every g vanishes there); returns shape (K, points)
+    # Up to B3TailStart, G is the sum of the panels below s and the integral of the
+    # interpolant of g over the rest of its panel; beyond, the integral over t = 1/r*
+    # from 1/s to 1/B3TailStart is subtracted from the whole tail, and r*^p added back
+    # from B3TailStart to s exactly.
+    panelSums = np.sum(inner*geometry['cumulativeWeights'], axis=2)
+    below = np.concatenate((np.zeros((inner.shape[0], 1)), np.cumsum(panelSums, axis=1)), axis=1)
+    tailSums = np.sum(tail*geometry['cumulativeTailWeights'], axis=2)
+    tailBelow = np.concatenate((np.zeros((tail.shape[0], 1)), np.cumsum(tailSums, axis=1)), axis=1)
+    piece = points['innerPiece']
+    tailPiece = points['tailPiece']
+    G = np.zeros((inner.shape[0], points['s'].size))
+    G[:, points['inner']] = below[:, piece] + np.einsum('kij,ij->ki', inner[:, piece], points['innerWeights'])
+    G[:, points['tail']] = (below[:, -1] + tailBelow[:, -1])[:, np.newaxis] - tailBelow[:, tailPiece] - \
+        np.einsum('kij,ij->ki', tail[:, tailPiece], points['tailWeights'])
+    if farPowers is not None:
+        s = points['s'][points['tail']]
+        for kk, power in enumerate(farPowers):
+            G[kk, points['tail']] += (s**(power + 1.0) - B3TailStart**(power + 1.0))/(power + 1.0)
+    return G
+
+def B3starPair(Tstar, deltaStar=0.0):
+    # C* of a single (T*, delta*) from the Mayer function of a pair alone, averaged over
+    # the orientations of a Stockmayer pair (see dipoleMayer)
+    geometry = B3GeometryGet()
+
+    def h(r_star):
+        lnBoltzmann = -4.0*(r_star**(-12.0) - r_star**(-6.0))/Tstar
+        if (deltaStar == 0.0):
+            return r_star*np.expm1(lnBoltzmann)
+        return r_star*dipoleMayer(lnBoltzmann, 2.0*deltaStar/(Tstar*(r_star**3.0)))
+    t = geometry['cumulativeTail']
+    G = B3Cumulative(geometry, geometry['pairPoints'], h(geometry['cumulative'])[np.newaxis], \
+        (h(1.0/t)/(t**2.0))[np.newaxis])[0]
+    pairs = geometry['first'].size
+    hr = h(geometry['r'])
+    profiler.count('B3starCalc pair evaluations', pairs)
+    return -6.0*np.sum(geometry['pairWeights']*hr[geometry['first']]*hr[geometry['second']]*(G[:pairs] - G[pairs:]))
+
+def B3starTriplet(Tstar):
+    # K(T*) of the three-body dipole term (delta*/T*)^3*K(T*) of a Stockmayer C*: the
+    # orientation average of the product of the three dipole-dipole energies of a
+    # triangle, <zeta_ab*zeta_bc*zeta_ca> = -(1 + 3*cos(A)*cos(B)*cos(C))/9, gives
+    #     K = (16/3) int int int e(a)*e(b)*e(c)*(1 + 3*cos(A)*cos(B)*cos(C))/(a*b*c)^2
+    # with e = exp(-u*_LJ/T*). The integrand falls off slowly and peaks along b = a + c
+    # when c is small, which the (a, b) panels of the pair term resolve poorly, so the
+    # sides are ordered, a <= b <= c (six times the integral over them), with b = a + u.
+    # Writing the cosines by the sides, the integrand is a polynomial in c^2 over c^4, and
+    # the c integral from b to a + b needs the moments M_p(s) = int_0^s e(c)*c^p dc,
+    # p = 2, 0, -2, -4.
+    geometry = B3GeometryGet()
+    powers = np.array([2.0, 0.0, -2.0, -4.0])
+    c = geometry['cumulative']
+    t = geometry['cumulativeTail']
+    inner = np.exp(-4.0*(c**(-12.0) - c**(-6.0))/Tstar)*(c[np.newaxis]**powers[:, np.newaxis, np.newaxis])
+    tail = np.expm1(-4.0*(t**12.0 - t**6.0)/Tstar)*(t[np.newaxis]**(-powers[:, np.newaxis, np.newaxis] - 2.0))
+    moments = B3Cumulative(geometry, geometry['tripletPoints'], inner, tail, powers)
+    a = geometry['side']
+    b = geometry['middle']
+    moment2, moment0, moment_2, moment_4 = moments[:, a.size:] - moments[:, :a.size]
+    e = np.exp(-4.0*(a**(-12.0) - a**(-6.0))/Tstar)*np.exp(-4.0*(b**(-12.0) - b**(-6.0))/Tstar)
+    sumSquares = a**2.0 + b**2.0
+    differenceSquared = (a**2.0 - b**2.0)**2.0
+    # (1 + 3*cos(A)*cos(B)*cos(C))/(abc)^2 = 1/(abc)^2 + (3/8)*P/(abc)^4 with
+    # P/c^4 = -c^2 + (a^2 + b^2) + (a^2 - b^2)^2/c^2 - (a^2 - b^2)^2*(a^2 + b^2)/c^4
+    integral = moment_2/(a*b)**2.0 + 0.375*(-moment2 + sumSquares*moment0 + differenceSquared*moment_2 - \
+        differenceSquared*sumSquares*moment_4)/(a*b)**4.0
+    profiler.count('B3starCalc triplet evaluations', a.size)
+    return 32.0*np.sum(geometry['tripletWeights']*e*integral)
+
+def B3DipoleCheck(Tstar, deltaStar):
+    # Raise ValueError if a polar (T*, delta*) of the arrays Tstar and deltaStar lies
+    # outside the range the truncated Stockmayer C* is computed in (B3DipoleCouplingRange)
+    outside = np.flatnonzero(((deltaStar != 0.0) & ((Tstar < B3DipoleTstarRange[0]) | \
+        (Tstar > B3DipoleTstarRange[1]) | (deltaStar > B3DipoleCouplingRange[1]*Tstar))).ravel())
+    if (outside.size > 0):
+        raise ValueError('the Stockmayer C* leaves out terms of O(delta*^4) and is only computed for T* in ' + \
+            str(B3DipoleTstarRange) + ' and delta*/T* <= ' + str(B3DipoleCouplingRange[1]) + \
+            ', where they stay below ' + str(B3DipoleTruncation) + ' of 1 + |C*|; got T* = ' + \
+            str(Tstar.ravel()[outside[0]]) + ', delta* = ' + str(deltaStar.ravel()[outside[0]]))
+
+def B3starCalc(Tstar, deltaStar=0.0):
+    # Reduced third virial coefficient C* = B3/b0^2 of a Lennard-Jones (deltaStar = 0) or
+    # Stockmayer fluid by the direct integral, the reference the tables are built from;
+    # Tstar and deltaStar are broadcast against each other, and evaluated one point at a
+    # time, every point over all pairs of nodes at once
+    # Polar points outside B3DipoleCouplingRange raise ValueError (see B3DipoleCheck)
+    Tstar, deltaStar = np.broadcast_arrays(np.asarray(Tstar, dtype=float), np.asarray(deltaStar, dtype=float))
+    B3DipoleCheck(Tstar, deltaStar)
+    Cstar = np.zeros(Tstar.shape)
+    for index in np.ndindex(*Tstar.shape):
+        Cstar[index] = B3starPair(Tstar[index], deltaStar[index])
+        if (deltaStar[index] != 0.0):
+            Cstar[index] += (deltaStar[index]/Tstar[index])**3.0*B3starTriplet(Tstar[index])
+    return Cstar
+
+def B3Sphere(order):
+    # Unit vectors and weights (summing to 1) of a product rule on the sphere: order
+    # Gauss-Legendre nodes in cos(theta) by 2*order equally spaced ones in phi
+    cosTheta, weights = np.polynomial.legendre.leggauss(order)
+    sinTheta = np.sqrt(1.0 - cosTheta**2.0)
+    phi = (np.arange(2*order) + 0.5)*np.pi/order
+    vectors = np.stack((np.outer(sinTheta, np.cos(phi)).ravel(), np.outer(sinTheta, np.sin(phi)).ravel(), \
+        np.repeat(cosTheta, 2*order)), axis=1)
+    return vectors, np.repeat(weights, 2*order)/(4.0*order)
+
+def B3LogSinhc(y):
+    # ln(sinh(y)/y) for y >= 0, the log of the average of exp(u.g) over unit vectors u
+    # for |g| = y, without overflow
+    small = (y < 1.0E-4)
+    large = np.where(small, 1.0, y)
+    return np.where(small, y**2.0/6.0, large + np.log1p(-np.exp(-2.0*large)) - np.log(2.0*large))
+
+@profiled('B3starRemainder')
+def B3starRemainder(Tstar, deltaStar):
+    # The part of the Stockmayer C* at a single (T*, delta*) that B3starCalc leaves out:
+    # C* with the three-body Mayer product averaged over all orientations, less the
+    # product of the pair averages and the (delta*/T*)^3 term, by brute force (seconds a
+    # point); what B3DipoleCouplingRange is checked against
+    # With molecule 1 at the origin, 2 on the x axis at a and 3 at b in the xy plane, and
+    # c the third side, C* = -6 int abc <f_12*f_13*f_23> da db dc. The energies of
+    # molecule 3 are linear in its dipole m3, w_13 + w_23 = m3.(g1 + g2), so its average is
+    # exact, <exp(-m3.g)> = sinh|g|/|g|. The dipoles of 1 and 2 run over B3Sphere, that
+    # of 1 over a quarter of it only: reversing both dipoles, or reflecting both in the
+    # plane of the triangle, leaves every energy as it is. The pair averages and the
+    # three-body term use the same nodes, so that their quadrature errors largely cancel
+    # in the difference, which falls off as (delta*/T*)^4.
+    r, w = B3Panels(B3RemainderEdges, B3RemainderOrder)
+    t, tw = B3Panels(np.array([0.0, 1.0/B3RemainderEdges[-1]]), B3RemainderOrder)
+    r = np.concatenate((r.ravel(), 1.0/t.ravel()))
+    w = np.concatenate((w.ravel(), (tw/(t**2.0)).ravel()))
+    # every pair of nodes once (the integrand is symmetric in a and b), and c on the
+    # pieces of [|a - b|, a + b]
+    first, second = np.triu_indices(r.size)
+    a = r[first][:, np.newaxis]
+    b = r[second][:, np.newaxis]
+    sideEdges = np.concatenate((np.abs(a - b), np.clip(B3RemainderSideEdges[np.newaxis, :], np.abs(a - b), a + b), \
+        a + b), axis=1)
+    nodes, weights = np.polynomial.legendre.leggauss(B3RemainderOrder)
+    half = 0.5*np.diff(sideEdges, axis=1)[:, :, np.newaxis]
+    c = (0.5*(sideEdges[:, 1:] + sideEdges[:, :-1])[:, :, np.newaxis] + half*nodes).reshape(a.size, -1)
+    weight = (w[first]*w[second]*np.where(first == second, 1.0, 2.0))[:, np.newaxis]*(half*weights).reshape(a.size, -1)
+    weight = weight*a*b*c
+    used = (weight > 0.0)
+    a = np.broadcast_to(a, c.shape)[used]
+    b = np.broadcast_to(b, c.shape)[used]
+    c = c[used]
+    weight = weight[used]
+    dipoles, dipoleWeights = B3Sphere(B3RemainderOrientations)
+    quarter = (dipoles[:, 0] > 0.0) & (dipoles[:, 2] > 0.0)
+    dipoles1 = dipoles[quarter]
+    weights1 = 4.0*dipoleWeights[quarter]
+    pairWeights = np.outer(weights1, dipoleWeights)
+    orientation12 = np.dot(dipoles1, dipoles.T) - 3.0*np.outer(dipoles1[:, 0], dipoles[:, 0])
+    x = 2.0*deltaStar/Tstar
+    total = 0.0
+    for start in range(0, a.size, B3RemainderChunk):
+        block = slice(start, start + B3RemainderChunk)
+        aBlock, bBlock, cBlock = a[block], b[block], c[block]
+        cosine = np.clip((aBlock**2.0 + bBlock**2.0 - cBlock**2.0)/(2.0*aBlock*bBlock), -1.0, 1.0)
+        unit13 = np.stack((cosine, np.sqrt(1.0 - cosine**2.0), np.zeros(cosine.shape)), axis=1)
+        unit23 = (bBlock[:, np.newaxis]*unit13 - np.outer(aBlock, [1.0, 0.0, 0.0]))/cBlock[:, np.newaxis]
+        # reduced dipole energy of 1 and 2, and the vectors g1, g2 with w_13 = m3.g1 and
+        # w_23 = m3.g2
+        w12 = (x/aBlock**3.0)[:, np.newaxis, np.newaxis]*orientation12
+        g1 = (x/bBlock**3.0)[:, np.newaxis, np.newaxis]*(dipoles1[np.newaxis] - \
+            3.0*unit13[:, np.newaxis, :]*np.dot(unit13, dipoles1.T)[:, :, np.newaxis])
+        g2 = (x/cBlock**3.0)[:, np.newaxis, np.newaxis]*(dipoles[np.newaxis] - \
+            3.0*unit23[:, np.newaxis, :]*np.dot(unit23, dipoles.T)[:, :, np.newaxis])
+        g11 = np.sum(g1**2.0, axis=2)
+        g22 = np.sum(g2**2.0, axis=2)
+        g12 = np.einsum('tid,tjd->tij', g1, g2)
+        ln12, ln13, ln23 = [-4.0*(side**(-12.0) - side**(-6.0))/Tstar for side in (aBlock, bBlock, cBlock)]
+        # e_13*<exp(-w_13)>, e_23*<exp(-w_23)> and e_13*e_23*<exp(-w_13 - w_23)> over m3
+        average13 = np.exp(ln13[:, np.newaxis] + B3LogSinhc(np.sqrt(g11)))
+        average23 = np.exp(ln23[:, np.newaxis] + B3LogSinhc(np.sqrt(g22)))
+        average1323 = np.exp((ln13 + ln23)[:, np.newaxis, np.newaxis] + \
+            B3LogSinhc(np.sqrt(np.maximum(g11[:, :, np.newaxis] + g22[:, np.newaxis, :] + 2.0*g12, 0.0))))
+        mayer12 = np.exp(ln12[:, np.newaxis, np.newaxis] - w12) - 1.0
+        product = np.einsum('tij,ij->t', mayer12*(average1323 - average13[:, :, np.newaxis] - \
+            average23[:, np.newaxis, :] + 1.0), pairWeights)
+        pairs = np.einsum('tij,ij->t', mayer12, pairWeights)*(np.dot(average13, weights1) - 1.0)* \
+            (np.dot(average23, dipoleWeights) - 1.0)
+        # the three-body term, -e_12*e_13*e_23*<w_12*w_13*w_23>, with <w_13*w_23> = g1.g2/3
+        triplet = -np.exp(ln12 + ln13 + ln23)*np.einsum('tij,ij->t', w12*g12, pairWeights)/3.0
+        total += np.sum(weight[block]*(product - pairs - triplet))
+    profiler.count('B3starRemainder triangles', a.size)
+    return -6.0*total
+
+def B3DipoleTruncationCheck(Tstar=B3DipoleCheckTstar, coupling=B3DipoleCouplingRange[1]):
+    # The terms B3starCalc leaves out (B3starRemainder) relative to 1 + |C*| at every
+    # reduced temperature of Tstar, with delta* = coupling*T* (by default on the upper
+    # edge of the range, where they are largest)
+    relative = []
+    for value in Tstar:
+        remainder = B3starRemainder(value, coupling*value)
+        relative.append(abs(remainder)/(1.0 + abs(float(B3starCalc(value, coupling*value)) + remainder)))
+    return np.array(relative)
+
+def B3TableRow(arguments):
+    # C* at one reduced temperature and a list of delta*, for the pool of B3TableValues;
+    # arguments is the tuple (Tstar, deltaStar); the three-body term is computed once
+    Tstar, deltaStar = arguments
+    Cstar = np.array([B3starPair(Tstar, delta) for delta in deltaStar])
+    if np.any(deltaStar != 0.0):
+        Cstar += (deltaStar/Tstar)**3.0*B3starTriplet(Tstar)
+    return Cstar
+
+def B3TableValues(Tstar, deltaStar, processes=None):
+    # C* at every reduced temperature of the 1-D Tstar and the delta* of the matching
+    # entry of the list deltaStar, as a list of rows, in a pool of processes
+    # (processes=1 computes them here)
+    arguments = list(zip(Tstar, deltaStar))
+    if (processes == 1):
+        return [B3TableRow(argument) for argument in arguments]
+    pool = multiprocessing.Pool(processes)
+    try:
+        return profileMap(pool, B3TableRow, arguments, B3BuildChunk)
+    finally:
+        pool.close()
+        pool.join()
+
+def B3TableNodes(edges, degree, checks=False):
+    # The Chebyshev nodes of every piece between consecutive edges, shape (pieces,
+    # degree + 1), or with checks=True the points the table is checked at: halfway
+    # between the nodes and the piece edges
+    nodes = np.cos(np.pi*(np.arange(degree+1) + 0.5)/(degree+1))
+    if checks:
+        nodes = np.sort(np.concatenate(([-1.0, 1.0], 0.5*(nodes[1:] + nodes[:-1]))))
+    return 0.5*(edges[1:] + edges[:-1])[:, np.newaxis] + 0.5*np.diff(edges)[:, np.newaxis]*nodes
+
+@profiled('B3TableBuild')
+def B3TableBuild(TstarRange=B3TableRange, pieces=B3TablePieces, degree=B3TableDegree, processes=None):
+    # Build the Lennard-Jones C*(T*) table: on each piece of ln(T*), C*/(1 - B*)^3 is
+    # interpolated at Chebyshev points, with every C* from B3starCalc in a pool of
+    # processes (see B3TableValues) and B* from BstarCalc
+    # The error is checked halfway between the nodes and at the piece edges, and the
+    # table stores ten times the worst error found relative to 1 + |C*|
+    edges = np.linspace(np.log(TstarRange[0]), np.log(TstarRange[1]), pieces+1)
+    lnTstar = B3TableNodes(edges, degree)
+    checks = B3TableNodes(edges, degree, True)
+    Tstar = np.exp(np.concatenate((lnTstar.ravel(), checks.ravel())))
+    Cstar = np.concatenate(B3TableValues(Tstar, [np.zeros(1)]*Tstar.size, processes))
+    chebNodes = B3TableNodes(np.array([-1.0, 1.0]), degree)[0]
+    values = (Cstar[:lnTstar.size]/(1.0 - BstarCalc(np.exp(lnTstar.ravel())))**3.0).reshape(lnTstar.shape)
+    coeffs = np.array([np.polynomial.chebyshev.chebfit(chebNodes, values[ii], degree) for ii in range(pieces)])
+    table = {'edges': edges, 'coeffs': coeffs, 'TstarRange': TstarRange, 'error': 0.0}
+    Cstar_check = Cstar[lnTstar.size:]
+    table['error'] = 10.0*np.max(np.abs(B3TableEval(table, np.exp(checks.ravel())) - Cstar_check)/(1.0 + np.abs(Cstar_check)))
+    return table
+
+@profiled('B3DipoleTableBuild')
+def B3DipoleTableBuild(TstarRange=B3DipoleTstarRange, couplingRange=B3DipoleCouplingRange, \
+    pieces=B3DipoleTablePieces, degree=B3DipoleTableDegree, processes=None):
+    # Build the Stockmayer C*(T*, delta*) table over ln(T*) and delta*/T*, which C*
+    # depends on delta* through: on each piece of the grid, C*/(1 - B*)^3 (with the
+    # Lennard-Jones B*, which the dipole changes little in this range) is interpolated at
+    # the tensor product of Chebyshev points; every reduced temperature is one task of
+    # the pool, with all its delta* (B3TableRow)
+    # The error is checked and stored like that of B3TableBuild, at the points halfway
+    # between the nodes and on the piece edges along one axis, at the nodes along the other;
+    # it is measured against B3starCalc, and the truncation is bounded separately (see
+    # B3DipoleCouplingRange)
+    edges = np.linspace(np.log(TstarRange[0]), np.log(TstarRange[1]), pieces[0]+1)
+    couplingEdges = np.linspace(couplingRange[0], couplingRange[1], pieces[1]+1)
+    lnTstar = B3TableNodes(edges, degree[0])
+    coupling = B3TableNodes(couplingEdges, degree[1])
+    lnTstarChecks = B3TableNodes(edges, degree[0], True).ravel()
+    couplingChecks = B3TableNodes(couplingEdges, degree[1], True).ravel()
+    # the rows of the nodes in T* take the checks in delta*/T* as well
+    Tstar = np.exp(np.concatenate((lnTstar.ravel(), lnTstarChecks)))
+    rowCoupling = [np.concatenate((coupling.ravel(), couplingChecks))]*lnTstar.size + [coupling.ravel()]*lnTstarChecks.size
+    rows = B3TableValues(Tstar, [Tstar[ii]*rowCoupling[ii] for ii in range(Tstar.size)], processes)
+    Cstar = np.array([row[:coupling.size] for row in rows])
+    Bstar = BstarCalc(np.exp(lnTstar.ravel()))[:, np.newaxis]
+    values = (Cstar[:lnTstar.size]/(1.0 - Bstar)**3.0).reshape(lnTstar.shape + coupling.shape)
+    chebNodes = [B3TableNodes(np.array([-1.0, 1.0]), order)[0] for order in degree]
+    inverse = [np.linalg.inv(np.polynomial.chebyshev.chebvander(nodes, order)) for nodes, order in zip(chebNodes, degree)]
+    coeffs = np.einsum('ka,iajb,lb->ijkl', inverse[0], values, inverse[1])
+    table = {'edges': edges, 'couplingEdges': couplingEdges, 'coeffs': coeffs, 'TstarRange': TstarRange, \
+        'couplingRange': couplingRange, 'error': 0.0}
+    errors = []
+    for TstarCheck, couplingCheck, Cstar_check in ((np.exp(lnTstarChecks)[:, np.newaxis], coupling.ravel()[np.newaxis, :], \
+        Cstar[lnTstar.size:]), (np.exp(lnTstar.ravel())[:, np.newaxis], couplingChecks[np.newaxis, :], \
+        np.array([row[coupling.size:] for row in rows[:lnTstar.size]]))):
+        errors.append(np.max(np.abs(B3TableEval(table, TstarCheck, couplingCheck*TstarCheck) - Cstar_check)/ \
+            (1.0 + np.abs(Cstar_check))))
+    table['error'] = 10.0*max(errors)
+    return table
+
+def B3TableEval(table, Tstar, deltaStar=None):
+    # Evaluate a table of B3TableBuild (deltaStar None) or B3DipoleTableBuild with the
+    # Clenshaw recurrence, vectorized over Tstar and deltaStar (broadcast against each
+    # other, inside the table range); the Lennard-Jones B* the table is scaled by comes
+    # from the second virial coefficient table
+    Tstar = np.asarray(Tstar, dtype=float)
+    if deltaStar is not None:
+        Tstar, deltaStar = np.broadcast_arrays(Tstar, np.asarray(deltaStar, dtype=float))
+    edges = table['edges']
+    coeffs = table['coeffs']
+    lnTstar = np.log(Tstar.reshape(-1))
+    profiler.count('B3Table lookups', lnTstar.size)
+    piece = np.clip(np.searchsorted(edges, lnTstar) - 1, 0, coeffs.shape[0] - 1)
+    zT = (2.0*lnTstar - edges[piece] - edges[piece+1])/(edges[piece+1] - edges[piece])
+    if deltaStar is None:
+        values = BstarTableClenshaw(np.moveaxis(coeffs[piece], -1, 0), zT)
+    else:
+        couplingEdges = table['couplingEdges']
+        coupling = deltaStar.reshape(-1)/Tstar.reshape(-1)
+        couplingPiece = np.clip(np.searchsorted(couplingEdges, coupling) - 1, 0, coeffs.shape[1] - 1)
+        zCoupling = (2.0*coupling - couplingEdges[couplingPiece] - couplingEdges[couplingPiece+1])/ \
+            (couplingEdges[couplingPiece+1] - couplingEdges[couplingPiece])
+        values = BstarDipoleTableClenshaw(coeffs[piece, couplingPiece], zT, zCoupling)
+    values = values*(1.0 - BstarInterp(Tstar.reshape(-1)))**3.0
+    return values.reshape(Tstar.shape)
+
+def B3TableLayout(table):
+    # what a stored table must match to be used: the version and its ranges and pieces
+    layout = [B3TableVersion] + list(table['TstarRange']) + list(table['coeffs'].shape)
+    if 'couplingRange' in table:
+        layout += list(table['couplingRange'])
+    return np.array(layout, dtype=float)
+
+def B3TableLoad(path, layout):
+    # the table stored at path, or None if there is none or it was built differently
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as stored:
+        table = dict((name, stored[name]) for name in stored.files)
+    if (table['layout'].shape != layout.shape) or np.any(table['layout'] != layout):
+        return None
+    table['TstarRange'] = tuple(table['TstarRange'])
+    if 'couplingRange' in table:
+        table['couplingRange'] = tuple(table['couplingRange'])
+    table['error'] = float(table['error'])
+    return table
+
+def B3TableSave(table, path):
+    # store a table at path, written aside and renamed into place; a directory that
+    # cannot be written to only means the table is built again next session
+    building = path + '.building'
+    try:
+        with open(building, 'wb') as tableFile:
+            np.savez(tableFile, **dict(table, layout=B3TableLayout(table)))
+        os.rename(building, path)
+    except (IOError, OSError):
+        pass
+
+def B3TableGet(processes=None):
+    # Return the shared Lennard-Jones C*(T*) table: loaded from B3TablePath, or built in a
+    # pool of processes (and stored there) the first time it is needed
+    global B3Table
+    if (B3Table is None):
+        expected = np.array([B3TableVersion, B3TableRange[0], B3TableRange[1], B3TablePieces, B3TableDegree + 1], dtype=float)
+        B3Table = B3TableLoad(B3TablePath, expected)
+        if B3Table is None:
+            B3Table = B3TableBuild(processes=processes)
+            B3TableSave(B3Table, B3TablePath)
+    return B3Table
+
+def B3DipoleTableGet(processes=None):
+    # Return the shared Stockmayer C*(T*, delta*) table, like B3TableGet
+    global B3DipoleTable
+    if (B3DipoleTable is None):
+        expected = np.array([B3TableVersion] + list(B3DipoleTstarRange) + list(B3DipoleTablePieces) + \
+            [order + 1 for order in B3DipoleTableDegree] + list(B3DipoleCouplingRange), dtype=float)
+        B3DipoleTable = B3TableLoad(B3DipoleTablePath, expected)
+        if B3DipoleTable is None:
+            B3DipoleTable = B3DipoleTableBuild(processes=processes)
+            B3TableSave(B3DipoleTable, B3DipoleTablePath)
+    return B3DipoleTable
+
+def B3starInterp(Tstar, deltaStar=0.0):
+    # Reduced third virial coefficient from the tables, the Lennard-Jones one where every
+    # deltaStar is 0 and the Stockmayer one otherwise; points outside the table range
+    # fall back to B3starCalc, and polar points outside B3DipoleCouplingRange raise
+    # ValueError (see B3DipoleCheck)
+    Tstar, deltaStar = np.broadcast_arrays(np.asarray(Tstar, dtype=float), np.asarray(deltaStar, dtype=float))
+    B3DipoleCheck(Tstar, deltaStar)
+    lennardJones = np.all(deltaStar == 0.0)
+    table = B3TableGet() if lennardJones else B3DipoleTableGet()
+    inRange = (Tstar >= table['TstarRange'][0]) & (Tstar <= table['TstarRange'][1])
+    if not lennardJones:
+        inRange &= (deltaStar >= table['couplingRange'][0]*Tstar) & (deltaStar <= table['couplingRange'][1]*Tstar)
+    Cstar = np.zeros(Tstar.shape)
+    Cstar[inRange] = B3TableEval(table, Tstar[inRange], None if lennardJones else deltaStar[inRange])
+    Cstar[~inRange] = B3starCalc(Tstar[~inRange], deltaStar[~inRange])
+    return Cstar
+
+@profiled('B3calc', suffix='calcMethod')
+def B3calc(T, sigma, epsilon, mu, calcMethod="Table"):
+    # Calculate the third coefficient of the virial equation of state using Lennard
+    # Jones / Stockmayer parameters, in cm^6/mol^2
+    # T in Kelvin, sigma in Angstroms, epsilon in Kelvin, mu in Debyes; T may be a scalar
+    # or an array of any shape, and B3 is returned with the same shape
+    # calcMethod = "Table" interpolates the precomputed tables (see B3starInterp), "Quad"
+    # computes the triple integral for every temperature (see B3starCalc)
+    # For a polar species (mu != 0) C* is exact to O(delta*^2), plus the leading three-body
+    # term; it is only computed for T/epsilon and delta*/T* in the ranges where the terms
+    # left out stay below B3DipoleTruncation relative to 1 + |C*|, and other T raise
+    # ValueError (see B3DipoleCouplingRange)
+    T = np.asarray(T, dtype=float)
+    delta_star = deltaCalc(sigma, epsilon, mu)
+    if (calcMethod == "Table"):
+        Cstar = B3starInterp(T/epsilon, delta_star)
+    elif (calcMethod == "Quad"):
+        Cstar = B3starCalc(T/epsilon, delta_star)
+    else:
+        raise ValueError('unknown calcMethod ' + repr(calcMethod) + ' of B3calc, expected "Table" or "Quad"')
+    B3_result = ((2.0/3.0)*np.pi*0.6022140*(sigma**3.0))**2.0*Cstar
+    if (B3_result.ndim == 0):
+        B3_result = B3_result[()]
+    return B3_result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the tables of the reduced third virial coefficient.')
+    parser.add_argument('--processes', type=int, default=None, help='number of processes (default: one per CPU)')
+    parser.add_argument('--dipole', action='store_true', help='also build the Stockmayer table')
+    parser.add_argument('--check', action='store_true', help='measure the truncation of the Stockmayer C*')
+    arguments = parser.parse_args()
+    table = B3TableBuild(processes=arguments.processes)
+    B3TableSave(table, B3TablePath)
+    print('Lennard-Jones table written to ' + B3TablePath + ', error bound ' + str(table['error']))
+    if arguments.dipole:
+        table = B3DipoleTableBuild(processes=arguments.processes)
+        B3TableSave(table, B3DipoleTablePath)
+        print('Stockmayer table written to ' + B3DipoleTablePath + ', error bound ' + str(table['error']))
+    if arguments.check:
+        relative = B3DipoleTruncationCheck()
+        for Tstar, value in zip(B3DipoleCheckTstar, relative):
+            print('T* = %-6g delta* = %-8g terms left out: %.2e of 1 + |C*|' % (Tstar, B3DipoleCouplingRange[1]*Tstar, value))
+        print('largest %.2e, bound %.2e' % (np.max(relative), B3DipoleTruncation))
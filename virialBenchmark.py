@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+# Benchmarks of the database code: Bcalc (one temperature at a time, over a whole
+# temperature array, batched, tabulated, by series, and for every potential model of
+# virialPotentials), B3calc, BerrCalc, import and loading times, and the export of the
+# whole database
+# Every benchmark is timed like timeit: the call is repeated until a run takes long
+# enough to time, and the best of several runs is kept. The results are written as JSON,
+# and can be compared with a stored baseline; benchmarks slower than the baseline by
+# more than the threshold are flagged as regressions.
+#
+# Usage: python virialBenchmark.py [--filter Bcalc] [--output results.json]
+#            [--baseline benchmarkBaseline.json] [--save-baseline] [--threshold 0.25]
+# exits with status 1 if there is a regression
+
+# Headers for Python
+import argparse
+import atexit
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# directory of the database code, and the default baseline file in it
+benchmarkDirectory = os.path.dirname(os.path.abspath(__file__))
+benchmarkBaseline = os.path.join(benchmarkDirectory, 'benchmarkBaseline.json')
+# a timed run is repeated until it takes at least this long [s], and the best of this
+# many runs is kept
+benchmarkMinTime = 0.2
+benchmarkRepeat = 5
+# relative slow-down against the baseline flagged as a regression
+benchmarkThreshold = 0.25
+# temperature grid sizes for the Bcalc benchmarks; the slower methods stop early
+benchmarkSizes = (10, 100, 1000, 10000, 100000)
+benchmarkMaxSize = {'scalar': 1000, 'Inf': 10000, 'Quad': 1000, 'Table': 100000, 'Series': 100000, 'batch': 100000}
+# temperature grid size of the benchmarks of the potential models, every method
+benchmarkPotentialSize = 1000
+# temperature grid sizes of the B3calc benchmarks, by method
+benchmarkB3Sizes = {'Table': 1000, 'Quad': 10}
+
+def benchmarkTime(function, minTime=benchmarkMinTime, repeat=benchmarkRepeat):
+    # best time per call [s] of function(), and the number of calls per timed run
+    number = 1
+    while True:
+        start = time.time()
+        for kk in range(number):
+            function()
+        elapsed = time.time() - start
+        if (elapsed >= minTime) or (number >= 1000000):
+            break
+        number *= 10 if (elapsed < minTime/10.0) else 2
+    best = elapsed
+    for kk in range(repeat - 1):
+        start = time.time()
+        for jj in range(number):
+            function()
+        best = min(best, time.time() - start)
+    return best/number, number
+
+def benchmarkSubprocess(code):
+    # a function running code in a fresh interpreter, for cold import and start-up times
+    def run():
+        subprocess.check_call([sys.executable, '-c', code], cwd=benchmarkDirectory)
+    return run
+
+def benchmarkCases(pattern=None):
+    # every benchmark whose name contains pattern (all if None) as (name, function); the
+    # setup is done here, outside the timing, and only for the benchmarks that are run
+    # The snapshot is loaded from a copy built in a temporary directory, removed at exit,
+    # so that the one next to the database is left alone.
+    from virialFunctions import Bcalc, BcalcBatch, BerrCalc, BstarTableGet
+    from virialStore import buildSnapshot, databaseSpecies, load
+    from virialExport import exportSpecies
+    from virialPotentials import potentialRegistry
+    from virialB3 import B3calc, B3TableGet
+
+    def wanted(name):
+        return (pattern is None) or (pattern in name)
+    sigma, epsilon = 3.861, 146.2
+    cases = []
+    for size in benchmarkSizes:
+        T = np.linspace(100.0, 1000.0, size)
+        if (size <= benchmarkMaxSize['scalar']):
+            cases.append(('Bcalc_scalar_Inf_%d' % size, lambda T=T: [Bcalc(temp, sigma, epsilon, 0.0, "Inf") for temp in T]))
+        for method in ('Inf', 'Quad', 'Table', 'Series'):
+            if (size <= benchmarkMaxSize[method]):
+                cases.append(('Bcalc_%s_%d' % (method, size), lambda T=T, method=method: Bcalc(T, sigma, epsilon, 0.0, method)))
+        if (size >= 100) and (size <= benchmarkMaxSize['batch']):
+            # 100 parameter sets, as many (set, temperature) pairs as the grid has points
+            sigmas = sigma*(1.0 + 1.0E-3*np.arange(100))
+            T_batch = T[:size//100]
+            cases.append(('BcalcBatch_Table_100x%d' % T_batch.size, \
+                lambda T=T_batch: BcalcBatch(T, sigmas, epsilon, 0.0, "Table")))
+    if any(wanted(name) and ('Table' in name) for name, function in cases):
+        BstarTableGet()
+    T = np.linspace(100.0, 1000.0, benchmarkPotentialSize)
+    for name in potentialRegistry.names():
+        potential = potentialRegistry.get(name)
+        names = ['Bcalc_%s_%s_%d' % (name, method, T.size) for method in ('Inf', 'Quad', 'Table')]
+        if not potential.analytic and any(wanted(caseName) for caseName in names):
+            potential.tableGet()
+        for caseName, method in zip(names, ('Inf', 'Quad', 'Table')):
+            cases.append((caseName, lambda potential=potential, method=method, T=T: Bcalc(T, sigma, epsilon, 0.0, method, potential)))
+    for method in ('Table', 'Quad'):
+        T_B3 = np.linspace(100.0, 1000.0, benchmarkB3Sizes[method])
+        name = 'B3calc_%s_%d' % (method, T_B3.size)
+        if (method == 'Table') and wanted(name):
+            B3TableGet()
+        cases.append((name, lambda T=T_B3, method=method: B3calc(T, sigma, epsilon, 0.0, method)))
+    random = np.random.RandomState(0)
+    B_values = random.uniform(-2000.0, 100.0, 1000000)
+    classes = random.randint(1, 4, B_values.size)
+    cases.append(('BerrCalc_1000000', lambda: BerrCalc(B_values, classes)))
+    cases.append(('import_virialFunctions', benchmarkSubprocess('import virialFunctions')))
+    cases.append(('startup_databaseExp', benchmarkSubprocess("exec(open('databaseExp.py').read())")))
+    cases.append(('startup_loadAll', benchmarkSubprocess('import virialStore; virialStore.load(virialStore.databaseSpecies())')))
+    if wanted('startup_loadSnapshot'):
+        directory = tempfile.mkdtemp()
+        atexit.register(shutil.rmtree, directory, True)
+        snapshot = os.path.join(directory, 'virialSnapshot')
+        buildSnapshot(snapshot)
+        cases.append(('startup_loadSnapshot', benchmarkSubprocess('import virialStore; virialStore.loadSnapshot(' + repr(snapshot) + ')')))
+    if wanted('export_all'):
+        store = load(databaseSpecies())
+
+        def export():
+            directory = tempfile.mkdtemp()
+            try:
+                exportSpecies(store, directory, 'allvirialData.txt')
+            finally:
+                shutil.rmtree(directory)
+        cases.append(('export_all', export))
+    return [(name, function) for name, function in cases if wanted(name)]
+
+def runBenchmarks(pattern=None, minTime=benchmarkMinTime, repeat=benchmarkRepeat):
+    # run the benchmarks whose name contains pattern (all if None); returns the results
+    # as a dict ready to be written as JSON
+    results = {}
+    for name, function in benchmarkCases(pattern):
+        seconds, number = benchmarkTime(function, minTime, repeat)
+        results[name] = {'seconds': seconds, 'number': number, 'repeat': repeat}
+        print('%-32s %12.6g s' % (name, seconds))
+        sys.stdout.flush()
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'machine': platform.machine(), 'node': platform.node(), \
+        'python': platform.python_version(), 'numpy': np.__version__, 'results': results}
+
+def compareBenchmarks(current, baseline, threshold=benchmarkThreshold):
+    # the benchmarks present in both runs, as a list of (name, baseline [s], current [s],
+    # ratio, regressed), regressed being True if the current run is slower than the
+    # baseline by more than threshold
+    comparison = []
+    for name in sorted(current['results']):
+        if name in baseline['results']:
+            before = baseline['results'][name]['seconds']
+            after = current['results'][name]['seconds']
+            ratio = after/before
+            comparison.append((name, before, after, ratio, ratio > 1.0 + threshold))
+    return comparison
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the virial coefficient database code.')
+    parser.add_argument('--filter', default=None, help='only run benchmarks whose name contains this')
+    parser.add_argument('--output', default=None, help='write the results as JSON to this file')
+    parser.add_argument('--baseline', default=benchmarkBaseline, help='baseline to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--threshold', type=float, default=benchmarkThreshold, \
+        help='relative slow-down flagged as a regression (default 0.25)')
+    parser.add_argument('--min-time', type=float, default=benchmarkMinTime, help='minimum time of a timed run [s]')
+    arguments = parser.parse_args()
+    current = runBenchmarks(arguments.filter, arguments.min_time)
+    if arguments.output is not None:
+        with io.open(arguments.output, 'w', encoding='utf-8') as outputFile:
+            outputFile.write(json.dumps(current, indent=1, sort_keys=True))
+    regressions = []
+    if arguments.save_baseline:
+        with io.open(arguments.baseline, 'w', encoding='utf-8') as baselineFile:
+            baselineFile.write(json.dumps(current, indent=1, sort_keys=True))
+        print('baseline written to ' + arguments.baseline)
+    elif os.path.isfile(arguments.baseline):
+        with io.open(arguments.baseline, encoding='utf-8') as baselineFile:
+            baseline = json.loads(baselineFile.read())
+        print('\n%-32s %12s %12s %8s' % ('compared with ' + os.path.basename(arguments.baseline), 'baseline', 'current', 'ratio'))
+        for name, before, after, ratio, regressed in compareBenchmarks(current, baseline, arguments.threshold):
+            print('%-32s %12.6g %12.6g %8.2f%s' % (name, before, after, ratio, '  REGRESSION' if regressed else ''))
+            if regressed:
+                regressions.append(name)
+    if regressions:
+        print(str(len(regressions)) + ' regression(s): ' + ', '.join(regressions))
+        sys.exit(1)
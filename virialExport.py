@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+# Export the virial coefficient database to text files: one all<Species>virialData.txt
+# per species with tab-free columns of temperature [K], B [cm^3/mol] and its uncertainty
+# (the format np.savetxt(..., fmt='%10.5f') has always produced), and optionally one
+# combined file with the species name in front of every row
+#
+# Usage: python virialExport.py [--combined allvirialData.txt] [--directory DIR]
+
+# Headers for Python
+import argparse
+import io
+import os
+from virialProfile import profiled, profiler
+from virialStore import databaseSpecies, load
+
+# directory the species files live in, next to databaseExp.py
+exportDirectory = os.path.dirname(os.path.abspath(__file__))
+# row format of the species files, identical to np.savetxt with fmt='%10.5f'
+exportRowFormat = '%10.5f %10.5f %10.5f\n'
+
+def exportFileName(species):
+    return 'all' + species + 'virialData.txt'
+
+@profiled('writeIfChanged')
+def writeIfChanged(path, text):
+    # write text to path unless the file already holds exactly that text;
+    # returns True if the file was written
+    content = text.encode('ascii')
+    if os.path.isfile(path) and (os.path.getsize(path) == len(content)):
+        with open(path, 'rb') as existing:
+            if (existing.read() == content):
+                return False
+    with io.open(path, 'wb') as output:
+        output.write(content)
+    profiler.count('export bytes written', len(content))
+    return True
+
+@profiled('exportSpecies')
+def exportSpecies(store, directory=exportDirectory, combinedName=None):
+    # Write the species files (and the combined file, if combinedName is given) for
+    # every species in store, a VirialStore
+    # Every row is formatted once; the datasets of a species are already contiguous in
+    # the store, so each file is one slice of the formatted rows. Files whose content
+    # has not changed are left untouched. Returns the paths that were written.
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with profiler.stage('export format rows', rows=len(store)):
+        rows = [exportRowFormat % row for row in zip(store.T.tolist(), store.B.tolist(), store.Berr.tolist())]
+    written = []
+    for name in store.speciesNames:
+        path = os.path.join(directory, exportFileName(name))
+        if writeIfChanged(path, ''.join(rows[store.speciesSlice(name)])):
+            written.append(path)
+    if combinedName is not None:
+        combined = []
+        for name in store.speciesNames:
+            combined.extend(['%-8s ' % name + row for row in rows[store.speciesSlice(name)]])
+        path = os.path.join(directory, combinedName)
+        if writeIfChanged(path, ''.join(combined)):
+            written.append(path)
+    return written
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the virial coefficient data of every species to text files.')
+    parser.add_argument('--directory', default=exportDirectory, help='directory to write the files to')
+    parser.add_argument('--combined', default=None, help='also write all species to this file')
+    arguments = parser.parse_args()
+    written = exportSpecies(load(databaseSpecies()), arguments.directory, arguments.combined)
+    for path in written:
+        print('wrote ' + path)
+    if not written:
+        print('all files up to date')
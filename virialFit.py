@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+# Fitting of Lennard-Jones / Stockmayer parameters (sigma, epsilon) to the virial
+# coefficient data of a species
+# The likelihood assumes independent normal errors with standard deviation Berr, and
+# evaluates the model for all data points of the species in one vectorized Bcalc call.
+# Every fit takes a potential model of virialPotentials (default Lennard-Jones), so
+# several models can be fitted to the same data and compared by their chi^2.
+
+# Headers for Python
+import multiprocessing
+import numpy as np
+from virialFunctions import Bcalc, BcalcBatch, BcalcGradient, BstarDipoleTableGet, BstarInterp, deltaCalc, potentialGeneric
+from virialProfile import profileMap, profiled
+from virialStore import load
+
+# box prior on (sigma [Angstroms], epsilon [K]); the posterior is zero outside of it
+fitBounds = ((0.5, 15.0), (1.0, 5000.0))
+# default model evaluation used while fitting (see Bcalc)
+fitCalcMethod = "Table"
+
+def fitData(species):
+    # (T, B, Berr) of every data point of a species, loaded lazily
+    return load(species).speciesData(species)
+
+def logLikelihood(theta, T, B, Berr, mu=0.0, calcMethod=fitCalcMethod, potential=None):
+    # Gaussian log-likelihood (up to a constant) of the data for the parameters theta,
+    # either one (sigma, epsilon) pair or an (N, 2) array of pairs, which is evaluated
+    # with a single BcalcBatch call; returns a scalar or an array of N values
+    theta = np.asarray(theta, dtype=float)
+    if (theta.ndim == 1):
+        residual = (Bcalc(T, theta[0], theta[1], mu, calcMethod, potential) - B)/Berr
+        return -0.5*np.sum(residual**2.0)
+    residual = (BcalcBatch(T, theta[:,0], theta[:,1], mu, calcMethod, potential=potential) - B)/Berr
+    return -0.5*np.sum(residual**2.0, axis=-1)
+
+def inBounds(theta):
+    theta = np.asarray(theta, dtype=float)
+    return (theta[...,0] > fitBounds[0][0]) & (theta[...,0] < fitBounds[0][1]) & \
+        (theta[...,1] > fitBounds[1][0]) & (theta[...,1] < fitBounds[1][1])
+
+def logPosterior(theta, T, B, Berr, mu=0.0, calcMethod=fitCalcMethod, potential=None):
+    # log-likelihood inside the box prior, -inf outside
+    if not inBounds(theta):
+        return -np.inf
+    return logLikelihood(theta, T, B, Berr, mu, calcMethod, potential)
+
+@profiled('gridMaxima')
+def gridMaxima(T, B, Berr, mu=0.0, points=48, count=1, potential=None):
+    # the count best local maxima of the log-likelihood on a logarithmic (sigma, epsilon)
+    # grid over the prior box, best first (Lennard-Jones and the other potential models
+    # from their B*(T*) tables, Stockmayer with one batched Bcalc call on the B*(T*, delta*)
+    # table)
+    # A grid point is a local maximum if no neighbour (diagonals included) is higher.
+    # Stockmayer grid points that need B* outside of the table (delta* or T* far from any
+    # sensible fit, and slow to integrate) are left out.
+    sigmaGrid = np.geomspace(fitBounds[0][0]*1.01, fitBounds[0][1]*0.99, points)
+    epsilonGrid = np.geomspace(fitBounds[1][0]*1.01, fitBounds[1][1]*0.99, points)
+    theta = np.array([[sigma, epsilon] for sigma in sigmaGrid for epsilon in epsilonGrid])
+    generic = potentialGeneric(potential, mu)
+    # the corners of the box give B far outside of the data; their chi^2 may overflow
+    with np.errstate(over='ignore', invalid='ignore'):
+        if generic or (mu == 0.0):
+            # B = b0(sigma)*B*(T/epsilon), so B* is only needed once per epsilon and
+            # chi^2 = b0^2*sum(B*^2/Berr^2) - 2*b0*sum(B*B/Berr^2) + sum(B^2/Berr^2)
+            if generic:
+                Bstar = potential.Bstar(T[np.newaxis, :]/epsilonGrid[:, np.newaxis])
+            else:
+                Bstar = BstarInterp(T[np.newaxis, :]/epsilonGrid[:, np.newaxis])
+            b0 = (2.0/3.0)*np.pi*0.6022140*(sigmaGrid**3.0)
+            weight = Berr**(-2.0)
+            chi2 = (b0[:, np.newaxis]**2.0)*np.dot(Bstar**2.0, weight) - \
+                2.0*b0[:, np.newaxis]*np.dot(Bstar, B*weight) + np.sum(B**2.0*weight)
+            logL = -0.5*chi2.reshape(-1)
+        else:
+            table = BstarDipoleTableGet()
+            tabulated = (deltaCalc(theta[:,0], theta[:,1], mu) <= table['deltaRange'][1]) & \
+                (np.min(T)/theta[:,1] >= table['TstarRange'][0]) & (np.max(T)/theta[:,1] <= table['TstarRange'][1])
+            logL = np.full(len(theta), -np.inf)
+            logL[tabulated] = logLikelihood(theta[tabulated], T, B, Berr, mu, "Table")
+    logL = np.where(np.isnan(logL), -np.inf, logL).reshape(points, points)
+    padded = np.pad(logL, 1, mode='constant', constant_values=-np.inf)
+    isMaximum = np.ones((points, points), dtype=bool)
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            if (di != 0) or (dj != 0):
+                isMaximum &= (logL >= padded[1+di:1+di+points, 1+dj:1+dj+points])
+    maxima = np.flatnonzero(isMaximum.ravel() & np.isfinite(logL.ravel()))
+    maxima = maxima[np.argsort(-logL.ravel()[maxima])][:count]
+    if (len(maxima) == 0):
+        maxima = [np.argmax(logL)]
+    return theta[maxima]
+
+def gridStart(T, B, Berr, mu=0.0, points=48, potential=None):
+    # starting point for fits: the best (sigma, epsilon) on a logarithmic grid over the
+    # prior box (see gridMaxima)
+    return gridMaxima(T, B, Berr, mu, points, potential=potential)[0]
+
+@profiled('mcmcChain')
+def mcmcChain(arguments):
+    # Run one random-walk Metropolis chain; arguments is the tuple
+    # (T, B, Berr, start, nSteps, nBurn, seed, mu, calcMethod, potential)
+    # During burn-in the proposal covariance is adapted every 250 steps to
+    # (2.38^2/2) times the covariance of the chain so far. Returns the post-burn-in
+    # samples, shape (nSteps, 2), and the acceptance rate after burn-in.
+    T, B, Berr, start, nSteps, nBurn, seed, mu, calcMethod, potential = arguments
+    random = np.random.RandomState(seed)
+    # standard normal steps and acceptance draws are generated up front; the proposal
+    # covariance enters through its Cholesky factor
+    steps = random.standard_normal((nBurn + nSteps, 2))
+    logUniform = np.log(random.uniform(size=nBurn + nSteps))
+    theta = np.array(start, dtype=float)
+    logP = logPosterior(theta, T, B, Berr, mu, calcMethod, potential)
+    proposal = np.diag(1.0E-3*theta)
+    history = np.zeros((nBurn + nSteps, 2))
+    accepted = 0
+    for step in range(nBurn + nSteps):
+        if (step < nBurn) and (step >= 250) and (step % 250 == 0):
+            proposal = np.linalg.cholesky((2.38**2.0/2.0)*np.cov(history[step//2:step].T) + np.diag((1.0E-8*theta)**2.0))
+        candidate = theta + np.dot(proposal, steps[step])
+        logPcandidate = logPosterior(candidate, T, B, Berr, mu, calcMethod, potential)
+        if (logUniform[step] < logPcandidate - logP):
+            theta = candidate
+            logP = logPcandidate
+            if (step >= nBurn):
+                accepted += 1
+        history[step] = theta
+    return history[nBurn:], accepted/float(max(nSteps, 1))
+
+def gelmanRubin(chains):
+    # potential scale reduction factor R-hat of each parameter, for chains of shape
+    # (nChains, nSteps, nParameters); values close to 1 indicate convergence
+    nSteps = chains.shape[1]
+    within = np.mean(np.var(chains, axis=1, ddof=1), axis=0)
+    between = nSteps*np.var(np.mean(chains, axis=1), axis=0, ddof=1)
+    return np.sqrt(((nSteps - 1.0)/nSteps*within + between/nSteps)/within)
+
+@profiled('mcmcFit')
+def mcmcFit(species, nChains=4, nSteps=20000, nBurn=5000, seed=0, processes=None, start=None, \
+    mu=0.0, calcMethod=fitCalcMethod, data=None, potential=None):
+    # Sample the posterior of (sigma, epsilon) for a species with nChains independent
+    # chains, run in a pool of processes (processes=1 runs them here, one after another)
+    # The chains start from small perturbations of start (default: gridStart), and chain
+    # k uses seed + k, so a fit is reproducible for a given seed. data may be given as
+    # (T, B, Berr) instead of loading the species, and potential is a model of
+    # virialPotentials (default Lennard-Jones).
+    # Returns a dict with the posterior 'mean' (sigma, epsilon), the 2x2 'cov', the
+    # pooled 'samples', the 'acceptance' rate of every chain and 'Rhat'.
+    if data is None:
+        data = fitData(species)
+    T, B, Berr = [np.array(column, dtype=float) for column in data]
+    if start is None:
+        start = gridStart(T, B, Berr, mu, potential=potential)
+    random = np.random.RandomState(seed)
+    starts = [np.array(start, dtype=float)*(1.0 + 1.0E-3*random.standard_normal(2)) for kk in range(nChains)]
+    arguments = [(T, B, Berr, starts[kk], nSteps, nBurn, seed + kk, mu, calcMethod, potential) for kk in range(nChains)]
+    if (processes == 1) or (nChains == 1):
+        results = [mcmcChain(argument) for argument in arguments]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = profileMap(pool, mcmcChain, arguments)
+        finally:
+            pool.close()
+            pool.join()
+    chains = np.array([result[0] for result in results])
+    samples = chains.reshape(-1, 2)
+    return {'species': species, 'mu': mu, 'potential': potential, 'mean': np.mean(samples, axis=0), \
+        'cov': np.cov(samples.T), 'samples': samples, 'acceptance': [result[1] for result in results], 'Rhat': gelmanRubin(chains)}
+
+@profiled('lsqFit')
+def lsqFit(species, start=None, maxIterations=50, tolerance=1.0E-10, data=None, nStarts=3, mu=0.0, potential=None):
+    # Weighted least-squares fit of (sigma, epsilon) for a species by Levenberg-Marquardt,
+    # minimizing chi^2 = sum(((B_model - B)/Berr)^2)
+    # The Jacobian comes from BcalcGradient: dB/dsigma and dB/depsilon follow from B* and
+    # dB*/dT* (and dB*/ddelta* with a dipole), which the Chebyshev series of the B* tables
+    # give along with their derivatives (BstarCalc differentiates under the integral only
+    # outside the table range), so an iteration costs one table lookup per data point and
+    # no finite differences.
+    # chi^2 often has more than one valley (small sigma with large epsilon against the
+    # usual one), so unless start is given the fit is run from the nStarts best local
+    # maxima of a coarse gridMaxima grid and the lowest chi^2 is kept. Each run stops
+    # when the relative step in both parameters is below tolerance. data may be given as
+    # (T, B, Berr) instead of loading the species. mu [Debyes] fits a Stockmayer fluid,
+    # and potential another model of virialPotentials.
+    # Returns a dict with the best-fit 'mean' (sigma, epsilon), its covariance 'cov'
+    # from the inverse of J^T J (so mvnString applies to it too), 'chi2' and 'iterations'.
+    if data is None:
+        data = fitData(species)
+    T, B, Berr = [np.array(column, dtype=float) for column in data]
+    if start is None:
+        starts = gridMaxima(T, B, Berr, mu, points=24, count=nStarts, potential=potential)
+    else:
+        starts = [start]
+    
+    def residualJacobian(theta):
+        B_model, dBdsigma, dBdepsilon = BcalcGradient(T, theta[0], theta[1], mu, potential)
+        return (B_model - B)/Berr, np.column_stack((dBdsigma/Berr, dBdepsilon/Berr))
+    
+    best = None
+    for start in starts:
+        theta = np.array(start, dtype=float)
+        residual, jacobian = residualJacobian(theta)
+        chi2 = np.sum(residual**2.0)
+        damping = 1.0E-3
+        for iteration in range(1, maxIterations + 1):
+            JTJ = np.dot(jacobian.T, jacobian)
+            JTr = np.dot(jacobian.T, residual)
+            # increase the damping until a step inside the prior box lowers chi^2
+            while True:
+                step = np.linalg.solve(JTJ + damping*np.diag(np.diag(JTJ)), -JTr)
+                candidate = theta + step
+                if inBounds(candidate):
+                    candidateResidual, candidateJacobian = residualJacobian(candidate)
+                    candidateChi2 = np.sum(candidateResidual**2.0)
+                    if (candidateChi2 <= chi2):
+                        break
+                damping = 10.0*damping
+                if (damping > 1.0E12):
+                    break
+            if (damping > 1.0E12):
+                break
+            theta, residual, jacobian, chi2 = candidate, candidateResidual, candidateJacobian, candidateChi2
+            damping = max(damping/10.0, 1.0E-12)
+            if np.all(np.abs(step) <= tolerance*np.abs(theta)):
+                break
+        if (best is None) or (chi2 < best['chi2']):
+            best = {'species': species, 'mu': mu, 'potential': potential, 'mean': theta, \
+                'cov': np.linalg.inv(np.dot(jacobian.T, jacobian)), 'chi2': chi2, 'iterations': iteration}
+    return best
+
+def mvnString(fit, nSamples=1000):
+    # the posterior in the form the notebook's multivariate normal cells use, e.g.
+    # np.random.multivariate_normal((3.861, 146.2), [[9.726E-07,-4.274E-05],[-4.274E-05,1.980E-03]], 1000)
+    mean = fit['mean']
+    cov = fit['cov']
+    return 'np.random.multivariate_normal((%.4g, %.5g), [[%.4E,%.4E],[%.4E,%.4E]], %d)' % \
+        (mean[0], mean[1], cov[0][0], cov[0][1], cov[1][0], cov[1][1], nSamples)
+
+if __name__ == '__main__':
+    import sys
+    for name in sys.argv[1:]:
+        fit = mcmcFit(name)
+        print(name + ': ' + mvnString(fit) + '   acceptance ' + \
+            ', '.join('%.2f' % rate for rate in fit['acceptance']) + '   R-hat ' + \
+            ', '.join('%.4f' % value for value in fit['Rhat']))
@@ -0,0 +1,997 @@
+# -*- coding: utf-8 -*- 
+
+# Functions needed by the virial coefficient database (databaseExp.py) and by
+# anything that evaluates virial coefficients without loading the data itself
+
+# Headers for Python
+import atexit
+import collections
+import math
+import shelve
+import warnings
+import numpy as np
+from virialProfile import profiled, profiler
+
+# error classes of Dymond & Smith, 1980, used by BerrCalc: percent and absolute
+# (cm^3 mol^-1) estimated precision of classes I, II and III
+BerrClasses = np.array([1, 2, 3])
+BerrPercentError = np.array([0.02, 0.10, 0.20])
+BerrCm3mol1Error = np.array([1.0, 15.0, 30.0])
+
+# radius grid used by Bcalc, from 0 to 100 Angstroms, shared by every call 
+BcalcRadius = np.linspace(0.0001, 100.0001, 10000)
+# number of temperatures integrated together by Bcalc, which bounds its work array
+BcalcTempBlock = 256
+# number of (parameter set, temperature) pairs integrated together by BcalcBatch
+BcalcBatchChunk = 256
+
+# reduced temperature range and layout of the tabulated Lennard-Jones B*(T*): 
+# piecewise Chebyshev polynomials in ln(T*), equally spaced pieces
+BstarTableRange = (0.05, 1000.0)
+BstarTablePieces = 32
+BstarTableDegree = 12
+# the table is built on first use and then shared by every species and parameter set
+BstarTable = None
+
+# terms of the series of the Lennard-Jones B*(T*) in T*^(-1/4) (see BstarSeries), enough
+# for T* >= BstarSeriesMin; below it BstarCalc is used
+BstarSeriesTerms = 140
+BstarSeriesMin = 0.05
+# coefficients of the series, computed on first use
+BstarSeriesCoeffs = None
+
+# orientation average of the Stockmayer dipole-dipole term, <exp(x*zeta)> (see
+# dipoleMoments): terms kept of its series, enough for x up to dipoleMaxX, beyond which
+# the averaged Boltzmann factor exceeds exp(690) and x is taken as dipoleMaxX
+dipoleTerms = 1024
+dipoleMaxX = 350.0
+# logs of the series coefficients, computed on first use
+dipoleLogMoments = None
+
+# reduced temperature range, reduced dipole range (delta*, see deltaCalc) and layout of the
+# tabulated Stockmayer B*(T*, delta*): Chebyshev polynomials in ln(T*) and delta* on a
+# grid of equally spaced pieces; outside it BstarDipoleCalc is used
+BstarDipoleTableRange = (0.2, 1000.0)
+BstarDipoleDeltaRange = (0.0, 3.0)
+BstarDipoleTablePieces = (32, 16)
+BstarDipoleTableDegree = (12, 12)
+# built on first use, like BstarTable
+BstarDipoleTable = None
+# points evaluated together by BstarDipoleTableEval, which bounds the coefficients gathered
+BstarDipoleTableBlock = 4096
+
+# 15-point Gauss-Kronrod rule on [-1, 1] and its embedded 7-point Gauss rule, used by
+# the adaptive quadrature (calcMethod = "Quad"); the difference of the two estimates the error
+BcalcKronrodNodes = np.array([-0.991455371120812639206854697526329, -0.949107912342758524526189684047851, \
+    -0.864864423359769072789712788640926, -0.741531185599394439863864773280788, -0.586087235467691130294144845693013, \
+    -0.405845151377397166906606412076961, -0.207784955007898467600689403773245, 0.0, \
+    0.207784955007898467600689403773245, 0.405845151377397166906606412076961, 0.586087235467691130294144845693013, \
+    0.741531185599394439863864773280788, 0.864864423359769072789712788640926, 0.949107912342758524526189684047851, \
+    0.991455371120812639206854697526329])
+BcalcKronrodWeights = np.array([0.022935322010529224963732008058970, 0.063092092629978553290700663189204, \
+    0.104790010322250183839876322541518, 0.140653259715525918745189590510238, 0.169004726639267902826583426598550, \
+    0.190350578064785409913256402421014, 0.204432940075298892414161999234649, 0.209482141084727828012999174891714, \
+    0.204432940075298892414161999234649, 0.190350578064785409913256402421014, 0.169004726639267902826583426598550, \
+    0.140653259715525918745189590510238, 0.104790010322250183839876322541518, 0.063092092629978553290700663189204, \
+    0.022935322010529224963732008058970])
+BcalcGaussWeights = np.array([0.0, 0.129484966168869693270611432679082, 0.0, 0.279705391489276667901467771423780, \
+    0.0, 0.381830050505118944950369775488975, 0.0, 0.417959183673469387755102040816327, \
+    0.0, 0.381830050505118944950369775488975, 0.0, 0.279705391489276667901467771423780, \
+    0.0, 0.129484966168869693270611432679082, 0.0])
+# default tolerance of the adaptive quadrature, relative to max(|B|, b0)
+BcalcQuadTol = 1.0E-8
+
+# default size and key tolerance of the Bcalc cache (see BcalcCache)
+BcalcCacheSize = 100000
+BcalcCacheTol = 1.0E-10
+
+@profiled('BerrCalc')
+def BerrCalc(Bvalues, DataQuality):
+    # determine the error class as defined by Dymond & Smith, 1980
+    # class I: estimated precision < 2% or < 1 cm^3 mol^-1, whichever is greater
+    # class II: estimated precision < 10% or < 15 cm^3 mol^-1, whichever is greater
+    # class III: estimated precision > 10% or > 15 cm^3 mol^-1, whichever is greater
+    # DataQuality may be a single class or an array of classes broadcast against Bvalues,
+    # so one call can assign errors across a whole concatenated dataset
+    Bvalues = np.asarray(Bvalues, dtype=float)
+    DataQuality = np.asarray(DataQuality)
+    known = np.isin(DataQuality, BerrClasses)
+    if not np.all(known):
+        raise ValueError('unknown data quality class(es) ' + str(np.unique(DataQuality[~known]).tolist()) + \
+            ', expected one of ' + str(BerrClasses.tolist()))
+    
+    # determine the error for every element at once
+    classIndex = np.searchsorted(BerrClasses, DataQuality)
+    percentEstimate = np.abs(Bvalues)*BerrPercentError[classIndex]
+    cm3mol1Estimate = BerrCm3mol1Error[classIndex]
+    return np.maximum(percentEstimate, cm3mol1Estimate)
+
+def deltaCalc(sigma, epsilon, mu):
+    # nondimensionalize the dipole moment by the well depth and collision diameter
+    # take the maximum value of the nondimensional dipole moment, defined by Kee (pp 496, 2003)
+    # sigma in Angstroms, epsilon in Kelvin, mu in Debyes; arrays are accepted elementwise
+    
+    # basic definitions needed in this function
+    k_B = 1.38064852E-23 # Boltzmann constant
+    epsilon_0 = 8.8541878176E-12 # permittivity of free space 
+    pi = np.pi # pi
+    
+    # the electric constant must be in here to be truly nondimensional, but then disagrees with tabulated results 
+    # The 1.0E-18 is to convert to statC, the 1.0E7 is convert to ergs, and the 1.0E-8 is to convert to cm 
+    delta_max = (((mu*1.0E-18)**2.0))/(2.0*epsilon*k_B*(1.0E7)*((sigma*1.0E-8)**3.0))
+    constantConvert = 1.0/(4*pi*epsilon_0*8.998E9) # divide delta_max by this number to convert for statC
+    # as a sanity check, this should give something close to unity 
+    return delta_max*constantConvert
+
+@profiled('Bcalc', suffix='calcMethod')
+def Bcalc(T, sigma, epsilon, mu, calcMethod, potential=None):
+    # Calculate the second coefficient of the virial equation of state using
+    # Lennard Jones / Stockmayer parameters
+    # T in Kelvin, sigma in Angstroms, epsilon in Kelvin, mu in Debyes
+    # T may be a scalar or an array of any shape; B is returned with the same shape,
+    # and all temperatures are evaluated together on one shared r* grid
+    # calcMethod = "Inf" is a full integration of the intermolecular potential on a
+    # fixed grid; "Quad" is an adaptive quadrature to a tolerance (see BcalcQuad),
+    # "Table" interpolates a precomputed table (see BstarInterp and BstarDipoleInterp),
+    # and "Series" sums the closed-form series of a Lennard-Jones fluid (see BstarSeries)
+    # With a dipole moment the dipole-dipole energy is averaged over the orientations of
+    # both molecules (see BstarDipoleCalc), by every method
+    # potential is a model of virialPotentials.potentialRegistry; other models than the
+    # default Lennard-Jones / Stockmayer potential are evaluated by BcalcPotential
+    
+    # basic definitions needed in this function
+    pi = np.pi # pi
+    
+    T = np.asarray(T, dtype=float)
+    
+    if potentialGeneric(potential, mu):
+        B_result = BcalcPotential(T.reshape(-1), np.array([sigma], dtype=float), np.array([epsilon], dtype=float), \
+            calcMethod, potential)[0].reshape(T.shape)
+    elif (calcMethod == "Inf"):
+        # use the full integration of the potential to infinity (or in this case 100 angstroms)
+        # This can apply to either a Lennard-Jones fluid or a Stockmayer fluid
+        # Taking the dipole-dipole energy at its most attractive orientation gave erroneously
+        # low values of B, so it is averaged over all orientations (see dipoleMayer)
+        # 
+        # Set up a grid from 0 to 100 Angstroms
+        radius = BcalcRadius
+        # non-dimensionalize the grid by the collision diameter, sigma
+        r_star = np.array(radius/sigma)
+        # nondimensionalize the dipole moment by the well depth and collision diameter
+        delta_star = deltaCalc(sigma, epsilon, mu)
+
+        # the reduced potential does not depend on temperature, so evaluate it only once
+        potential_star = 4.0*(r_star**(-12.0) - r_star**(-6.0))
+        
+        # create the integral for every temperature at once, one block of temperatures at a time
+        # so that the (temperatures x grid) work array stays small for long temperature sweeps
+        T_flat = T.reshape(-1)
+        integral_result = np.zeros(T_flat.shape)
+        for start in range(0, T_flat.size, BcalcTempBlock):
+            T_block = T_flat[start:start+BcalcTempBlock]
+            if (delta_star == 0.0):
+                integral_expression = (r_star**2.0)*(np.exp(-np.multiply.outer(epsilon/T_block, potential_star)) -1)
+            else:
+                integral_expression = (r_star**2.0)*dipoleMayer(-np.multiply.outer(epsilon/T_block, potential_star), \
+                    np.multiply.outer(epsilon/T_block, 2.0*delta_star*(r_star**(-3.0))))
+            integral_result[start:start+BcalcTempBlock] = np.trapz(integral_expression, x=r_star, axis=-1)
+        B_result = 0.6022140*(-2.0*pi*(sigma**3.0))*integral_result.reshape(T.shape)
+        profiler.count('Bcalc Inf integrand evaluations', T.size*radius.size)
+    elif (calcMethod == "Table"):
+        # interpolate the reduced coefficient, B = b0*B*(T*) for a Lennard-Jones fluid, from
+        # the precomputed table; see BcalcTableBound for the error against "Inf"
+        # A Stockmayer fluid has B = b0*B*(T*, delta*), from a table of its own
+        if np.all(mu == 0.0):
+            B_result = (2.0/3.0)*pi*0.6022140*(sigma**3.0)*BstarInterp(T/epsilon)
+        else:
+            B_result = (2.0/3.0)*pi*0.6022140*(sigma**3.0)*BstarDipoleInterp(T/epsilon, deltaCalc(sigma, epsilon, mu))
+    elif (calcMethod == "Quad"):
+        B_result = BcalcQuad(T, sigma, epsilon, mu)[0]
+    elif (calcMethod == "Series"):
+        # B = b0*B*(T*) from the series, accurate to rounding and with no radial grid
+        if np.any(mu != 0.0):
+            raise ValueError('calcMethod "Series" is only available for Lennard-Jones fluids (mu = 0.0)')
+        B_result = (2.0/3.0)*pi*0.6022140*(sigma**3.0)*BstarSeries(T/epsilon)
+    else:
+        raise ValueError('unknown calcMethod ' + repr(calcMethod) + ', expected "Inf", "Quad", "Table" or "Series"')
+    if (B_result.ndim == 0):
+        B_result = B_result[()]
+    return B_result
+
+@profiled('BcalcBatch', suffix='calcMethod')
+def BcalcBatch(T, sigma, epsilon, mu, calcMethod, chunkSize=BcalcBatchChunk, potential=None):
+    # Calculate the second virial coefficient for an ensemble of parameter sets,
+    # e.g. (sigma, epsilon) samples drawn from a multivariate normal
+    # sigma, epsilon and mu are broadcast against each other to N parameter sets;
+    # the result has shape (N,) + T.shape, one row per parameter set
+    # Work is done in chunks of at most chunkSize (parameter set, temperature) pairs,
+    # so the memory used is bounded by chunkSize times the radius grid, not by N x N_T
+    # potential is a model of virialPotentials.potentialRegistry, as in Bcalc
+    
+    # basic definitions needed in this function
+    pi = np.pi # pi
+    
+    T = np.asarray(T, dtype=float)
+    sigma, epsilon, mu = np.broadcast_arrays(np.atleast_1d(np.asarray(sigma, dtype=float)), \
+        np.atleast_1d(np.asarray(epsilon, dtype=float)), np.atleast_1d(np.asarray(mu, dtype=float)))
+    sigma = sigma.reshape(-1)
+    epsilon = epsilon.reshape(-1)
+    mu = mu.reshape(-1)
+    
+    T_flat = T.reshape(-1)
+    B_result = np.zeros((sigma.size, T_flat.size))
+    
+    if potentialGeneric(potential, mu):
+        B_result = BcalcPotential(T_flat, sigma, epsilon, calcMethod, potential, chunkSize)
+    elif (calcMethod == "Inf"):
+        # same integration as Bcalc, with the grid non-dimensionalized by each sigma
+        radius = BcalcRadius
+        delta_star = deltaCalc(sigma, epsilon, mu)
+        # parameter sets per chunk, and temperatures per block within a chunk
+        setsPerChunk = max(1, min(sigma.size, chunkSize//max(1, T_flat.size)))
+        for setStart in range(0, sigma.size, setsPerChunk):
+            sets = slice(setStart, setStart+setsPerChunk)
+            r_star = radius[np.newaxis,:]/sigma[sets,np.newaxis]
+            r6 = r_star**(-6.0)
+            potential_star = 4.0*(r6*r6 - r6)
+            polar = np.any(delta_star[sets] != 0.0)
+            tempsPerBlock = max(1, chunkSize//r_star.shape[0])
+            for start in range(0, T_flat.size, tempsPerBlock):
+                T_block = T_flat[start:start+tempsPerBlock]
+                if not polar:
+                    integral_expression = (r_star[:,np.newaxis,:]**2.0)*(np.exp(-(epsilon[sets,np.newaxis,np.newaxis]/T_block[np.newaxis,:,np.newaxis]) \
+                        *potential_star[:,np.newaxis,:]) -1)
+                else:
+                    inverseTstar = epsilon[sets,np.newaxis,np.newaxis]/T_block[np.newaxis,:,np.newaxis]
+                    integral_expression = (r_star[:,np.newaxis,:]**2.0)*dipoleMayer(-inverseTstar*potential_star[:,np.newaxis,:], \
+                        inverseTstar*(2.0*delta_star[sets,np.newaxis]*(r_star**(-3.0)))[:,np.newaxis,:])
+                B_result[sets,start:start+tempsPerBlock] = np.trapz(integral_expression, x=r_star[:,np.newaxis,:], axis=-1)
+            B_result[sets,:] *= 0.6022140*(-2.0*pi*(sigma[sets,np.newaxis]**3.0))
+        profiler.count('Bcalc Inf integrand evaluations', sigma.size*T_flat.size*radius.size)
+    elif (calcMethod == "Table"):
+        # same as Bcalc, every (parameter set, temperature) pair is a single table lookup,
+        # in the Stockmayer table for the sets with a dipole
+        polar = (mu != 0.0)
+        B_result[~polar,:] = (2.0/3.0)*pi*0.6022140*(sigma[~polar,np.newaxis]**3.0)* \
+            BstarInterp(T_flat[np.newaxis,:]/epsilon[~polar,np.newaxis])
+        if np.any(polar):
+            B_result[polar,:] = (2.0/3.0)*pi*0.6022140*(sigma[polar,np.newaxis]**3.0)* \
+                BstarDipoleInterp(T_flat[np.newaxis,:]/epsilon[polar,np.newaxis], deltaCalc(sigma, epsilon, mu)[polar,np.newaxis])
+    elif (calcMethod == "Quad"):
+        # Lennard-Jones sets share one reduced integrand, so all their (T*) values go through
+        # the quadrature together, chunkSize at a time; sets with a dipole are done one by one
+        delta_star = deltaCalc(sigma, epsilon, mu)
+        polar = (delta_star != 0.0)
+        Tstar = (T_flat[np.newaxis,:]/epsilon[~polar,np.newaxis]).reshape(-1)
+        Bstar = np.zeros(Tstar.shape)
+        for start in range(0, Tstar.size, chunkSize):
+            Tstar_chunk = Tstar[start:start+chunkSize]
+            Bstar[start:start+chunkSize], Bstar_err, evaluations = BstarQuad(Tstar_chunk, 0.0, 0.0, BcalcQuadTol)
+            profiler.count('Bcalc Quad integrand evaluations', evaluations*Tstar_chunk.size)
+        B_result[~polar,:] = (2.0/3.0)*pi*0.6022140*(sigma[~polar,np.newaxis]**3.0)*Bstar.reshape(-1, T_flat.size)
+        for ii in np.flatnonzero(polar):
+            B_result[ii,:] = BcalcQuad(T_flat, sigma[ii], epsilon[ii], mu[ii])[0]
+    elif (calcMethod == "Series"):
+        # same as Bcalc, one series evaluation for every (parameter set, temperature) pair
+        if np.any(mu != 0.0):
+            raise ValueError('calcMethod "Series" is only available for Lennard-Jones fluids (mu = 0.0)')
+        B_result = (2.0/3.0)*pi*0.6022140*(sigma[:,np.newaxis]**3.0)*BstarSeries(T_flat[np.newaxis,:]/epsilon[:,np.newaxis])
+    else:
+        raise ValueError('unknown calcMethod ' + repr(calcMethod) + ', expected "Inf", "Quad", "Table" or "Series"')
+    return B_result.reshape((sigma.size,) + T.shape)
+
+def potentialGeneric(potential, mu):
+    # True if potential is a model of virialPotentials other than Lennard-Jones, which
+    # Bcalc then hands to BcalcPotential; only the Lennard-Jones potential takes a dipole
+    if (potential is None) or (potential.name == "LJ"):
+        return False
+    if np.any(np.asarray(mu) != 0.0):
+        raise ValueError('a dipole moment is only supported by the Lennard-Jones (Stockmayer) potential, not by ' + \
+            repr(potential))
+    return True
+
+def BcalcPotential(T, sigma, epsilon, calcMethod, potential, chunkSize=BcalcBatchChunk):
+    # Second virial coefficient [cm^3/mol] of a potential model of virialPotentials for N
+    # parameter sets (1-D sigma and epsilon) at the 1-D array of temperatures T; returns
+    # shape (N, T.size). Used by Bcalc and BcalcBatch for every model but Lennard-Jones.
+    # Every model is reduced by its sigma and epsilon, B = b0*B*(T/epsilon), and the methods
+    # are those of the Lennard-Jones potential: "Inf" integrates potential.reduced on the
+    # shared radius grid, "Quad" runs BstarQuad on it, and "Table" interpolates the B*(T*)
+    # table of the model (see Potential.Bstar). A model with an analytic B* (square-well)
+    # uses it for every method.
+    pi = np.pi # pi
+    Tstar = T[np.newaxis,:]/epsilon[:,np.newaxis]
+    b0 = (2.0/3.0)*pi*0.6022140*(sigma**3.0)
+    if potential.analytic or (calcMethod == "Table"):
+        return b0[:,np.newaxis]*potential.Bstar(Tstar)
+    if (calcMethod == "Quad"):
+        Tstar = Tstar.reshape(-1)
+        Bstar = np.zeros(Tstar.shape)
+        for start in range(0, Tstar.size, chunkSize):
+            Tstar_chunk = Tstar[start:start+chunkSize]
+            Bstar[start:start+chunkSize], Bstar_err, evaluations = BstarQuad(Tstar_chunk, 0.0, 0.0, BcalcQuadTol, \
+                potential=potential)
+            profiler.count('Bcalc Quad integrand evaluations', evaluations*Tstar_chunk.size)
+        return b0[:,np.newaxis]*Bstar.reshape(-1, T.size)
+    if (calcMethod != "Inf"):
+        raise ValueError('unknown calcMethod ' + repr(calcMethod) + ', expected "Inf", "Quad" or "Table" ' + \
+            '("Series" is only available for the Lennard-Jones potential)')
+    # same blocks as the "Inf" method of BcalcBatch
+    radius = BcalcRadius
+    B_result = np.zeros((sigma.size, T.size))
+    setsPerChunk = max(1, min(sigma.size, chunkSize//max(1, T.size)))
+    for setStart in range(0, sigma.size, setsPerChunk):
+        sets = slice(setStart, setStart+setsPerChunk)
+        r_star = radius[np.newaxis,:]/sigma[sets,np.newaxis]
+        potential_star = potential.reduced(r_star)
+        tempsPerBlock = max(1, chunkSize//r_star.shape[0])
+        for start in range(0, T.size, tempsPerBlock):
+            # exp(-u*/T*) - 1 as in potential.mayer, with u* evaluated once per chunk
+            with np.errstate(over='ignore'):
+                mayer = np.expm1(-potential_star[:,np.newaxis,:]/Tstar[sets,start:start+tempsPerBlock,np.newaxis])
+            B_result[sets,start:start+tempsPerBlock] = np.trapz((r_star[:,np.newaxis,:]**2.0)*mayer, \
+                x=r_star[:,np.newaxis,:], axis=-1)
+        B_result[sets,:] *= 0.6022140*(-2.0*pi*(sigma[sets,np.newaxis]**3.0))
+    profiler.count('Bcalc Inf integrand evaluations', sigma.size*T.size*radius.size)
+    return B_result
+
+def BcalcQuad(T, sigma, epsilon, mu, tol=BcalcQuadTol):
+    # Second virial coefficient by adaptive Gauss-Kronrod quadrature (see BstarQuad),
+    # using a few hundred evaluations of the integrand instead of the 10,000 of "Inf"
+    # Returns (B, Berr, evaluations): B and the estimated error in B, both in cm^3/mol
+    # with the shape of T, and the number of integrand evaluations per temperature
+    # The estimate meets Berr <= tol*max(|B|, b0), b0 = (2/3)*pi*N_A*sigma^3
+    # The integral runs to infinity: averaged over orientations, the dipole-dipole term
+    # falls off as r^-6 like the dispersion term
+    T = np.asarray(T, dtype=float)
+    b0 = (2.0/3.0)*np.pi*0.6022140*(sigma**3.0)
+    delta_star = deltaCalc(sigma, epsilon, mu)
+    Bstar, Bstar_err, evaluations = BstarQuad((T/epsilon).reshape(-1), delta_star, 0.0, tol)
+    profiler.count('Bcalc Quad integrand evaluations', evaluations*T.size)
+    B_result = b0*Bstar.reshape(T.shape)
+    B_error = b0*Bstar_err.reshape(T.shape)
+    if (B_result.ndim == 0):
+        B_result = B_result[()]
+        B_error = B_error[()]
+    return B_result, B_error, evaluations
+
+def BstarQuadPanels(lower, upper, kind, Tstar, delta_star, potential=None):
+    # Apply the 15-point Gauss-Kronrod rule to each panel [lower, upper] of the reduced
+    # integral -3*int r*^2 (exp(-u*/T*) - 1) dr*, for every T* at once (with a dipole, the
+    # Boltzmann factor averaged over orientations, see dipoleMayer), or of the Mayer function
+    # of a potential model of virialPotentials
+    # Panels of kind 0 are in r*; panels of kind 1 are in t = 1/r*, which maps the
+    # long-range tail onto a finite interval (dr* = -dt/t^2)
+    # Returns the Kronrod estimate and |Kronrod - Gauss| for each (T*, panel)
+    half = 0.5*(upper - lower)
+    x = 0.5*(upper + lower)[:,np.newaxis] + half[:,np.newaxis]*BcalcKronrodNodes
+    inTail = (kind == 1)[:,np.newaxis]
+    r_star = np.where(inTail, 1.0/x, x)
+    jacobian = np.where(inTail, x**(-2.0), 1.0)
+    if potential is not None:
+        mayer = potential.mayer(r_star[np.newaxis,:,:], Tstar[:,np.newaxis,np.newaxis])
+    else:
+        potential_star = 4.0*(r_star**(-12.0) - r_star**(-6.0))
+        lnBoltzmann = -potential_star[np.newaxis,:,:]/Tstar[:,np.newaxis,np.newaxis]
+        if (delta_star == 0.0):
+            mayer = np.expm1(lnBoltzmann)
+        else:
+            mayer = dipoleMayer(lnBoltzmann, 2.0*delta_star*(r_star[np.newaxis,:,:]**(-3.0))/Tstar[:,np.newaxis,np.newaxis])
+    integrand = -3.0*jacobian*(r_star**2.0)*mayer
+    kronrod = half*np.sum(integrand*BcalcKronrodWeights, axis=-1)
+    gauss = half*np.sum(integrand*BcalcGaussWeights, axis=-1)
+    return kronrod, np.abs(kronrod - gauss)
+
+def BstarQuad(Tstar, delta_star, t_cut, tol, maxIterations=50, potential=None):
+    # Reduced second virial coefficient B* by globally adaptive quadrature, vectorized
+    # over the 1-D array Tstar (all reduced temperatures share the same panels)
+    # - r* below r_core, where exp(-u*/T*) < exp(-700) even for the most attractive
+    #   orientation of a dipole, contributes exactly -r_core^3/3 to the integral, i.e.
+    #   r_core^3 to B*
+    # - r_core < r* < 3 starts as five panels, narrowest across the repulsive wall and
+    #   the bottom of the well
+    # - r* > 3 is one panel in t = 1/r* from t_cut to 1/3 (t_cut = 0 integrates to infinity)
+    # Every iteration bisects the panels contributing most to the error, until
+    # sum(|Kronrod - Gauss|) <= tol*max(|B*|, 1) at every T*; if maxIterations bisections
+    # do not get there, the estimate after the last one is returned with a RuntimeWarning
+    # At the default tol = 1E-8 a single Lennard-Jones T* in 0.3-1000 takes 120-210
+    # evaluations (170 on average, some 60 times fewer than the 10,000 of "Inf");
+    # T* evaluated together share their panels and need more of them (330 for 25 T* over
+    # the same range), as do strong dipoles
+    # Returns (Bstar, Bstar_err, evaluations), evaluations counted per T*
+    # With a potential model of virialPotentials (and delta_star = 0) the integrand is its
+    # Mayer function; r_core is found the same way from its reduced potential, and stops
+    # at once inside a hard core, where u* is infinite
+    Tstar = np.asarray(Tstar, dtype=float)
+    if (Tstar.size == 0):
+        return np.zeros(0), np.zeros(0), 0
+    r_core = 0.5
+    if potential is not None:
+        while (potential.reduced(np.array(r_core)) < 700.0*np.max(Tstar)):
+            r_core = 0.9*r_core
+    else:
+        while (4.0*(r_core**(-12.0) - r_core**(-6.0) - delta_star*(r_core**(-3.0))) < 700.0*np.max(Tstar)):
+            r_core = 0.9*r_core
+    
+    lower = np.array([r_core, 0.85, 1.0, 1.3, 2.0, t_cut])
+    upper = np.array([0.85, 1.0, 1.3, 2.0, 3.0, 1.0/3.0])
+    kind = np.array([0, 0, 0, 0, 0, 1])
+    panelB, panelErr = BstarQuadPanels(lower, upper, kind, Tstar, delta_star, potential)
+    evaluations = lower.size*BcalcKronrodNodes.size
+    for iteration in range(maxIterations + 1):
+        Bstar = r_core**3.0 + np.sum(panelB, axis=-1)
+        Bstar_err = np.sum(panelErr, axis=-1)
+        scale = np.maximum(np.abs(Bstar), 1.0)
+        if np.all(Bstar_err <= tol*scale):
+            break
+        if (iteration == maxIterations):
+            warnings.warn('BstarQuad did not reach tol = ' + str(tol) + ' in ' + str(maxIterations) + \
+                ' iterations; the largest error estimate is ' + str(np.max(Bstar_err/scale)) + \
+                ' relative to max(|B*|, 1)', RuntimeWarning)
+            break
+        # bisect every panel within a factor of four of the worst one
+        panelWorst = np.max(panelErr/scale[:,np.newaxis], axis=0)
+        split = (panelWorst >= 0.25*np.max(panelWorst))
+        middle = 0.5*(lower[split] + upper[split])
+        newLower = np.concatenate((lower[split], middle))
+        newUpper = np.concatenate((middle, upper[split]))
+        newKind = np.concatenate((kind[split], kind[split]))
+        newB, newErr = BstarQuadPanels(newLower, newUpper, newKind, Tstar, delta_star, potential)
+        evaluations = evaluations + newLower.size*BcalcKronrodNodes.size
+        lower = np.concatenate((lower[~split], newLower))
+        upper = np.concatenate((upper[~split], newUpper))
+        kind = np.concatenate((kind[~split], newKind))
+        panelB = np.concatenate((panelB[:,~split], newB), axis=1)
+        panelErr = np.concatenate((panelErr[:,~split], newErr), axis=1)
+    return Bstar, Bstar_err, evaluations
+
+def BstarNodes():
+    # Quadrature nodes r* and weights used by BstarCalc for r* > 0.2 (below r* = 0.2
+    # the Boltzmann factor is below exp(-1E9/T*), so that part is exactly -r*^3/3)
+    # - 0.2 < r* < 5: composite 16-point Gauss-Legendre on 96 panels
+    # - r* > 5: substitute t = 1/r* (dr* = dt/t^2) and integrate t from 0 to 0.2 with
+    #   32-point Gauss-Legendre
+    nodes, weights = np.polynomial.legendre.leggauss(16)
+    edges = np.linspace(0.2, 5.0, 97)
+    half = 0.5*np.diff(edges)
+    r_star = (0.5*(edges[1:] + edges[:-1])[:, np.newaxis] + half[:, np.newaxis]*nodes).reshape(-1)
+    r_weights = (half[:, np.newaxis]*weights).reshape(-1)
+    nodes, weights = np.polynomial.legendre.leggauss(32)
+    t = 0.1*(nodes + 1.0)
+    t_weights = 0.1*weights
+    return np.concatenate((r_star, 1.0/t)), np.concatenate((r_weights, t_weights*(t**(-2.0))))
+
+def BstarCalc(Tstar, derivative=False):
+    # Reduced second virial coefficient of a Lennard-Jones fluid, B* = B/b0 with
+    # b0 = (2/3)*pi*N_A*sigma^3, from a high-order quadrature of
+    # B* = -3*int_0^inf r*^2 (exp(-u*(r*)/T*) - 1) dr*,   u* = 4*(r*^-12 - r*^-6)
+    # Tstar may be an array of any shape. This is the reference the table is built from.
+    # With derivative=True, (B*, dB*/dT*) is returned, the derivative being taken under
+    # the integral, dB*/dT* = -3*int_0^inf r*^2 exp(-u*/T*) u*/T*^2 dr*
+    Tstar = np.asarray(Tstar, dtype=float)[..., np.newaxis]
+    r_core = 0.2
+    r_star, r_weights = BstarNodes()
+    potential_star = 4.0*(r_star**(-12.0) - r_star**(-6.0))
+    boltzmann = np.expm1(-potential_star/Tstar)
+    profiler.count('BstarCalc integrand evaluations', boltzmann.size)
+    Bstar = -3.0*(-(r_core**3.0)/3.0 + np.sum(r_weights*(r_star**2.0)*boltzmann, axis=-1))
+    if not derivative:
+        return Bstar
+    dBstar = -3.0*np.sum(r_weights*(r_star**2.0)*(boltzmann + 1.0)*potential_star, axis=-1)/(Tstar[..., 0]**2.0)
+    return Bstar, dBstar
+
+def BstarSeriesCoefficients(terms=BstarSeriesTerms):
+    # b_j = -(2^(j+1/2)/(4 j!))*Gamma((2j-1)/4), j = 0 .. terms-1, from log-gamma so that
+    # neither the factorial nor the Gamma function overflows; only Gamma(-1/4) is negative
+    coeffs = np.zeros(terms)
+    for jj in range(terms):
+        sign = 1.0 if (jj == 0) else -1.0
+        coeffs[jj] = sign*math.exp((jj + 0.5)*math.log(2.0) - math.log(4.0) - math.lgamma(jj + 1.0) + \
+            math.lgamma((2.0*jj - 1.0)/4.0))
+    return coeffs
+
+def BstarSeries(Tstar, derivative=False):
+    # Reduced second virial coefficient of a Lennard-Jones fluid from its convergent
+    # series (Hirschfelder, Curtiss & Bird, 1954, p. 163)
+    # B* = sum_j b_j*T*^(-(2j+1)/4),   b_j = -(2^(j+1/2)/(4 j!))*Gamma((2j-1)/4)
+    # summed by Horner's rule in T*^(-1/2) with BstarSeriesTerms terms, all temperatures
+    # at once and with no radial grid. Every term but the first has the same sign, so
+    # nothing cancels except near the Boyle temperature, and the terms left out are below
+    # 1E-17*max(|B*|, 1) for T* >= BstarSeriesMin; below it BstarCalc is used. As it does
+    # not depend on any quadrature, it is the reference to check the integrators against.
+    # With derivative=True, (B*, dB*/dT*) is returned, dB*/dT* = -sum_j ((2j+1)/4)*b_j*T*^(-(2j+5)/4)
+    global BstarSeriesCoeffs
+    if (BstarSeriesCoeffs is None):
+        BstarSeriesCoeffs = BstarSeriesCoefficients()
+    Tstar = np.asarray(Tstar, dtype=float)
+    inRange = (Tstar >= BstarSeriesMin)
+    if not np.all(inRange):
+        results = [np.zeros(Tstar.shape), np.zeros(Tstar.shape)]
+        inside = BstarSeries(Tstar[inRange], True)
+        outside = BstarCalc(Tstar[~inRange], True)
+        for result, valuesInside, valuesOutside in zip(results, inside, outside):
+            result[inRange] = valuesInside
+            result[~inRange] = valuesOutside
+        if not derivative:
+            return results[0]
+        return tuple(results)
+    x = Tstar**(-0.25)
+    y = x*x
+    series = np.zeros(Tstar.shape)
+    for jj in range(BstarSeriesCoeffs.size - 1, -1, -1):
+        series = series*y + BstarSeriesCoeffs[jj]
+    Bstar = x*series
+    if not derivative:
+        return Bstar
+    dseries = np.zeros(Tstar.shape)
+    for jj in range(BstarSeriesCoeffs.size - 1, -1, -1):
+        dseries = dseries*y + (2.0*jj + 1.0)*BstarSeriesCoeffs[jj]
+    return Bstar, -x*dseries/(4.0*Tstar)
+
+def BcalcGradient(T, sigma, epsilon, mu=0.0, potential=None):
+    # Second virial coefficient of a Lennard-Jones fluid and its derivatives with respect
+    # to sigma and epsilon, from the B*(T*) table and the derivative of its Chebyshev
+    # series (BstarInterp with derivative=True; BstarCalc differentiates under the
+    # integral outside the table range): B = b0*B*(T/epsilon), so dB/dsigma = 3*B/sigma and
+    # dB/depsilon = -b0*(T/epsilon^2)*dB*/dT*
+    # With a dipole, B = b0*B*(T/epsilon, delta*) from BstarDipoleInterp, and as
+    # delta* = mu^2/(2 epsilon sigma^3), ddelta*/dsigma = -3*delta*/sigma and
+    # ddelta*/depsilon = -delta*/epsilon
+    # Other potential models of virialPotentials use the same relations with B*(T*) and
+    # its derivative from the model (see Potential.Bstar)
+    # Returns (B, dBdsigma, dBdepsilon) with the shape of T, in cm^3/mol, cm^3/mol/Angstrom
+    # and cm^3/mol/K
+    T = np.asarray(T, dtype=float)
+    b0 = (2.0/3.0)*np.pi*0.6022140*(sigma**3.0)
+    if potentialGeneric(potential, mu):
+        Bstar, dBstar = potential.Bstar(T/epsilon, derivative=True)
+        B_result = b0*Bstar
+        return B_result, 3.0*B_result/sigma, -b0*T/(epsilon**2.0)*dBstar
+    if np.all(mu == 0.0):
+        Bstar, dBstar = BstarInterp(T/epsilon, derivative=True)
+        B_result = b0*Bstar
+        return B_result, 3.0*B_result/sigma, -b0*T/(epsilon**2.0)*dBstar
+    delta_star = deltaCalc(sigma, epsilon, mu)
+    Bstar, dBstar, dBstar_ddelta = BstarDipoleInterp(T/epsilon, delta_star, derivative=True)
+    B_result = b0*Bstar
+    return B_result, 3.0*B_result/sigma - 3.0*b0*dBstar_ddelta*delta_star/sigma, \
+        -b0*(T/(epsilon**2.0)*dBstar + dBstar_ddelta*delta_star/epsilon)
+
+@profiled('BstarTableBuild')
+def BstarTableBuild(TstarRange=BstarTableRange, pieces=BstarTablePieces, degree=BstarTableDegree, reference=BstarCalc):
+    # Build the B*(T*) table: on each piece of ln(T*) the smooth function ln(1 - B*)
+    # is interpolated at Chebyshev points (1 - B* > 0 everywhere, and the log tames
+    # the exponential growth of -B* at low T*)
+    # The interpolation error is then checked against BstarCalc halfway between every
+    # pair of nodes and at the piece edges, where it is largest; the table stores
+    # ten times the worst relative error found, as a bound on |dB*|/(1 - B*)
+    # reference replaces BstarCalc to tabulate another potential (see virialPotentials)
+    edges = np.linspace(np.log(TstarRange[0]), np.log(TstarRange[1]), pieces+1)
+    chebNodes = np.cos(np.pi*(np.arange(degree+1) + 0.5)/(degree+1))
+    lnTstar = 0.5*(edges[1:] + edges[:-1])[:, np.newaxis] + 0.5*np.diff(edges)[:, np.newaxis]*chebNodes
+    values = np.log(1.0 - reference(np.exp(lnTstar)))
+    coeffs = np.array([np.polynomial.chebyshev.chebfit(chebNodes, values[ii], degree) for ii in range(pieces)])
+    table = {'edges': edges, 'coeffs': coeffs, 'TstarRange': TstarRange, 'error': 0.0}
+    
+    checkNodes = np.sort(np.concatenate(([-1.0, 1.0], 0.5*(chebNodes[1:] + chebNodes[:-1]))))
+    lnTstar = 0.5*(edges[1:] + edges[:-1])[:, np.newaxis] + 0.5*np.diff(edges)[:, np.newaxis]*checkNodes
+    Bstar_check = reference(np.exp(lnTstar))
+    Bstar_table = BstarTableEval(table, np.exp(lnTstar))
+    table['error'] = 10.0*np.max(np.abs(Bstar_table - Bstar_check)/(1.0 - Bstar_check))
+    return table
+
+def BstarTableClenshaw(pointCoeffs, z):
+    # sum_k pointCoeffs[k]*T_k(z) by the Clenshaw recurrence, with the degree as the
+    # leading axis of pointCoeffs
+    b1 = np.zeros(z.shape)
+    b2 = np.zeros(z.shape)
+    for kk in range(pointCoeffs.shape[0] - 1, 0, -1):
+        b1, b2 = 2.0*z*b1 - b2 + pointCoeffs[kk], b1
+    return z*b1 - b2 + pointCoeffs[0]
+
+def BstarTableEval(table, Tstar, derivative=False):
+    # Evaluate a B*(T*) table built by BstarTableBuild with the Clenshaw recurrence,
+    # vectorized over Tstar (which must lie inside the table range)
+    # With derivative=True, (B*, dB*/dT*) is returned, differentiating the Chebyshev
+    # series of f = ln(1 - B*): dB*/dT* = -(1 - B*)*(df/dz)*(dz/dlnT*)/T*
+    edges = table['edges']
+    coeffs = table['coeffs']
+    lnTstar = np.log(Tstar)
+    profiler.count('BstarTable lookups', lnTstar.size)
+    piece = np.clip(np.searchsorted(edges, lnTstar) - 1, 0, coeffs.shape[0] - 1)
+    width = edges[piece+1] - edges[piece]
+    z = (2.0*lnTstar - edges[piece] - edges[piece+1])/width
+    # gather the coefficients of every point once, with the degree as the leading axis
+    Bstar = 1.0 - np.exp(BstarTableClenshaw(np.moveaxis(coeffs[piece], -1, 0), z))
+    if not derivative:
+        return Bstar
+    if 'derivativeCoeffs' not in table:
+        table['derivativeCoeffs'] = np.polynomial.chebyshev.chebder(coeffs, axis=1)
+    dfdz = BstarTableClenshaw(np.moveaxis(table['derivativeCoeffs'][piece], -1, 0), z)
+    return Bstar, -(1.0 - Bstar)*dfdz*(2.0/width)/Tstar
+
+def BstarTableGet():
+    # Return the shared B*(T*) table, building it the first time it is needed
+    global BstarTable
+    if (BstarTable is None):
+        BstarTable = BstarTableBuild()
+    return BstarTable
+
+def BstarInterp(Tstar, derivative=False):
+    # Reduced second virial coefficient of a Lennard-Jones fluid from the table;
+    # reduced temperatures outside the table range fall back to BstarCalc
+    # With derivative=True, (B*, dB*/dT*) is returned (see BstarTableEval)
+    return BstarTableLookup(BstarTableGet(), BstarCalc, Tstar, derivative)
+
+def BstarTableLookup(table, reference, Tstar, derivative=False):
+    # B* (and dB*/dT* with derivative=True) from a table built by BstarTableBuild, and
+    # from reference(Tstar, derivative) for reduced temperatures outside its range
+    Tstar = np.asarray(Tstar, dtype=float)
+    inRange = (Tstar >= table['TstarRange'][0]) & (Tstar <= table['TstarRange'][1])
+    if np.all(inRange):
+        return BstarTableEval(table, Tstar, derivative)
+    if not derivative:
+        Bstar_result = np.zeros(Tstar.shape)
+        Bstar_result[inRange] = BstarTableEval(table, Tstar[inRange])
+        Bstar_result[~inRange] = reference(Tstar[~inRange])
+        return Bstar_result
+    Bstar_result = np.zeros(Tstar.shape)
+    dBstar_result = np.zeros(Tstar.shape)
+    Bstar_result[inRange], dBstar_result[inRange] = BstarTableEval(table, Tstar[inRange], True)
+    Bstar_result[~inRange], dBstar_result[~inRange] = reference(Tstar[~inRange], True)
+    return Bstar_result, dBstar_result
+
+def BcalcTableBound(T, sigma, epsilon):
+    # Upper bound on |Bcalc(T, sigma, epsilon, 0.0, "Table") - Bcalc(T, sigma, epsilon, 0.0, "Inf")|
+    # in cm^3/mol. Three parts, in units of b0:
+    # - the table interpolation error, error*(1 - B*)
+    # - the part of the integral beyond r* = R = 100.0001/sigma that "Inf" leaves out;
+    #   there |u*| < 4*r*^-6, so |exp(-u*/T*) - 1| < (4*r*^-6/T*)*exp(4*R^-6/T*) and the
+    #   missing part of B* is at most 4*exp(4*R^-6/T*)/(T* R^3)
+    # - a 1E-9 relative allowance for the trapezoid rule on the 0.01 Angstrom grid,
+    #   which was found to contribute less than 1E-14 relative for 1.3 < sigma < 8.1
+    #   and 0.05 < T* < 1000
+    T = np.asarray(T, dtype=float)
+    Tstar = T/epsilon
+    b0 = (2.0/3.0)*np.pi*0.6022140*(sigma**3.0)
+    Bstar = BstarInterp(Tstar)
+    R = BcalcRadius[-1]/sigma
+    truncation = 4.0*np.exp(4.0*(R**(-6.0))/Tstar)/(Tstar*(R**3.0))
+    return b0*(BstarTableGet()['error']*(1.0 - Bstar) + 1.001*truncation + 1.0E-9*np.abs(Bstar))
+
+def dipoleMoments(terms=dipoleTerms):
+    # ln(c_n), n = 0 ... terms-1, of the series <exp(x*zeta)> = sum_n c_n*x^2n: the
+    # Boltzmann factor of the dipole-dipole energy averaged over the directions of both
+    # dipoles, zeta = 2*cos(th1)*cos(th2) - sin(th1)*sin(th2)*cos(phi), c_n = <zeta^2n>/(2n)!
+    # Expanding zeta^2n, only even powers of cos(phi) survive the average, so
+    # <zeta^2n> = sum_m C(2n,2m)*4^(n-m)*<c^(2n-2m)*s^2m>^2*<cos(phi)^2m>, with
+    # <c^2p*s^2m> = Gamma(p+1/2)*Gamma(m+1)/(2*Gamma(p+m+3/2)) for cos(th) uniform on [-1, 1]
+    # and <cos(phi)^2m> = C(2m,m)/4^m; every term is positive, so they are summed as logs
+    lnFactorial = np.array([math.lgamma(k + 1.0) for k in range(2*terms + 1)])
+    lnGammaHalf = np.array([math.lgamma(k + 0.5) for k in range(2*terms + 1)])
+    ln2 = np.log(2.0)
+    n = np.arange(terms)[:, np.newaxis]
+    m = np.arange(terms)[np.newaxis, :]
+    p = np.maximum(n - m, 0)
+    lnAverage = lnGammaHalf[p] + lnFactorial[m] - lnGammaHalf[p + m + 1] - ln2
+    lnTerms = lnFactorial[2*n] - lnFactorial[2*p] + 2.0*p*ln2 + 2.0*lnAverage - 2.0*lnFactorial[m] - 2.0*m*ln2
+    lnTerms = np.where(m <= n, lnTerms, -np.inf)
+    largest = np.max(lnTerms, axis=1)
+    lnMoments = largest + np.log(np.sum(np.exp(lnTerms - largest[:, np.newaxis]), axis=1))
+    return lnMoments - lnFactorial[2*np.arange(terms)]
+
+def dipoleMomentsGet():
+    # Return the shared series coefficients, computing them the first time they are needed
+    global dipoleLogMoments
+    if (dipoleLogMoments is None):
+        dipoleLogMoments = dipoleMoments()
+    return dipoleLogMoments
+
+def dipoleLogAverage(x):
+    # ln <exp(x*zeta)> for x >= 0 (see dipoleMoments), summing the series with every term
+    # scaled by exp(-2x) (zeta <= 2) so that nothing overflows; the terms rise and then
+    # fall, and the sum stops once every new term is below 1E-17 of its total
+    # For small x the terms after the first are summed on their own and added with
+    # log1p: the average is then close to 1, and the far tail of the r* integral
+    # needs its excess over 1 to full relative precision
+    x = np.minimum(np.asarray(x, dtype=float), dipoleMaxX)
+    ratio = np.exp(np.diff(dipoleMomentsGet()))
+    x2 = x*x
+    first = np.exp(-2.0*x)
+    term = first
+    rest = np.zeros(x.shape)
+    for n in range(1, dipoleTerms):
+        term = term*x2*ratio[n-1]
+        rest += term
+        if np.all(term <= 1.0E-17*(first + rest)):
+            break
+    small = (x < 1.0)
+    return np.where(small, np.log1p(rest*np.exp(2.0*np.where(small, x, 0.0))), 2.0*x + np.log(first + rest))
+
+def dipoleMayer(lnBoltzmann, x):
+    # exp(lnBoltzmann)*<exp(x*zeta)> - 1, the orientation-averaged Mayer function of a
+    # Stockmayer pair, for lnBoltzmann = -u*_LJ/T* and x = 2*delta*/(T* r*^3); the average
+    # is only summed where the result can differ from -1 by more than exp(-745)
+    lnBoltzmann, x = np.broadcast_arrays(lnBoltzmann, x)
+    mayer = np.full(lnBoltzmann.shape, -1.0)
+    matters = (lnBoltzmann + 2.0*x > -745.0)
+    mayer[matters] = np.expm1(lnBoltzmann[matters] + dipoleLogAverage(x[matters]))
+    return mayer
+
+def BstarDipoleSeries(Tstar, deltaStar, derivative=False):
+    # Stockmayer B* for a 1-D array Tstar and a (Tstar.size, K) array deltaStar (see
+    # BstarDipoleCalc); the a_n(T*) are computed once per T* and used for all K delta*
+    # Returns a tuple of (Tstar.size, K) arrays, (B*,) or (B*, dB*/dT*, dB*/ddelta*)
+    lnMoments = dipoleMomentsGet()
+    r_star, r_weights = BstarNodes()
+    potential_star = 4.0*(r_star**(-12.0) - r_star**(-6.0))
+    lnWeights = np.log(r_weights*(r_star**2.0)) - potential_star/Tstar[:, np.newaxis]
+    lnr = np.log(r_star)
+    lnTwoOverT = np.log(2.0/Tstar)
+    with np.errstate(divide='ignore'):
+        lnDelta = np.log(deltaStar)
+    if derivative:
+        Bstar_LJ, dBstar_LJ = BstarCalc(Tstar, True)
+    else:
+        Bstar_LJ = BstarCalc(Tstar)
+    dipole = np.zeros(deltaStar.shape)
+    dipole_dT = np.zeros(deltaStar.shape)
+    dipole_ddelta = np.zeros(deltaStar.shape)
+    for n in range(1, dipoleTerms):
+        lnIntegrand = lnWeights - 6.0*n*lnr
+        largest = np.max(lnIntegrand, axis=1)
+        integrand = np.exp(lnIntegrand - largest[:, np.newaxis])
+        integral = np.sum(integrand, axis=1)
+        ln_a = lnMoments[n] + 2.0*n*lnTwoOverT + largest + np.log(integral)
+        term = np.exp(ln_a[:, np.newaxis] + 2.0*n*lnDelta)
+        dipole += term
+        if derivative:
+            # da_n/dT* = a_n*(<u*>/T*^2 - 2n/T*), <u*> averaged with the weights of a_n
+            meanPotential = np.dot(integrand, potential_star)/integral
+            dipole_dT += term*(meanPotential/(Tstar**2.0) - 2.0*n/Tstar)[:, np.newaxis]
+            dipole_ddelta += 2.0*n*np.exp(ln_a[:, np.newaxis] + (2.0*n - 1.0)*lnDelta)
+        if np.all(term <= 1.0E-17*(1.0 - Bstar_LJ[:, np.newaxis] + 3.0*dipole)):
+            break
+    Bstar = Bstar_LJ[:, np.newaxis] - 3.0*dipole
+    if not derivative:
+        return (Bstar,)
+    return Bstar, dBstar_LJ[:, np.newaxis] - 3.0*dipole_dT, -3.0*dipole_ddelta
+
+def BstarDipoleCalc(Tstar, deltaStar, derivative=False):
+    # Reduced second virial coefficient of a Stockmayer fluid, B* = B/b0, with the
+    # dipole-dipole energy -(mu^2/r^3)*zeta averaged over the orientations of both
+    # molecules: u* = u*_LJ - 2*delta*zeta/r*^3, delta* = mu^2/(2 epsilon sigma^3) as in
+    # deltaCalc. Expanding the averaged Boltzmann factor in its moments (dipoleMoments),
+    # B* = B*_LJ(T*) - 3*sum_{n>=1} delta*^2n a_n(T*),
+    # a_n(T*) = c_n*(2/T*)^2n int r*^(2-6n) exp(-u*_LJ/T*) dr*
+    # with every a_n positive, integrated on the nodes of BstarCalc; terms are added until
+    # the next is below 1E-17*(1 - B*). This is the reference the table is built from.
+    # Tstar and deltaStar are broadcast against each other. With derivative=True,
+    # (B*, dB*/dT*, dB*/ddelta*) is returned.
+    Tstar, deltaStar = np.broadcast_arrays(np.asarray(Tstar, dtype=float), np.asarray(deltaStar, dtype=float))
+    T_flat = Tstar.reshape(-1)
+    delta_flat = deltaStar.reshape(-1)
+    results = [np.zeros(T_flat.shape) for kk in range(3 if derivative else 1)]
+    for start in range(0, T_flat.size, BcalcTempBlock):
+        block = slice(start, start+BcalcTempBlock)
+        values = BstarDipoleSeries(T_flat[block], delta_flat[block, np.newaxis], derivative)
+        for result, value in zip(results, values):
+            result[block] = value[:, 0]
+    results = [result.reshape(Tstar.shape) for result in results]
+    if not derivative:
+        return results[0]
+    return tuple(results)
+
+@profiled('BstarDipoleTableBuild')
+def BstarDipoleTableBuild(TstarRange=BstarDipoleTableRange, deltaRange=BstarDipoleDeltaRange, \
+    pieces=BstarDipoleTablePieces, degree=BstarDipoleTableDegree):
+    # Build the Stockmayer B*(T*, delta*) table: on each piece of the (ln(T*), delta*)
+    # grid, ln(1 - B*) is interpolated at the tensor product of Chebyshev points (the
+    # averaged dipole term only attracts, so 1 - B* >= 1 - B*_LJ > 0); all the delta* of
+    # one T* come from the same a_n(T*) (BstarDipoleSeries)
+    # The error is checked against the series halfway between the nodes and at the piece
+    # edges, and stored like that of BstarTableBuild
+    edges = np.linspace(np.log(TstarRange[0]), np.log(TstarRange[1]), pieces[0]+1)
+    deltaEdges = np.linspace(deltaRange[0], deltaRange[1], pieces[1]+1)
+    chebNodes = [np.cos(np.pi*(np.arange(order+1) + 0.5)/(order+1)) for order in degree]
+    lnTstar = 0.5*(edges[1:] + edges[:-1])[:, np.newaxis] + 0.5*np.diff(edges)[:, np.newaxis]*chebNodes[0]
+    delta = 0.5*(deltaEdges[1:] + deltaEdges[:-1])[:, np.newaxis] + 0.5*np.diff(deltaEdges)[:, np.newaxis]*chebNodes[1]
+    Bstar = BstarDipoleSeries(np.exp(lnTstar).reshape(-1), np.tile(delta.reshape(1, -1), (lnTstar.size, 1)))[0]
+    values = np.log(1.0 - Bstar).reshape(lnTstar.shape + delta.shape)
+    inverse = [np.linalg.inv(np.polynomial.chebyshev.chebvander(nodes, order)) for nodes, order in zip(chebNodes, degree)]
+    coeffs = np.einsum('ka,iajb,lb->ijkl', inverse[0], values, inverse[1])
+    table = {'edges': edges, 'deltaEdges': deltaEdges, 'coeffs': coeffs, 'TstarRange': TstarRange, \
+        'deltaRange': deltaRange, 'error': 0.0}
+    
+    checkNodes = [np.sort(np.concatenate(([-1.0, 1.0], 0.5*(nodes[1:] + nodes[:-1])))) for nodes in chebNodes]
+    Tstar = np.exp(0.5*(edges[1:] + edges[:-1])[:, np.newaxis] + 0.5*np.diff(edges)[:, np.newaxis]*checkNodes[0]).reshape(-1)
+    delta = (0.5*(deltaEdges[1:] + deltaEdges[:-1])[:, np.newaxis] + 0.5*np.diff(deltaEdges)[:, np.newaxis]*checkNodes[1]).reshape(-1)
+    Bstar_check = BstarDipoleSeries(Tstar, np.tile(delta, (Tstar.size, 1)))[0]
+    Bstar_table = BstarDipoleTableEval(table, Tstar[:, np.newaxis], delta[np.newaxis, :])
+    table['error'] = 10.0*np.max(np.abs(Bstar_table - Bstar_check)/(1.0 - Bstar_check))
+    return table
+
+def BstarDipoleTableClenshaw(pointCoeffs, zT, zDelta):
+    # sum_kl pointCoeffs[:, k, l]*T_k(zT)*T_l(zDelta), one row of coefficients per point
+    inner = BstarTableClenshaw(np.moveaxis(pointCoeffs, -1, 0), zDelta[:, np.newaxis])
+    return BstarTableClenshaw(np.moveaxis(inner, -1, 0), zT)
+
+def BstarDipoleTableEval(table, Tstar, deltaStar, derivative=False):
+    # Evaluate a B*(T*, delta*) table built by BstarDipoleTableBuild, vectorized over
+    # Tstar and deltaStar (broadcast against each other, inside the table range)
+    # With derivative=True, (B*, dB*/dT*, dB*/ddelta*) is returned, differentiating the
+    # Chebyshev series of f = ln(1 - B*) along either axis
+    Tstar, deltaStar = np.broadcast_arrays(np.asarray(Tstar, dtype=float), np.asarray(deltaStar, dtype=float))
+    edges = table['edges']
+    deltaEdges = table['deltaEdges']
+    coeffs = table['coeffs']
+    T_flat = Tstar.reshape(-1)
+    delta_flat = deltaStar.reshape(-1)
+    lnTstar = np.log(T_flat)
+    profiler.count('BstarDipoleTable lookups', lnTstar.size)
+    piece = np.clip(np.searchsorted(edges, lnTstar) - 1, 0, coeffs.shape[0] - 1)
+    width = edges[piece+1] - edges[piece]
+    zT = (2.0*lnTstar - edges[piece] - edges[piece+1])/width
+    deltaPiece = np.clip(np.searchsorted(deltaEdges, delta_flat) - 1, 0, coeffs.shape[1] - 1)
+    deltaWidth = deltaEdges[deltaPiece+1] - deltaEdges[deltaPiece]
+    zDelta = (2.0*delta_flat - deltaEdges[deltaPiece] - deltaEdges[deltaPiece+1])/deltaWidth
+    if derivative and ('derivativeCoeffs' not in table):
+        table['derivativeCoeffs'] = (np.polynomial.chebyshev.chebder(coeffs, axis=2), \
+            np.polynomial.chebyshev.chebder(coeffs, axis=3))
+    results = [np.zeros(T_flat.shape) for kk in range(3 if derivative else 1)]
+    for start in range(0, T_flat.size, BstarDipoleTableBlock):
+        block = slice(start, start+BstarDipoleTableBlock)
+        pieces = (piece[block], deltaPiece[block])
+        Bstar = 1.0 - np.exp(BstarDipoleTableClenshaw(coeffs[pieces], zT[block], zDelta[block]))
+        results[0][block] = Bstar
+        if derivative:
+            dfdzT = BstarDipoleTableClenshaw(table['derivativeCoeffs'][0][pieces], zT[block], zDelta[block])
+            dfdzDelta = BstarDipoleTableClenshaw(table['derivativeCoeffs'][1][pieces], zT[block], zDelta[block])
+            results[1][block] = -(1.0 - Bstar)*dfdzT*(2.0/width[block])/T_flat[block]
+            results[2][block] = -(1.0 - Bstar)*dfdzDelta*(2.0/deltaWidth[block])
+    results = [result.reshape(Tstar.shape) for result in results]
+    if not derivative:
+        return results[0]
+    return tuple(results)
+
+def BstarDipoleTableGet():
+    # Return the shared B*(T*, delta*) table, building it the first time it is needed
+    global BstarDipoleTable
+    if (BstarDipoleTable is None):
+        BstarDipoleTable = BstarDipoleTableBuild()
+    return BstarDipoleTable
+
+def BstarDipoleInterp(Tstar, deltaStar, derivative=False):
+    # Reduced second virial coefficient of a Stockmayer fluid from the table; points
+    # outside the table range fall back to BstarDipoleCalc
+    # With derivative=True, (B*, dB*/dT*, dB*/ddelta*) is returned
+    table = BstarDipoleTableGet()
+    Tstar, deltaStar = np.broadcast_arrays(np.asarray(Tstar, dtype=float), np.asarray(deltaStar, dtype=float))
+    inRange = (Tstar >= table['TstarRange'][0]) & (Tstar <= table['TstarRange'][1]) & \
+        (deltaStar >= table['deltaRange'][0]) & (deltaStar <= table['deltaRange'][1])
+    if np.all(inRange):
+        return BstarDipoleTableEval(table, Tstar, deltaStar, derivative)
+    inside = BstarDipoleTableEval(table, Tstar[inRange], deltaStar[inRange], derivative)
+    outside = BstarDipoleCalc(Tstar[~inRange], deltaStar[~inRange], derivative)
+    if not derivative:
+        inside, outside = (inside,), (outside,)
+    results = []
+    for valuesInside, valuesOutside in zip(inside, outside):
+        result = np.zeros(Tstar.shape)
+        result[inRange] = valuesInside
+        result[~inRange] = valuesOutside
+        results.append(result)
+    if not derivative:
+        return results[0]
+    return tuple(results)
+
+class BcalcCache(object):
+    # Memoized Bcalc: a bounded least-recently-used cache of B values, keyed on
+    # (calcMethod, T, sigma, epsilon, mu) with the floats rounded to a relative tolerance,
+    # followed by Potential.key for potential models other than Lennard-Jones
+    # Call it like Bcalc. T may be an array: every temperature is looked up on its own,
+    # and all the misses are then computed together in a single Bcalc call.
+    # B is always computed at the rounded values, so the result does not depend on which
+    # nearby value happened to be asked for first.
+    #
+    # maxSize: number of entries kept in memory before the least recently used are dropped
+    # tolerance: relative tolerance of the keys, e.g. 1E-10 keeps 10 significant digits
+    # path: optional file for an on-disk tier (a shelve database). Entries found there are
+    #   used instead of integrating; new entries are written to it when the cache is saved,
+    #   which happens on save() and when the interpreter exits
+    def __init__(self, maxSize=BcalcCacheSize, tolerance=BcalcCacheTol, path=None):
+        self.maxSize = maxSize
+        self.digits = max(1, int(np.ceil(-np.log10(tolerance))))
+        self.entries = collections.OrderedDict()
+        self.unsaved = {}
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.path = path
+        self.disk = None
+        if (path is not None):
+            self.disk = shelve.open(path)
+            atexit.register(self.close)
+    
+    def quantize(self, values):
+        # round to self.digits significant digits
+        values = np.asarray(values, dtype=float)
+        magnitude = np.where(values == 0.0, 1.0, np.abs(values))
+        quantum = 10.0**(np.floor(np.log10(magnitude)) - self.digits + 1)
+        return np.round(values/quantum)*quantum
+    
+    def __call__(self, T, sigma, epsilon, mu, calcMethod, potential=None):
+        T = np.asarray(T, dtype=float)
+        sigma, epsilon, mu = [float(value) for value in self.quantize([sigma, epsilon, mu])]
+        # models other than Lennard-Jones add their name and parameters to the key
+        model = potential.key if potentialGeneric(potential, mu) else ()
+        T_keys = self.quantize(T.reshape(-1))
+        B_result = np.zeros(T_keys.shape)
+        missing = []
+        for ii, temp in enumerate(T_keys):
+            key = (calcMethod, float(temp), sigma, epsilon, mu) + model
+            if key in self.entries:
+                self.entries[key] = self.entries.pop(key)
+                B_result[ii] = self.entries[key]
+                self.hits += 1
+            elif (self.disk is not None) and (repr(key) in self.disk):
+                B_result[ii] = self.disk[repr(key)]
+                self.store(key, B_result[ii])
+                self.diskHits += 1
+            else:
+                missing.append(ii)
+        if missing:
+            self.misses += len(missing)
+            B_missing = np.atleast_1d(Bcalc(T_keys[missing], sigma, epsilon, mu, calcMethod, potential))
+            for ii, B_value in zip(missing, B_missing):
+                B_result[ii] = B_value
+                key = (calcMethod, float(T_keys[ii]), sigma, epsilon, mu) + model
+                self.store(key, B_value)
+                if (self.disk is not None):
+                    self.unsaved[repr(key)] = float(B_value)
+        B_result = B_result.reshape(T.shape)
+        if (B_result.ndim == 0):
+            B_result = B_result[()]
+        return B_result
+    
+    def store(self, key, B_value):
+        self.entries[key] = float(B_value)
+        while (len(self.entries) > self.maxSize):
+            self.entries.popitem(last=False)
+            self.evictions += 1
+    
+    def stats(self):
+        # hit/miss statistics; hitRate counts hits from memory and from disk
+        lookups = self.hits + self.diskHits + self.misses
+        return {'hits': self.hits, 'diskHits': self.diskHits, 'misses': self.misses, \
+            'evictions': self.evictions, 'size': len(self.entries), 'maxSize': self.maxSize, \
+            'hitRate': (self.hits + self.diskHits)/float(max(lookups, 1))}
+    
+    def clear(self):
+        # empty the memory tier and reset the statistics (the disk tier is kept)
+        self.entries.clear()
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def save(self):
+        # write the entries computed since the last save to the disk tier
+        if (self.disk is not None) and self.unsaved:
+            self.disk.update(self.unsaved)
+            self.disk.sync()
+            self.unsaved = {}
+    
+    def close(self):
+        if (self.disk is not None):
+            self.save()
+            self.disk.close()
+            self.disk = None
+
+# shared cache behind BcalcCached; replace it (e.g. with a path) to change its settings
+BcalcSharedCache = BcalcCache()
+
+def BcalcCached(T, sigma, epsilon, mu, calcMethod, potential=None):
+    # Bcalc through the shared cache, for scripts that ask for the same curves repeatedly
+    return BcalcSharedCache(T, sigma, epsilon, mu, calcMethod, potential)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+# Index of the datasets of a VirialStore by species, reference, reference ID (a DOI,
+# URL, "TO DO" or "N/A"), compilation index (e.g. "79-wax/dav"), compilation year and
+# data class
+# For every kind of key the datasets are sorted by key once, so the datasets of one key
+# are a contiguous run of one array; a dict from key to the bounds of its run makes every
+# lookup a single hash, and the result a view. The index is kept next to the snapshot
+# (see virialStore.buildSnapshot) and is rebuilt when the snapshot changes.
+#
+# Usage: python virialIndex.py builds the snapshot and the index
+
+# Headers for Python
+import io
+import json
+import os
+import numpy as np
+from virialStore import databasePath, loadSnapshot, snapshotPath
+
+# kinds of keys the datasets are indexed by
+indexKeys = ('species', 'reference', 'refID', 'compilation', 'compilationYear', 'dataClass')
+# format version of the index files
+indexVersion = 1
+
+def indexKeyCodes(store):
+    # for every kind of key, the key names and the code of every dataset into them
+    return {
+        'species': (store.speciesNames, store.datasetSpecies),
+        'reference': (store.references, store.datasetReference),
+        'refID': (store.referenceIDs, store.datasetReference),
+        'compilation': ([compilation[1] for compilation in store.compilations], store.datasetCompilation),
+        'compilationYear': ([compilation[0] for compilation in store.compilations], store.datasetCompilation),
+        'dataClass': ([str(name) for name in store.classNames], store.datasetClass),
+    }
+
+class DatasetIndex(object):
+    # runs: for every kind of key, a dict from key to (start, end, code), the bounds of its
+    #   datasets in datasets and the code of the key
+    # datasets: dataset numbers of the store, grouped by key kind and then by key, in
+    #   ascending order within every key
+    # codes: codes of the keys of every dataset, one row per kind of key (in indexKeys order)
+    def __init__(self, store, runs, datasets, codes):
+        self.store = store
+        self.runs = runs
+        self.datasets = datasets
+        self.codes = codes
+
+    @classmethod
+    def fromStore(cls, store):
+        # Build the index of a store
+        # Keys that only differ in their codes (the same reference ID for several
+        # references, the same compilation index in two years) are merged into one run.
+        runs = {}
+        pieces = []
+        codes = np.zeros((len(indexKeys), store.nDatasets()), dtype=np.int64)
+        position = 0
+        keyCodes = indexKeyCodes(store)
+        for row, kind in enumerate(indexKeys):
+            names, storeCodes = keyCodes[kind]
+            merged = sorted(set(names))
+            mergedLookup = dict((name, code) for code, name in enumerate(merged))
+            mergedCode = np.array([mergedLookup[name] for name in names], dtype=np.int64)
+            codes[row] = mergedCode[np.asarray(storeCodes)]
+            order = np.argsort(codes[row], kind='mergesort')
+            bounds = np.searchsorted(codes[row][order], np.arange(len(merged) + 1))
+            runs[kind] = dict((name, (position + int(bounds[kk]), position + int(bounds[kk+1]), kk)) \
+                for kk, name in enumerate(merged) if (bounds[kk+1] > bounds[kk]))
+            pieces.append(order)
+            position += order.size
+        return cls(store, runs, np.concatenate(pieces).astype(np.int64), codes)
+
+    def keys(self, kind):
+        # every key of a kind, e.g. keys('compilationYear')
+        return sorted(self.runs[kind])
+
+    def lookup(self, kind, key):
+        # dataset numbers with the given key, a view of the index; empty if there are none
+        if kind not in self.runs:
+            raise KeyError('unknown index key ' + repr(kind) + ', expected one of ' + str(indexKeys))
+        start, end, code = self.runs[kind].get(key, (0, 0, -1))
+        return self.datasets[start:end]
+
+    def select(self, **filters):
+        # dataset numbers matching every filter, e.g. select(species='CH4', compilationYear='2002')
+        # The smallest of the runs is taken and checked against the other keys through
+        # the key codes of its datasets, so the cost is that of the smallest run.
+        if not filters:
+            return np.arange(self.store.nDatasets())
+        selected = min([self.lookup(kind, key) for kind, key in filters.items()], key=len)
+        for kind, key in filters.items():
+            if (selected.size == 0):
+                break
+            selected = selected[self.codes[indexKeys.index(kind)][selected] == self.runs[kind][key][2]]
+        return selected
+
+    def points(self, datasets):
+        # (T, B, Berr) of the given datasets: views of the store columns if the datasets are
+        # adjacent (e.g. all datasets of a species), copies otherwise
+        datasets = np.asarray(datasets, dtype=np.int64)
+        store = self.store
+        if (datasets.size == 0):
+            return store.T[0:0], store.B[0:0], store.Berr[0:0]
+        if np.all(np.diff(datasets) == 1):
+            points = slice(int(store.datasetOffsets[datasets[0]]), int(store.datasetOffsets[datasets[-1] + 1]))
+        else:
+            starts = store.datasetOffsets[datasets]
+            lengths = store.datasetOffsets[datasets + 1] - starts
+            points = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) + \
+                np.arange(int(np.sum(lengths)))
+        return store.T[points], store.B[points], store.Berr[points]
+
+    def save(self, path=snapshotPath):
+        # write the index into the snapshot directory at path, tied to the checksum of that
+        # snapshot; the files are written under temporary names and renamed at the end
+        with io.open(os.path.join(path, 'manifest.json'), encoding='utf-8') as manifestFile:
+            checksum = json.loads(manifestFile.read())['checksum']
+        np.save(os.path.join(path, 'indexDatasets.building.npy'), self.datasets)
+        np.save(os.path.join(path, 'indexCodes.building.npy'), self.codes)
+        with io.open(os.path.join(path, 'index.building.json'), 'w', encoding='utf-8') as indexFile:
+            indexFile.write(json.dumps({'version': indexVersion, 'checksum': checksum, 'runs': self.runs}, \
+                ensure_ascii=False, indent=1))
+        os.rename(os.path.join(path, 'indexDatasets.building.npy'), os.path.join(path, 'indexDatasets.npy'))
+        os.rename(os.path.join(path, 'indexCodes.building.npy'), os.path.join(path, 'indexCodes.npy'))
+        os.rename(os.path.join(path, 'index.building.json'), os.path.join(path, 'index.json'))
+
+def buildIndex(path=snapshotPath, source=databasePath):
+    # build the index of the snapshot at path (building the snapshot too if it is
+    # missing or stale) and save it there
+    index = DatasetIndex.fromStore(loadSnapshot(path, source, rebuild=True))
+    index.save(path)
+    return index
+
+def loadIndex(path=snapshotPath, source=databasePath, rebuild=True):
+    # Load the snapshot at path and its index, the arrays memory-mapped
+    # A missing index, or one built for another snapshot, is rebuilt (or raises
+    # ValueError if rebuild is False); see loadSnapshot for the snapshot itself.
+    store = loadSnapshot(path, source, rebuild=rebuild)
+    indexPath = os.path.join(path, 'index.json')
+    problem = None
+    if not os.path.isfile(indexPath):
+        problem = 'no index in ' + path
+    else:
+        with io.open(indexPath, encoding='utf-8') as indexFile:
+            saved = json.loads(indexFile.read())
+        with io.open(os.path.join(path, 'manifest.json'), encoding='utf-8') as manifestFile:
+            checksum = json.loads(manifestFile.read())['checksum']
+        if (saved['version'] != indexVersion):
+            problem = 'index in ' + path + ' has version ' + str(saved['version']) + ', expected ' + str(indexVersion)
+        elif (saved['checksum'] != checksum):
+            problem = 'index in ' + path + ' was built for another snapshot'
+    if problem is not None:
+        if not rebuild:
+            raise ValueError(problem + ' (run buildIndex)')
+        index = DatasetIndex.fromStore(store)
+        index.save(path)
+        return index
+    runs = dict((kind, dict((key, tuple(bounds)) for key, bounds in saved['runs'][kind].items())) \
+        for kind in saved['runs'])
+    return DatasetIndex(store, runs, np.load(os.path.join(path, 'indexDatasets.npy'), mmap_mode='r'), \
+        np.load(os.path.join(path, 'indexCodes.npy'), mmap_mode='r'))
+
+if __name__ == '__main__':
+    index = buildIndex()
+    print('index of ' + str(index.store.nDatasets()) + ' datasets written to ' + snapshotPath)
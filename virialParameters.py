@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+# Registry of the Lennard-Jones / Stockmayer parameter sets of every species, with
+# where they come from
+# These are the sets the notebook compares the data with: the estimate fitted to this
+# database by MCMC (with the covariance of sigma and epsilon, where it was reported) and
+# the set of the CHEMKIN transport database. The registry is built once, on import, and
+# is indexed by species and source; parameterRegistry.evaluate computes B for any
+# selection of sets with batched Bcalc calls.
+
+# Headers for Python
+import numpy as np
+from virialFunctions import BcalcBatch
+
+# sources of the parameter sets: the label the notebook plots them with and their provenance
+parameterSources = {
+    "MCMC": ("MCMC estimate", "Markov chain Monte Carlo fit of a Lennard-Jones potential to the data of this "
+        "database (Virial Coefficient Database.ipynb); the covariance is that of the posterior samples"),
+    "CHEMKIN": ("CHEMKIN database", "Lennard-Jones collision diameter and well depth of the CHEMKIN transport "
+        "database (tran.dat), as used in the notebook with no dipole moment"),
+}
+
+# species, source, sigma [Angstroms], epsilon [K], mu [Debyes], covariance of (sigma, epsilon)
+# or None where none was reported
+parameterEntries = [
+    ("CH4", "MCMC", 3.861, 146.2, 0.0, [[9.726E-07,-4.273995E-5],[-4.273995E-5,1.9802E-3]]),
+    ("CH4", "CHEMKIN", 3.746, 141.0, 0.0, None),
+    ("O2", "MCMC", 3.523, 117.2, 0.0, [[1.4215E-5,-6.2989E-4],[-6.2989E-4,2.968E-2]]),
+    ("O2", "CHEMKIN", 3.458, 107.4, 0.0, None),
+    ("N2", "MCMC", 3.769, 95.34, 0.0, [[1.4234E-06,-2.5425E-5],[-2.5425E-5,9.2540E-4]]),
+    ("N2", "CHEMKIN", 3.621, 97.53, 0.0, None),
+    ("H2", "MCMC", 2.898, 30.63, 0.0, [[3.5158E-5,-5.455E-4],[-5.455E-4,1.4325E-2]]),
+    ("H2", "CHEMKIN", 2.920, 38.00, 0.0, None),
+    ("CO", "MCMC", 3.791, 99.99, 0.0, [[4.2133E-5,-1.259E-3],[-1.259E-3,4.5834E-2]]),
+    ("CO", "CHEMKIN", 3.650, 98.10, 0.0, None),
+    ("Ar", "MCMC", 3.462, 118.77, 0.0, [[1.463E-6,-7.8159E-5],[-7.8159E-5,4.4567E-3]]),
+    ("Ar", "CHEMKIN", 3.330, 136.5, 0.0, None),
+    ("CH3OH", "MCMC", 7.171, 213.5, 0.0, None),
+    ("CH3OH", "CHEMKIN", 3.690, 417.0, 0.0, None),
+    ("CO2", "MCMC", 4.316, 200.2, 0.0, [[9.8904E-7,-4.309E-5],[-4.309E-5,2.9478E-3]]),
+    ("CO2", "CHEMKIN", 3.763, 244.0, 0.0, None),
+    ("H2O", "MCMC", 5.099, 300.7, 0.0, None),
+    ("H2O", "CHEMKIN", 2.615, 572.4, 0.0, None),
+    ("C2H6", "MCMC", 4.854, 205.7, 0.0, [[5.19777E-6,-3.0587E-4],[-3.0587E-4,1.8486E-2]]),
+    ("C2H6", "CHEMKIN", 4.302, 252.3, 0.0, None),
+    ("C2H2", "MCMC", 8.088, 110.2, 0.0, [[1.12635E-2,-1.141E-1],[-1.141E-1,1.258E+0]]),
+    ("C2H2", "CHEMKIN", 4.100, 209.0, 0.0, None),
+    ("C2H5OH", "MCMC", 1.391, 2164.9, 0.0, None),
+    ("C2H4", "MCMC", 4.770, 185.3, 0.0, [[1.0601E-5,-5.7716E-4],[-5.7716E-4,3.2301E-02]]),
+    ("C2H4", "CHEMKIN", 3.971, 280.0, 0.0, None),
+]
+
+class ParameterRegistry(object):
+    # Columns, one entry per parameter set:
+    #   species, source        names, source being a key of parameterSources
+    #   sigma, epsilon, mu     Angstroms, K, Debyes
+    #   cov                    2x2 covariance of (sigma, epsilon), NaN where unknown
+    # lookup maps (species, source) to the position of the set
+    def __init__(self, entries):
+        self.species = [entry[0] for entry in entries]
+        self.source = [entry[1] for entry in entries]
+        unknown = sorted(set(self.source) - set(parameterSources))
+        if unknown:
+            raise ValueError('unknown parameter source(s) ' + str(unknown) + ', expected one of ' + \
+                str(sorted(parameterSources)))
+        self.sigma = np.array([entry[2] for entry in entries], dtype=float)
+        self.epsilon = np.array([entry[3] for entry in entries], dtype=float)
+        self.mu = np.array([entry[4] for entry in entries], dtype=float)
+        self.cov = np.array([np.full((2, 2), np.nan) if entry[5] is None else entry[5] for entry in entries], dtype=float)
+        self.lookup = {}
+        for kk, key in enumerate(zip(self.species, self.source)):
+            if key in self.lookup:
+                raise ValueError('parameter set ' + str(key) + ' is given twice')
+            self.lookup[key] = kk
+
+    def __len__(self):
+        return len(self.species)
+
+    def index(self, species, source):
+        try:
+            return self.lookup[(species, source)]
+        except KeyError:
+            raise KeyError('no ' + str(source) + ' parameters for species ' + str(species))
+
+    def get(self, species, source):
+        # one parameter set as a dict; 'mean' and 'cov' are laid out like a fit from
+        # virialFit, so the set can be handed to mvnString, propagateFit or linearizedFit
+        kk = self.index(species, source)
+        return {'species': species, 'source': source, 'label': parameterSources[source][0], \
+            'provenance': parameterSources[source][1], 'sigma': self.sigma[kk], 'epsilon': self.epsilon[kk], \
+            'mu': self.mu[kk], 'mean': np.array([self.sigma[kk], self.epsilon[kk]]), 'cov': self.cov[kk]}
+
+    def select(self, species=None, source=None):
+        # positions of the sets of a species (or list of species) and source (or list of
+        # sources), in registry order; None selects all
+        if isinstance(species, str):
+            species = [species]
+        if isinstance(source, str):
+            source = [source]
+        return np.array([kk for kk in range(len(self)) if ((species is None) or (self.species[kk] in species)) \
+            and ((source is None) or (self.source[kk] in source))], dtype=int)
+
+    def evaluate(self, T, species=None, source=None, calcMethod="Table"):
+        # B [cm^3/mol] of the selected parameter sets (see select)
+        # T is either one temperature grid [K] shared by every set, which gives an array of
+        # shape (number of sets,) + T.shape from a single BcalcBatch call, or a dict of
+        # grids keyed by species, which gives a dict keyed by (species, source) with one
+        # BcalcBatch call per species for all of its sets
+        selected = self.select(species, source)
+        if not isinstance(T, dict):
+            return BcalcBatch(T, self.sigma[selected], self.epsilon[selected], self.mu[selected], calcMethod)
+        B_result = {}
+        for name in T:
+            sets = [kk for kk in selected if self.species[kk] == name]
+            if not sets:
+                continue
+            B_sets = BcalcBatch(T[name], self.sigma[sets], self.epsilon[sets], self.mu[sets], calcMethod)
+            for kk, B_set in zip(sets, B_sets):
+                B_result[(name, self.source[kk])] = B_set
+        return B_result
+
+# the registry of every parameter set above
+parameterRegistry = ParameterRegistry(parameterEntries)
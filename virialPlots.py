@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+# Headless rendering of the species figures of the notebook into plots/: for every
+# species the data with the curves of its parameter sets (<species>_B2.png) and, where a
+# covariance is known, samples of the MCMC estimate (<species>_MVN.png)
+# All curves are computed up front with one batched evaluation of the parameter registry,
+# and the figures are then drawn in a pool of processes with the Agg canvas, which needs
+# no display and leaves the backend of the calling process alone. Every figure is
+# fingerprinted with a hash of everything it is drawn from (data, parameters, temperature
+# range, figure settings); figures whose fingerprint has not changed since they were last
+# written are skipped.
+#
+# Usage: python virialPlots.py [CH4 N2 ...] [--directory DIR] [--processes N] [--force]
+
+# Headers for Python
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import numpy as np
+from virialParameters import parameterRegistry, parameterSources
+from virialProfile import profileMap, profiled
+from virialStore import databaseSpecies, load
+
+# directory the figures are written to, and the file in it holding their fingerprints
+plotDirectory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plots')
+plotHashFile = '.plotHashes.json'
+# figure settings, as in the notebook
+plotSize = (4, 3)
+plotDpi = 600
+# samples drawn for the multivariate normal figures, and the seed they are drawn with
+plotSamples = 1000
+plotSeed = 0
+# bump when the way figures are drawn changes, so that all of them are redrawn
+plotVersion = 1
+
+# temperature range [K] the curves of every species are plotted over: (first, last, points)
+plotTempRanges = {
+    'CH4': (120, 620, 501),
+    'O2': (90, 490, 401),
+    'N2': (90, 790, 701),
+    'H2': (20, 520, 501),
+    'CO': (90, 590, 501),
+    'Ar': (90, 1190, 1101),
+    'CH3OH': (290, 690, 401),
+    'CO2': (200, 1200, 1001),
+    'H2O': (300, 1300, 1001),
+    'C2H6': (200, 600, 401),
+    'C2H2': (200, 320, 121),
+    'C2H5OH': (300, 550, 251),
+    'C2H4': (180, 480, 301),
+}
+
+def plotTemperatures(species):
+    # the temperature grid [K] the curves of a species are plotted on
+    first, last, points = plotTempRanges[species]
+    return np.linspace(first, last, points)
+
+def plotFormula(species):
+    # the species name with its digits as subscripts, e.g. C$_2$H$_5$OH
+    return re.sub(r'(\d+)', r'$_\1$', species)
+
+def plotFingerprint(job):
+    # SHA-256 of everything a figure is drawn from
+    digest = hashlib.sha256()
+    digest.update(repr((plotVersion, job['kind'], job['title'], job['size'], job['dpi'])).encode('utf-8'))
+    for values in job['arrays']:
+        digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    for label in job['labels']:
+        digest.update(label.encode('utf-8'))
+    return digest.hexdigest()
+
+def plotJobs(species, calcMethod="Table"):
+    # The figures of the given species, each a dict with everything needed to draw it
+    # and the file name it is saved under; the curves of all parameter sets are
+    # evaluated together, on the temperature range of their species
+    store = load(species)
+    tempRanges = dict((name, plotTemperatures(name)) for name in species if name in plotTempRanges)
+    curves = parameterRegistry.evaluate(tempRanges, calcMethod=calcMethod)
+    jobs = []
+    for name in species:
+        T, B, Berr = store.speciesData(name)
+        arrays = [T, B, Berr]
+        labels = []
+        for kk in parameterRegistry.select(name):
+            source = parameterRegistry.source[kk]
+            arrays.extend([tempRanges[name], curves[(name, source)]])
+            labels.append(parameterSources[source][0])
+        jobs.append({'kind': 'B2', 'fileName': name + '_B2.png', 'title': 'Virial Data for ' + plotFormula(name), \
+            'size': plotSize, 'dpi': plotDpi, 'arrays': arrays, 'labels': labels})
+        if ((name, 'MCMC') in parameterRegistry.lookup):
+            parameters = parameterRegistry.get(name, 'MCMC')
+            if np.all(np.isfinite(parameters['cov'])):
+                samples = np.random.RandomState(plotSeed).multivariate_normal(parameters['mean'], \
+                    parameters['cov'], plotSamples)
+                jobs.append({'kind': 'MVN', 'fileName': name + '_MVN.png', \
+                    'title': 'Multivariate normal for ' + plotFormula(name), 'size': plotSize, 'dpi': plotDpi, \
+                    'arrays': [samples[:, 0], samples[:, 1]], 'labels': []})
+    return jobs
+
+@profiled('plotRender')
+def plotRender(arguments):
+    # Draw one figure and save it; arguments is the tuple (job, directory)
+    job, directory = arguments
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    figure = Figure(figsize=job['size'])
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(111)
+    axes.set_title(job['title'])
+    if (job['kind'] == 'B2'):
+        T, B, Berr = job['arrays'][:3]
+        # one C2H6 dataset gives its uncertainty as 0.01*B, which is negative; the bars are
+        # symmetric, so they are drawn with |Berr| as the notebook always showed them
+        axes.errorbar(T, B, np.abs(Berr), marker='.', ls='none')
+        for kk, label in enumerate(job['labels']):
+            axes.plot(job['arrays'][3 + 2*kk], job['arrays'][4 + 2*kk], label=label)
+        axes.set_xlabel('T [K]')
+        axes.set_ylabel('B$_2$ [cm$^3$/mol]')
+        if job['labels']:
+            axes.legend(loc='lower right')
+    else:
+        axes.plot(job['arrays'][0], job['arrays'][1], marker='.', ls='none', alpha=0.1)
+        axes.set_ylabel('$\\epsilon/k_B$ [K]')
+        axes.set_xlabel('$\\sigma$ [Angstroms]')
+    figure.tight_layout()
+    figure.savefig(os.path.join(directory, job['fileName']), format='png', dpi=job['dpi'], bbox_inches='tight')
+    return job['fileName']
+
+def renderPlots(species=None, directory=plotDirectory, processes=None, force=False, calcMethod="Table"):
+    # Render the figures of the given species (default: all) into directory, in a pool of
+    # processes (processes=1 draws them here, one after another)
+    # Figures whose fingerprint matches the one recorded when they were last written, and
+    # whose file still exists, are skipped unless force is True. Returns the file names
+    # that were written.
+    if species is None:
+        species = databaseSpecies()
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    hashPath = os.path.join(directory, plotHashFile)
+    fingerprints = {}
+    if os.path.isfile(hashPath):
+        with io.open(hashPath, encoding='utf-8') as hashFile:
+            fingerprints = json.loads(hashFile.read())
+    jobs = []
+    for job in plotJobs(species, calcMethod):
+        job['fingerprint'] = plotFingerprint(job)
+        if force or (fingerprints.get(job['fileName']) != job['fingerprint']) or \
+            not os.path.isfile(os.path.join(directory, job['fileName'])):
+            jobs.append(job)
+    arguments = [(job, directory) for job in jobs]
+    if (processes == 1) or (len(jobs) <= 1):
+        written = [plotRender(argument) for argument in arguments]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            written = profileMap(pool, plotRender, arguments)
+        finally:
+            pool.close()
+            pool.join()
+    if jobs:
+        for job in jobs:
+            fingerprints[job['fileName']] = job['fingerprint']
+        with io.open(hashPath, 'w', encoding='utf-8') as hashFile:
+            hashFile.write(json.dumps(fingerprints, indent=1, sort_keys=True))
+    return written
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render the species figures of the virial coefficient database.')
+    parser.add_argument('species', nargs='*', help='species to render (default: all)')
+    parser.add_argument('--directory', default=plotDirectory, help='directory to write the figures to')
+    parser.add_argument('--processes', type=int, default=None, help='number of processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='render every figure, changed or not')
+    parser.add_argument('--calcMethod', default="Table", help='Bcalc method for the curves (default: Table)')
+    arguments = parser.parse_args()
+    written = renderPlots(arguments.species or None, arguments.directory, arguments.processes, \
+        arguments.force, arguments.calcMethod)
+    for fileName in written:
+        print('wrote ' + os.path.join(arguments.directory, fileName))
+    if not written:
+        print('all figures up to date')
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+# Registry of intermolecular potential models for Bcalc and the fits: Lennard-Jones
+# (12-6), Mie (n-6), Kihara (hard core), exp-6 (Buckingham) and square-well
+# Every model is written in reduced form, u*(r*) = u(r)/epsilon with r* = r/sigma, where
+# sigma is the distance at which u = 0 and epsilon is the depth of the well. B = b0*B*(T*)
+# with b0 = (2/3)*pi*N_A*sigma^3 and T* = T/epsilon then holds for every model, and the
+# (sigma, epsilon) fitted with different models can be compared directly.
+# A model exposes its reduced potential and the Mayer function exp(-u*/T*) - 1 of the
+# integrand, both vectorized over r* and T*. Bcalc and BcalcBatch integrate them with the
+# "Inf" grid and the "Quad" quadrature of the Lennard-Jones potential, and "Table"
+# interpolates a B*(T*) table of the model built on first use, like the Lennard-Jones
+# table; the square-well B* is analytic and used by every calcMethod.
+#
+#     from virialPotentials import potentialRegistry
+#     mie = potentialRegistry.get('Mie', n=14.0)
+#     B = Bcalc(T, sigma, epsilon, 0.0, "Table", potential=mie)
+#     fit = lsqFit('Ar', potential=mie)
+#
+# The registry hands out one instance per model and set of parameters, so the table of a
+# model is built once however often it is asked for.
+
+# Headers for Python
+import numpy as np
+from virialFunctions import BstarCalc, BstarInterp, BstarQuad, BstarTableBuild, BstarTableGet, BstarTableLookup
+
+# tolerance of the quadrature the tables of the models are built from (see BstarQuad)
+potentialQuadTol = 1.0E-12
+# relative step in T* of the central difference giving dB*/dT* outside a table
+potentialDerivativeStep = 1.0E-4
+
+def potentialBisect(function, lower, upper, iterations=200):
+    # root of function between lower and upper, where it must change sign
+    fLower = function(lower)
+    if (fLower*function(upper) > 0.0):
+        raise ValueError('no root between ' + str(lower) + ' and ' + str(upper))
+    for iteration in range(iterations):
+        middle = 0.5*(lower + upper)
+        fMiddle = function(middle)
+        if (fMiddle*fLower > 0.0):
+            lower, fLower = middle, fMiddle
+        else:
+            upper = middle
+    return 0.5*(lower + upper)
+
+class Potential(object):
+    # A potential model with fixed shape parameters (e.g. the repulsive exponent n of
+    # the Mie potential); sigma and epsilon are those of Bcalc
+    # name: key of the model in the registry
+    # defaults: shape parameters of the model and their default values
+    # analytic: True if BstarCalc is exact, in which case no table is built
+    # key: (name, (parameter, value), ...), hashable and the same for equal models
+    name = None
+    defaults = {}
+    analytic = False
+
+    def __init__(self, **parameters):
+        unknown = sorted(set(parameters) - set(self.defaults))
+        if unknown:
+            raise ValueError('unknown parameter(s) ' + str(unknown) + ' of the ' + self.name + \
+                ' potential, expected ' + str(sorted(self.defaults)))
+        self.parameters = dict(self.defaults)
+        for parameter, value in parameters.items():
+            self.parameters[parameter] = float(value)
+        self.key = (self.name,) + tuple(sorted(self.parameters.items()))
+        self.table = None
+
+    def __repr__(self):
+        return self.name + '(' + ', '.join(parameter + '=' + repr(value) for parameter, value in sorted(self.parameters.items())) + ')'
+
+    def reduced(self, r_star):
+        # u*(r*) = u/epsilon at r* = r/sigma, any shape; infinite inside a hard core
+        raise NotImplementedError
+
+    def mayer(self, r_star, Tstar):
+        # Mayer function exp(-u*/T*) - 1, broadcasting r_star against Tstar; -1 inside a
+        # hard core. B* = -3*int_0^inf r*^2 mayer dr*
+        with np.errstate(over='ignore'):
+            return np.expm1(-self.reduced(r_star)/Tstar)
+
+    def BstarCalc(self, Tstar, derivative=False):
+        # Reference B*(T*), the one the table is built from: BstarQuad on the Mayer
+        # function to potentialQuadTol, all reduced temperatures at once
+        # With derivative=True, (B*, dB*/dT*) is returned, dB*/dT* from a central
+        # difference of relative step potentialDerivativeStep (only used outside the table)
+        Tstar = np.asarray(Tstar, dtype=float)
+        if not derivative:
+            return BstarQuad(Tstar.reshape(-1), 0.0, 0.0, potentialQuadTol, potential=self)[0].reshape(Tstar.shape)
+        step = potentialDerivativeStep*Tstar
+        Bstar = self.BstarCalc(np.stack((Tstar, Tstar + step, Tstar - step)))
+        return Bstar[0], (Bstar[1] - Bstar[2])/(2.0*step)
+
+    def tableGet(self):
+        # the B*(T*) table of the model, laid out like the Lennard-Jones one and built
+        # the first time it is needed
+        if (self.table is None):
+            self.table = BstarTableBuild(reference=self.BstarCalc)
+        return self.table
+
+    def Bstar(self, Tstar, derivative=False):
+        # B*(T*) from the table of the model, falling back to BstarCalc outside it (or
+        # always, for an analytic model); with derivative=True, (B*, dB*/dT*)
+        if self.analytic:
+            return self.BstarCalc(Tstar, derivative)
+        return BstarTableLookup(self.tableGet(), self.BstarCalc, Tstar, derivative)
+
+class LennardJonesPotential(Potential):
+    # u* = 4*(r*^-12 - r*^-6); evaluated by Bcalc itself (with or without a dipole),
+    # with the shared table of BstarTableGet
+    name = "LJ"
+    defaults = {}
+
+    def reduced(self, r_star):
+        return 4.0*(r_star**(-12.0) - r_star**(-6.0))
+
+    def BstarCalc(self, Tstar, derivative=False):
+        return BstarCalc(Tstar, derivative)
+
+    def tableGet(self):
+        return BstarTableGet()
+
+    def Bstar(self, Tstar, derivative=False):
+        return BstarInterp(Tstar, derivative)
+
+class MiePotential(Potential):
+    # u* = C*(r*^-n - r*^-6), C = (n/(n - 6))*(n/6)^(6/(n - 6)) so the well is 1 deep;
+    # n = 12 is the Lennard-Jones potential, larger n a harder repulsion
+    name = "Mie"
+    defaults = {'n': 12.0}
+
+    def __init__(self, **parameters):
+        Potential.__init__(self, **parameters)
+        n = self.parameters['n']
+        if not (n > 6.0):
+            raise ValueError('the repulsive exponent n of the Mie potential must be above 6, not ' + str(n))
+        self.prefactor = (n/(n - 6.0))*(n/6.0)**(6.0/(n - 6.0))
+
+    def reduced(self, r_star):
+        with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+            return self.prefactor*(r_star**(-self.parameters['n']) - r_star**(-6.0))
+
+class KiharaPotential(Potential):
+    # Lennard-Jones potential between the surfaces of hard cores of diameter a*sigma:
+    # u* = 4*(rho^12 - rho^6), rho = (1 - a)/(r* - a), and infinite for r* <= a;
+    # a = 0 is the Lennard-Jones potential
+    name = "Kihara"
+    defaults = {'a': 0.1}
+
+    def __init__(self, **parameters):
+        Potential.__init__(self, **parameters)
+        a = self.parameters['a']
+        if not (0.0 <= a < 1.0):
+            raise ValueError('the core diameter a of the Kihara potential must be in [0, 1), not ' + str(a))
+
+    def reduced(self, r_star):
+        a = self.parameters['a']
+        with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+            rho = (1.0 - a)/(r_star - a)
+            return np.where(r_star > a, 4.0*(rho**12.0 - rho**6.0), np.inf)
+
+class Exp6Potential(Potential):
+    # Modified Buckingham (exp-6) potential in units of r_m, the position of its minimum:
+    # u* = (6*exp(alpha*(1 - x)) - alpha*x^-6)/(alpha - 6), x = r/r_m
+    # Below the maximum of u at x_max it turns over to -infinity; it is taken as a hard
+    # core there. In units of sigma (u(sigma) = 0), x = r*/scale with scale = r_m/sigma.
+    name = "exp6"
+    defaults = {'alpha': 14.0}
+
+    def __init__(self, **parameters):
+        Potential.__init__(self, **parameters)
+        alpha = self.parameters['alpha']
+        if not (alpha > 7.0):
+            raise ValueError('the steepness alpha of the exp-6 potential must be above 7, not ' + str(alpha))
+        # du/dx = 0 at x_max: alpha*(1 - x) + 7*ln(x) = 0 below x = 7/alpha (x = 1 is the
+        # minimum), then u = 0 between x_max and the minimum
+        self.xMax = potentialBisect(lambda x: alpha*(1.0 - x) + 7.0*np.log(x), 1.0E-6, 7.0/alpha)
+        xZero = potentialBisect(lambda x: np.log(6.0/alpha) + alpha*(1.0 - x) + 6.0*np.log(x), self.xMax, 1.0)
+        self.scale = 1.0/xZero
+
+    def reduced(self, r_star):
+        alpha = self.parameters['alpha']
+        x = r_star/self.scale
+        with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+            return np.where(x > self.xMax, (6.0*np.exp(alpha*(1.0 - x)) - alpha*x**(-6.0))/(alpha - 6.0), np.inf)
+
+class SquareWellPotential(Potential):
+    # Hard sphere of diameter sigma in a well of depth epsilon out to wellRange*sigma:
+    # u* = infinite for r* < 1, -1 for 1 < r* < wellRange, 0 beyond
+    # B* = 1 - (wellRange^3 - 1)*(exp(1/T*) - 1) exactly
+    name = "SquareWell"
+    defaults = {'wellRange': 1.5}
+    analytic = True
+
+    def __init__(self, **parameters):
+        Potential.__init__(self, **parameters)
+        if not (self.parameters['wellRange'] > 1.0):
+            raise ValueError('the well range of the square-well potential must be above 1, not ' + \
+                str(self.parameters['wellRange']))
+
+    def reduced(self, r_star):
+        return np.where(r_star < 1.0, np.inf, np.where(r_star < self.parameters['wellRange'], -1.0, 0.0))
+
+    def BstarCalc(self, Tstar, derivative=False):
+        Tstar = np.asarray(Tstar, dtype=float)
+        volume = self.parameters['wellRange']**3.0 - 1.0
+        Bstar = 1.0 - volume*np.expm1(1.0/Tstar)
+        if not derivative:
+            return Bstar
+        return Bstar, volume*np.exp(1.0/Tstar)/(Tstar**2.0)
+
+class PotentialRegistry(object):
+    # models: model name -> Potential subclass
+    # instances: Potential.key -> the instance handed out for it
+    def __init__(self, models):
+        self.models = {}
+        self.instances = {}
+        for model in models:
+            self.register(model)
+
+    def register(self, model):
+        # add a Potential subclass under its name, e.g. to compare a model of your own
+        if model.name in self.models:
+            raise ValueError('potential ' + repr(model.name) + ' is registered twice')
+        self.models[model.name] = model
+
+    def names(self):
+        return sorted(self.models)
+
+    def get(self, name, **parameters):
+        # the model name with the given shape parameters (the defaults for the others),
+        # e.g. get('Kihara', a=0.2); equal requests get the same instance and table
+        if name not in self.models:
+            raise KeyError('unknown potential ' + repr(name) + ', expected one of ' + str(self.names()))
+        potential = self.models[name](**parameters)
+        return self.instances.setdefault(potential.key, potential)
+
+# the registry of every model above
+potentialRegistry = PotentialRegistry([LennardJonesPotential, MiePotential, KiharaPotential, Exp6Potential, \
+    SquareWellPotential])
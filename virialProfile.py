@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+# Opt-in profiling of the database code: wall-clock timers around the stages of loading
+# (scanning and executing the entries of databaseExp.py, BerrCalc, building the columnar
+# store, snapshots), exporting and fitting, and around every Bcalc call, plus counters
+# of table lookups and integrand evaluations
+# Profiling is off by default. While it is off a timed function costs one attribute test
+# more than the plain call and nothing is recorded; counters return at once.
+#
+#     from virialProfile import profiler
+#     profiler.enable()
+#     ... load, fit, export ...
+#     profiler.saveJson('profile.json')
+#     profiler.saveChromeTrace('trace.json')     # for chrome://tracing or Perfetto
+#
+# Every process records on its own; a worker can hand profiler.data() back to its parent,
+# which adds it with profiler.merge(). The pools of the database code (mcmcFit,
+# propagateBands, renderPlots, the B3 table builder) map their tasks with profileMap,
+# which does this for every task while profiling is on.
+#
+# Usage: python virialProfile.py [--output profile.json] [--trace trace.json]
+# profiles loading, exporting and evaluating the whole database and prints the stages
+
+# Headers for Python
+import argparse
+import functools
+import io
+import json
+import os
+import threading
+import time
+
+# timed calls kept for the trace; later calls still add to the stage totals
+profileMaxEvents = 1000000
+
+class ProfileStage(object):
+    # context manager timing one block as a stage of a profiler
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.profiler.record(self.name, self.start, time.time() - self.start, self.args)
+        return False
+
+class ProfileNoStage(object):
+    # what Profiler.stage hands out while profiling is off
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+profileNoStage = ProfileNoStage()
+
+class Profiler(object):
+    # stages: stage name -> [calls, seconds, fastest, slowest], times inclusive of any
+    #   stages timed inside
+    # counters: counter name -> total
+    # events: (name, start [s since the epoch], duration [s], pid, thread, args) of every
+    #   timed call, for the trace; at most maxEvents are kept, the rest are only counted
+    #   in dropped
+    def __init__(self, maxEvents=profileMaxEvents):
+        self.enabled = False
+        self.maxEvents = maxEvents
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        # forget everything recorded so far (profiling stays on or off)
+        self.stages = {}
+        self.counters = {}
+        self.events = []
+        self.dropped = 0
+
+    def record(self, name, start, duration, args=None):
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [1, duration, duration, duration]
+        else:
+            stage[0] += 1
+            stage[1] += duration
+            stage[2] = min(stage[2], duration)
+            stage[3] = max(stage[3], duration)
+        if (len(self.events) < self.maxEvents):
+            self.events.append((name, start, duration, os.getpid(), threading.current_thread().ident, args or None))
+        else:
+            self.dropped += 1
+
+    def count(self, name, number=1):
+        # add number to a counter, e.g. count('Bcalc Inf integrand', T.size*grid.size)
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + number
+
+    def stage(self, name, **args):
+        # a context manager timing its block as the stage name, e.g.
+        #     with profiler.stage('exec entries', species='CO2'): ...
+        # the keyword arguments are shown with the call in the trace
+        if not self.enabled:
+            return profileNoStage
+        return ProfileStage(self, name, args)
+
+    def report(self):
+        # the stage totals and counters as a dict ready to be written as JSON; seconds
+        # are the total over all calls, mean/fastest/slowest are per call
+        stages = {}
+        for name, (calls, seconds, fastest, slowest) in self.stages.items():
+            stages[name] = {'calls': calls, 'seconds': seconds, 'mean': seconds/calls, \
+                'fastest': fastest, 'slowest': slowest}
+        return {'stages': stages, 'counters': dict(self.counters), 'events': len(self.events), \
+            'dropped': self.dropped}
+
+    def data(self):
+        # everything recorded, as plain lists and dicts that can be pickled or written as
+        # JSON, e.g. to send from a worker process to profiler.merge in its parent
+        return {'stages': dict((name, list(stage)) for name, stage in self.stages.items()), \
+            'counters': dict(self.counters), 'events': [list(event) for event in self.events], \
+            'dropped': self.dropped}
+
+    def merge(self, data):
+        # add what another profiler recorded (its data()) to this one
+        for name, (calls, seconds, fastest, slowest) in data['stages'].items():
+            stage = self.stages.get(name)
+            if stage is None:
+                self.stages[name] = [calls, seconds, fastest, slowest]
+            else:
+                self.stages[name] = [stage[0] + calls, stage[1] + seconds, min(stage[2], fastest), max(stage[3], slowest)]
+        for name, number in data['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + number
+        room = max(0, self.maxEvents - len(self.events))
+        self.events.extend([tuple(event) for event in data['events'][:room]])
+        self.dropped += data['dropped'] + max(0, len(data['events']) - room)
+
+    def chromeTrace(self):
+        # the recorded calls in the Chrome trace event format: one complete ('X') event
+        # per timed call, times in microseconds from the first call, and the counter
+        # totals as counter ('C') events at the end
+        origin = min([event[1] for event in self.events]) if self.events else time.time()
+        end = max([event[1] + event[2] for event in self.events]) if self.events else origin
+        traceEvents = []
+        for name, start, duration, pid, thread, args in self.events:
+            event = {'name': name, 'cat': name.split(' ')[0], 'ph': 'X', 'ts': 1.0E6*(start - origin), \
+                'dur': 1.0E6*duration, 'pid': pid, 'tid': thread}
+            if args:
+                event['args'] = args
+            traceEvents.append(event)
+        for name in sorted(self.counters):
+            traceEvents.append({'name': name, 'ph': 'C', 'ts': 1.0E6*(end - origin), 'pid': os.getpid(), \
+                'args': {'total': self.counters[name]}})
+        return {'traceEvents': traceEvents, 'displayTimeUnit': 'ms'}
+
+    def saveJson(self, path):
+        with io.open(path, 'w', encoding='utf-8') as profileFile:
+            profileFile.write(json.dumps(self.report(), indent=1, sort_keys=True))
+
+    def saveChromeTrace(self, path):
+        with io.open(path, 'w', encoding='utf-8') as traceFile:
+            traceFile.write(json.dumps(self.chromeTrace(), default=str))
+
+    def summary(self):
+        # the stages, slowest total first, and the counters as lines of text
+        lines = ['%-36s %8s %12s %12s' % ('stage', 'calls', 'total [s]', 'mean [s]')]
+        for name, (calls, seconds, fastest, slowest) in sorted(self.stages.items(), key=lambda item: -item[1][1]):
+            lines.append('%-36s %8d %12.6g %12.6g' % (name, calls, seconds, seconds/calls))
+        if self.counters:
+            lines.append('')
+            lines.append('%-36s %21s' % ('counter', 'total'))
+            for name in sorted(self.counters):
+                lines.append('%-36s %21d' % (name, self.counters[name]))
+        return '\n'.join(lines)
+
+# the profiler every hook of the database code records into
+profiler = Profiler()
+
+def profiled(name, suffix=None):
+    # Decorator timing every call of a function as the stage name while profiling is on
+    # suffix names an argument of the function whose value is added to the stage name,
+    # e.g. profiled('Bcalc', suffix='calcMethod') times every calcMethod on its own
+    def decorate(function):
+        position = None if suffix is None else function.__code__.co_varnames.index(suffix)
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            stageName = name
+            if suffix is not None:
+                if suffix in kwargs:
+                    stageName = name + ' ' + str(kwargs[suffix])
+                elif (len(args) > position):
+                    stageName = name + ' ' + str(args[position])
+            start = time.time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.record(stageName, start, time.time() - start)
+        return timed
+    return decorate
+
+def profileTask(arguments):
+    # Run one task of profileMap in a worker of a pool; arguments is the tuple
+    # (function, argument). Profiling is switched on here, with whatever the worker
+    # recorded before (or inherited from its parent) dropped, and the result is returned
+    # with what the task recorded, as (result, profiler.data()).
+    function, argument = arguments
+    profiler.reset()
+    profiler.enable()
+    result = function(argument)
+    return result, profiler.data()
+
+def profileMap(pool, function, arguments, chunksize=None, lazy=False):
+    # pool.map(function, arguments), or pool.imap with lazy=True, for a function defined
+    # at the top level of a module; while profiling is on here, every task brings back
+    # what it recorded in its worker (profileTask), which is merged into profiler as the
+    # results come in, so the time spent in the pool shows up in the stages and the trace
+    if not profiler.enabled:
+        if lazy:
+            return pool.imap(function, arguments, chunksize or 1)
+        return pool.map(function, arguments, chunksize)
+    results = pool.imap(profileTask, [(function, argument) for argument in arguments], chunksize or 1)
+
+    def merged():
+        for result, data in results:
+            profiler.merge(data)
+            yield result
+    if lazy:
+        return merged()
+    return list(merged())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Profile loading, exporting and evaluating the virial coefficient database.')
+    parser.add_argument('--output', default=None, help='write the stage totals and counters as JSON to this file')
+    parser.add_argument('--trace', default=None, help='write a Chrome trace to this file')
+    arguments = parser.parse_args()
+    import shutil
+    import tempfile
+    # run as a script this file is __main__; the hooks record into the imported module
+    from virialProfile import profiler
+    profiler.enable()
+    with profiler.stage('import'):
+        from virialStore import databaseSpecies, load
+        from virialExport import exportSpecies
+        from virialParameters import parameterRegistry
+        from virialFit import lsqFit
+    with profiler.stage('load all species'):
+        store = load(databaseSpecies())
+    directory = tempfile.mkdtemp()
+    try:
+        exportSpecies(store, directory, 'allvirialData.txt')
+    finally:
+        shutil.rmtree(directory)
+    for calcMethod in ('Inf', 'Quad', 'Table', 'Series'):
+        with profiler.stage('registry curves', calcMethod=calcMethod):
+            parameterRegistry.evaluate(dict((name, store.speciesData(name)[0]) for name in store.speciesNames), \
+                calcMethod=calcMethod)
+    for name in store.speciesNames:
+        lsqFit(name)
+    profiler.disable()
+    print(profiler.summary())
+    if arguments.output is not None:
+        profiler.saveJson(arguments.output)
+    if arguments.trace is not None:
+        profiler.saveChromeTrace(arguments.trace)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+# Temperature-range queries on a VirialStore, e.g. all CO2 points between 300 and 400 K
+# with Berr < 5:
+#     TemperatureIndex.fromStore(store).query('CO2', 300.0, 400.0).where(BerrMax=5.0).data()
+# The points of every species are sorted by temperature once, into columns of their own,
+# with the permutation back to the store. A temperature range is then two searchsorted
+# calls and a slice of those columns. Further filters (uncertainty, data class, reference)
+# only build a mask over the points in the range; the columns are not copied until the
+# filtered points are asked for.
+
+# Headers for Python
+import numpy as np
+
+class TemperatureIndex(object):
+    # Columns, one entry per point, species after species in store order and sorted by T
+    # within every species (points with the same T keep their store order):
+    #   T, B, Berr                      as in the store
+    #   datasetCode, referenceCode, classCode   codes as in the store
+    #   order                           position of the point in the store columns
+    # speciesOffsets: points of species s are speciesOffsets[s]:speciesOffsets[s+1]
+    def __init__(self, store):
+        self.store = store
+        self.order = np.lexsort((store.T, store.speciesCode))
+        for column in ('T', 'B', 'Berr', 'datasetCode', 'referenceCode', 'classCode'):
+            setattr(self, column, np.ascontiguousarray(getattr(store, column)[self.order]))
+        self.speciesOffsets = np.asarray(store.datasetOffsets)[np.asarray(store.speciesOffsets)]
+
+    @classmethod
+    def fromStore(cls, store):
+        return cls(store)
+
+    def speciesSlice(self, name):
+        # slice of the sorted columns holding every point of a species
+        code = self.store.speciesIndex(name)
+        return slice(int(self.speciesOffsets[code]), int(self.speciesOffsets[code+1]))
+
+    def query(self, species, Tmin=None, Tmax=None):
+        # the points of a species with Tmin <= T <= Tmax [K] (either bound may be None)
+        points = self.speciesSlice(species)
+        T = self.T[points]
+        start = 0 if Tmin is None else int(np.searchsorted(T, Tmin, side='left'))
+        end = T.size if Tmax is None else int(np.searchsorted(T, Tmax, side='right'))
+        return Query(self, slice(points.start + start, points.start + max(start, end)))
+
+class Query(object):
+    # A set of points of one TemperatureIndex: the slice points of its sorted columns and,
+    # once a filter has been applied, a boolean mask over that slice
+    def __init__(self, index, points, mask=None):
+        self.index = index
+        self.points = points
+        self.mask = mask
+
+    def __len__(self):
+        if self.mask is None:
+            return self.points.stop - self.points.start
+        return int(np.count_nonzero(self.mask))
+
+    def where(self, BerrMax=None, BerrMin=None, dataClass=None, reference=None, refID=None):
+        # a new Query with only the points that also pass the given filters:
+        # Berr below BerrMax and/or above BerrMin [cm^3/mol], data class (e.g. 'class I'),
+        # reference text or reference ID (a DOI, URL, ...); each of the last three may
+        # also be a list of accepted values
+        index = self.index
+        store = index.store
+        mask = np.ones(self.points.stop - self.points.start, dtype=bool) if self.mask is None else self.mask.copy()
+        if BerrMax is not None:
+            mask &= (index.Berr[self.points] < BerrMax)
+        if BerrMin is not None:
+            mask &= (index.Berr[self.points] > BerrMin)
+        if dataClass is not None:
+            mask &= np.isin(index.classCode[self.points], queryCodes(store.classNames, dataClass))
+        if reference is not None:
+            mask &= np.isin(index.referenceCode[self.points], queryCodes(store.references, reference))
+        if refID is not None:
+            mask &= np.isin(index.referenceCode[self.points], queryCodes(store.referenceIDs, refID))
+        return Query(index, self.points, mask)
+
+    def column(self, name):
+        # one column of the points ('T', 'B', 'Berr', 'datasetCode', 'referenceCode',
+        # 'classCode'), sorted by T: a view while no filter has been applied
+        values = getattr(self.index, name)[self.points]
+        if self.mask is None:
+            return values
+        return values[self.mask]
+
+    def data(self):
+        # (T, B, Berr) of the points, sorted by T
+        return self.column('T'), self.column('B'), self.column('Berr')
+
+    def positions(self):
+        # positions of the points in the columns of the store
+        return self.column('order')
+
+    def datasets(self):
+        # the datasets the points come from
+        return np.unique(self.column('datasetCode'))
+
+def queryCodes(names, accepted):
+    # codes of the entries of names equal to accepted (a value or a list of values)
+    if not isinstance(accepted, (list, tuple, set)):
+        accepted = [accepted]
+    return [code for code, name in enumerate(names) if name in accepted]
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+
+# Columnar in-memory store for the virial coefficient database
+# All data points live in three contiguous float64 columns (T, B, Berr), with integer
+# codes for species, reference, data class and dataset. Datasets of the same species are
+# kept next to each other, so the data of one species, or of one dataset, is a slice of
+# the columns and can be handed out as a view without copying anything.
+
+# Headers for Python
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import numpy as np
+from virialFunctions import BerrCalc
+from virialProfile import profiled, profiler
+
+# the database source, and the lists each of its dataset entries appends to
+databasePath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'databaseExp.py')
+databaseLists = ('speciesName', 'dataRef', 'dataRefID', 'dataClass', 'dataT', 'dataB', 'dataBerr')
+# a dataset entry starts with either speciesName = ["CH4"] or speciesName.append("CH4")
+databaseEntryStart = re.compile(r'^speciesName(?:\.append\(| = \[)"([^"]+)"')
+# the comment above an entry giving its index in the compilation it was taken from, e.g.
+# "# original index in 2002 compilation: 91-lop/roz"; entries that name no year come
+# before the 2002 data of their species and are numbered like the 1980 compilation
+databaseCompilationComment = re.compile(r'^#\s*original index in (?:(\d{4}) )?compilation:\s*(.*?)\s*$')
+databaseDefaultCompilation = '1980'
+
+# binary snapshot of the whole store (see buildSnapshot): a directory of .npy columns,
+# which workers memory-map, and a manifest with the format version, the checksum of
+# the database source it was built from and the string tables
+snapshotPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'virialSnapshot')
+snapshotVersion = 2
+snapshotColumns = ('T', 'B', 'Berr', 'datasetOffsets', 'datasetSpecies', 'datasetReference', 'datasetClass', \
+    'datasetSource', 'datasetCompilation', 'datasetCode', 'speciesCode', 'referenceCode', 'classCode')
+
+# source blocks of the database, and the lists of every species loaded so far, both
+# keyed on the path, modification time and size of the source (see databaseStamp)
+databaseBlockCache = {}
+loadedSpecies = {}
+
+class VirialStore(object):
+    # Columns, one entry per data point:
+    #   T, B, Berr             temperature [K], B and its uncertainty [cm^3/mol]
+    #   speciesCode            index into speciesNames
+    #   referenceCode          index into references / referenceIDs
+    #   classCode              index into classNames
+    #   datasetCode            index of the dataset the point belongs to
+    # Per dataset (in store order):
+    #   datasetOffsets         points of dataset k are datasetOffsets[k]:datasetOffsets[k+1]
+    #   datasetSpecies, datasetReference, datasetClass   codes as above
+    #   datasetSource          position of the dataset in the lists it was built from
+    #   datasetCompilation     index into compilations, the (year, index) of the dataset in
+    #                          the compilation it was taken from ('' where unknown)
+    # Per species:
+    #   speciesOffsets         datasets of species s are speciesOffsets[s]:speciesOffsets[s+1]
+    # pointCodes optionally gives (datasetCode, speciesCode, referenceCode, classCode)
+    # ready-made, e.g. memory-mapped from a snapshot, instead of expanding them here
+    def __init__(self, T, B, Berr, datasetOffsets, datasetSpecies, datasetReference, datasetClass, \
+        datasetSource, speciesNames, references, referenceIDs, classNames, pointCodes=None, \
+        datasetCompilation=None, compilations=None):
+        self.T = np.ascontiguousarray(T, dtype=np.float64)
+        self.B = np.ascontiguousarray(B, dtype=np.float64)
+        self.Berr = np.ascontiguousarray(Berr, dtype=np.float64)
+        self.datasetOffsets = np.asarray(datasetOffsets, dtype=np.int64)
+        self.datasetSpecies = np.asarray(datasetSpecies, dtype=np.int32)
+        self.datasetReference = np.asarray(datasetReference, dtype=np.int32)
+        self.datasetClass = np.asarray(datasetClass, dtype=np.int32)
+        self.datasetSource = np.asarray(datasetSource, dtype=np.int64)
+        self.speciesNames = list(speciesNames)
+        self.references = list(references)
+        self.referenceIDs = list(referenceIDs)
+        self.classNames = list(classNames)
+        if datasetCompilation is None:
+            datasetCompilation = np.zeros(self.datasetSpecies.size)
+            compilations = [('', '')]
+        self.datasetCompilation = np.asarray(datasetCompilation, dtype=np.int32)
+        self.compilations = [tuple(compilation) for compilation in compilations]
+
+        if np.any(np.diff(self.datasetSpecies) < 0):
+            raise ValueError('datasets must be grouped by species code')
+        self.speciesOffsets = np.searchsorted(self.datasetSpecies, np.arange(len(self.speciesNames) + 1))
+        self.speciesLookup = dict((name, code) for code, name in enumerate(self.speciesNames))
+
+        # per point codes, expanded from the per dataset codes
+        if pointCodes is None:
+            datasetLengths = np.diff(self.datasetOffsets)
+            datasetCode = np.repeat(np.arange(datasetLengths.size, dtype=np.int32), datasetLengths)
+            pointCodes = (datasetCode, self.datasetSpecies[datasetCode], self.datasetReference[datasetCode], \
+                self.datasetClass[datasetCode])
+        self.datasetCode, self.speciesCode, self.referenceCode, self.classCode = pointCodes
+
+    @classmethod
+    @profiled('VirialStore.fromLists')
+    def fromLists(cls, speciesName, dataRef, dataRefID, dataClass, dataT, dataB, dataBerr, compilation=None):
+        # Build the store from the parallel lists assembled by databaseExp.py
+        # Species are coded in order of first appearance, and datasets are (stably)
+        # grouped by species; datasetSource keeps their original positions
+        # compilation optionally gives the (year, index) in its compilation of every dataset
+        speciesNames = []
+        speciesLookup = {}
+        for name in speciesName:
+            if name not in speciesLookup:
+                speciesLookup[name] = len(speciesNames)
+                speciesNames.append(name)
+        references = []
+        referenceIDs = []
+        referenceLookup = {}
+        for ref, refID in zip(dataRef, dataRefID):
+            if (ref, refID) not in referenceLookup:
+                referenceLookup[(ref, refID)] = len(references)
+                references.append(ref)
+                referenceIDs.append(refID)
+        classNames = sorted(set(dataClass))
+        classLookup = dict((name, code) for code, name in enumerate(classNames))
+        if compilation is None:
+            compilation = [('', '')]*len(speciesName)
+        compilations = sorted(set(compilation))
+        compilationLookup = dict((key, code) for code, key in enumerate(compilations))
+
+        species = np.array([speciesLookup[name] for name in speciesName], dtype=np.int32)
+        order = np.argsort(species, kind='mergesort')
+        lengths = np.array([np.size(dataT[kk]) for kk in order], dtype=np.int64)
+        datasetOffsets = np.concatenate(([0], np.cumsum(lengths)))
+        if (len(order) > 0):
+            T = np.concatenate([np.ravel(dataT[kk]) for kk in order]).astype(np.float64)
+            B = np.concatenate([np.ravel(dataB[kk]) for kk in order]).astype(np.float64)
+            Berr = np.concatenate([np.ravel(dataBerr[kk]) for kk in order]).astype(np.float64)
+        else:
+            T = np.zeros(0)
+            B = np.zeros(0)
+            Berr = np.zeros(0)
+        return cls(T, B, Berr, datasetOffsets, species[order], \
+            [referenceLookup[(dataRef[kk], dataRefID[kk])] for kk in order], \
+            [classLookup[dataClass[kk]] for kk in order], order, \
+            speciesNames, references, referenceIDs, classNames, \
+            datasetCompilation=[compilationLookup[compilation[kk]] for kk in order], compilations=compilations)
+
+    def __len__(self):
+        return self.T.size
+
+    def nDatasets(self):
+        return self.datasetSpecies.size
+
+    def speciesIndex(self, name):
+        if name not in self.speciesLookup:
+            raise KeyError('no data for species ' + repr(name))
+        return self.speciesLookup[name]
+
+    def speciesSlice(self, name):
+        # slice of the point columns holding every point of a species
+        code = self.speciesIndex(name)
+        return slice(int(self.datasetOffsets[self.speciesOffsets[code]]), \
+            int(self.datasetOffsets[self.speciesOffsets[code+1]]))
+
+    def speciesData(self, name):
+        # (T, B, Berr) of a species as views of the store columns
+        points = self.speciesSlice(name)
+        return self.T[points], self.B[points], self.Berr[points]
+
+    def speciesDatasets(self, name):
+        # indices of the datasets of a species
+        code = self.speciesIndex(name)
+        return range(int(self.speciesOffsets[code]), int(self.speciesOffsets[code+1]))
+
+    def datasetSlice(self, k):
+        return slice(int(self.datasetOffsets[k]), int(self.datasetOffsets[k+1]))
+
+    def dataset(self, k):
+        # (T, B, Berr) of dataset k as views of the store columns
+        points = self.datasetSlice(k)
+        return self.T[points], self.B[points], self.Berr[points]
+
+    def datasetInfo(self, k):
+        # species, reference, reference ID, data class and compilation year and index of dataset k
+        return {'species': self.speciesNames[self.datasetSpecies[k]], \
+            'ref': self.references[self.datasetReference[k]], \
+            'refID': self.referenceIDs[self.datasetReference[k]], \
+            'dataClass': self.classNames[self.datasetClass[k]], \
+            'compilationYear': self.compilations[self.datasetCompilation[k]][0], \
+            'compilationIndex': self.compilations[self.datasetCompilation[k]][1]}
+
+def databaseStamp(path=databasePath):
+    # (absolute path, modification time, size) of the database source; the caches of
+    # this module are only used while the stamp of their source is unchanged
+    stamp = os.stat(path)
+    return (os.path.abspath(path), stamp.st_mtime, stamp.st_size)
+
+@profiled('databaseBlocks')
+def databaseBlocks(path=databasePath, cache=True):
+    # Split the database source into its dataset entries without executing it
+    # Returns a list of dicts, one per entry in file order, with the species, the
+    # source of the statements, the comment lines just above it, its first line number
+    # and its 'compilation' (year, index), parsed from those comments. The scan is a
+    # single pass over the text, and is redone only when the file changes (or always,
+    # without touching the cache, with cache=False).
+    key = databaseStamp(path)
+    if cache and (key in databaseBlockCache):
+        return databaseBlockCache[key]
+    with io.open(path, encoding='utf-8') as databaseFile:
+        lines = databaseFile.read().split('\n')
+    # comment and blank lines are held back until the next statement shows whether
+    # they are inside an entry or above the next one
+    blocks = []
+    pending = []
+    current = None
+    for lineNumber, line in enumerate(lines):
+        match = databaseEntryStart.match(line)
+        if match:
+            current = {'species': match.group(1), 'lines': [line], 'firstLine': lineNumber + 1, \
+                'comments': [comment for comment in pending if comment.startswith('#')]}
+            blocks.append(current)
+            pending = []
+        elif (not line.strip()) or line.startswith('#'):
+            pending.append(line)
+        elif (current is not None) and (line.startswith(databaseLists) or line.startswith((' ', '\t'))):
+            current['lines'].extend(pending)
+            current['lines'].append(line)
+            pending = []
+        else:
+            # any other top-level statement ends the data entries in progress
+            current = None
+            pending = []
+    for block in blocks:
+        block['source'] = '\n'.join(block.pop('lines')) + '\n'
+        block['compilation'] = ('', '')
+        for comment in block['comments']:
+            match = databaseCompilationComment.match(comment)
+            if match:
+                block['compilation'] = (match.group(1) or databaseDefaultCompilation, match.group(2))
+    if cache:
+        databaseBlockCache.clear()
+        databaseBlockCache[key] = blocks
+    return blocks
+
+def blockLists(blocks, path=databasePath):
+    # Execute the dataset entries blocks (from databaseBlocks) of the source at path and
+    # return their seven lists (speciesName, dataRef, dataRefID, dataClass, dataT, dataB,
+    # dataBerr) as a dict, along with the 'compilation' (year, index) of every entry
+    lists = dict((name, []) for name in databaseLists + ('compilation',))
+    for block in blocks:
+        # every entry runs in a namespace of its own, so dataB[-1] (or dataB[0] in the
+        # first entry of the file) refers to the entry's own data
+        namespace = dict((name, []) for name in databaseLists)
+        namespace['np'] = np
+        namespace['BerrCalc'] = BerrCalc
+        with profiler.stage('exec entry', species=block['species'], line=block['firstLine']):
+            exec(compile(block['source'], path + ':' + str(block['firstLine']), 'exec'), namespace)
+        for name in databaseLists:
+            if (len(namespace[name]) != 1):
+                raise ValueError('dataset entry at ' + path + ':' + str(block['firstLine']) + \
+                    ' does not add exactly one ' + name)
+            lists[name].append(namespace[name][0])
+        lists['compilation'].append(block['compilation'])
+    return lists
+
+@profiled('loadLists')
+def loadLists(species, path=databasePath):
+    # Execute only the dataset entries of one species and return its seven lists
+    # (speciesName, dataRef, dataRefID, dataClass, dataT, dataB, dataBerr) as a dict,
+    # along with the 'compilation' (year, index) of every entry;
+    # the result is cached, so later calls for the same species cost nothing until the
+    # source changes
+    stamp = databaseStamp(path)
+    key = stamp + (species,)
+    if key in loadedSpecies:
+        return loadedSpecies[key]
+    lists = blockLists([block for block in databaseBlocks(path) if (block['species'] == species)], path)
+    if not lists['speciesName']:
+        raise KeyError('no data for species ' + repr(species))
+    # lists loaded from an earlier version of the same source are dropped
+    for stale in [loaded for loaded in loadedSpecies if (loaded[0] == stamp[0]) and (loaded[:3] != stamp)]:
+        del loadedSpecies[stale]
+    loadedSpecies[key] = lists
+    return lists
+
+def load(species, path=databasePath):
+    # Lazily load one species (or a list of species) into a VirialStore, executing only
+    # their entries of databaseExp.py; e.g. load("CO2")
+    if isinstance(species, str):
+        species = [species]
+    combined = dict((name, []) for name in databaseLists + ('compilation',))
+    for name in species:
+        lists = loadLists(name, path)
+        for listName in databaseLists + ('compilation',):
+            combined[listName].extend(lists[listName])
+    return VirialStore.fromLists(*[combined[name] for name in databaseLists], compilation=combined['compilation'])
+
+def databaseSpecies(path=databasePath):
+    # every species in the database source, in order of first appearance
+    speciesNames = []
+    for block in databaseBlocks(path):
+        if block['species'] not in speciesNames:
+            speciesNames.append(block['species'])
+    return speciesNames
+
+def databaseChecksum(path=databasePath):
+    # SHA-256 of the database source, used to tell whether a snapshot is stale
+    with open(path, 'rb') as databaseFile:
+        return hashlib.sha256(databaseFile.read()).hexdigest()
+
+@profiled('buildSnapshot')
+def buildSnapshot(path=snapshotPath, source=databasePath):
+    # Serialize the complete store into a snapshot directory at path
+    # The source is hashed first and then read afresh, bypassing the caches of this
+    # module, so the checksum in the manifest is never newer than the data: a source
+    # edited while the snapshot is built makes the snapshot stale, not wrong.
+    # The new snapshot is written next to the old one and swapped in at the end, so
+    # workers never see a half-written snapshot
+    if source is None:
+        raise ValueError('buildSnapshot needs the database source, got source=None')
+    checksum = databaseChecksum(source)
+    blocks = databaseBlocks(source, cache=False)
+    # datasets grouped by species in order of first appearance, as load() puts them
+    speciesNames = []
+    for block in blocks:
+        if block['species'] not in speciesNames:
+            speciesNames.append(block['species'])
+    lists = blockLists([block for name in speciesNames for block in blocks if (block['species'] == name)], source)
+    store = VirialStore.fromLists(*[lists[name] for name in databaseLists], compilation=lists['compilation'])
+    building = path + '.building'
+    if os.path.isdir(building):
+        shutil.rmtree(building)
+    os.makedirs(building)
+    for column in snapshotColumns:
+        np.save(os.path.join(building, column + '.npy'), np.ascontiguousarray(getattr(store, column)))
+    manifest = {'version': snapshotVersion, 'checksum': checksum, \
+        'speciesNames': store.speciesNames, 'references': store.references, \
+        'referenceIDs': store.referenceIDs, 'classNames': store.classNames, 'compilations': store.compilations}
+    with io.open(os.path.join(building, 'manifest.json'), 'w', encoding='utf-8') as manifestFile:
+        manifestFile.write(json.dumps(manifest, ensure_ascii=False, indent=1))
+    if os.path.isdir(path):
+        retired = path + '.old'
+        if os.path.isdir(retired):
+            shutil.rmtree(retired)
+        os.rename(path, retired)
+        os.rename(building, path)
+        shutil.rmtree(retired)
+    else:
+        os.rename(building, path)
+    return path
+
+@profiled('loadSnapshot')
+def loadSnapshot(path=snapshotPath, source=databasePath, mmapMode='r', rebuild=False):
+    # Load the store from a snapshot, memory-mapping its columns so that processes on
+    # the same machine share the pages; the cost does not depend on the size of the data
+    # The snapshot is checked against the version of this module and against the
+    # checksum of the database source (pass source=None to skip that check). A missing,
+    # old or stale snapshot raises ValueError, or is rebuilt first if rebuild is True,
+    # which needs the source.
+    if rebuild and (source is None):
+        raise ValueError('loadSnapshot cannot rebuild without the database source, got source=None')
+    manifestPath = os.path.join(path, 'manifest.json')
+    problem = None
+    if not os.path.isfile(manifestPath):
+        problem = 'no snapshot at ' + path
+    else:
+        with io.open(manifestPath, encoding='utf-8') as manifestFile:
+            manifest = json.loads(manifestFile.read())
+        if (manifest['version'] != snapshotVersion):
+            problem = 'snapshot at ' + path + ' has version ' + str(manifest['version']) + \
+                ', expected ' + str(snapshotVersion)
+        elif (source is not None) and (manifest['checksum'] != databaseChecksum(source)):
+            problem = 'snapshot at ' + path + ' is stale: ' + source + ' has changed since it was built'
+    if problem is not None:
+        if not rebuild:
+            raise ValueError(problem + ' (run buildSnapshot)')
+        buildSnapshot(path, source)
+        return loadSnapshot(path, source, mmapMode, rebuild=False)
+    columns = dict((column, np.load(os.path.join(path, column + '.npy'), mmap_mode=mmapMode)) \
+        for column in snapshotColumns)
+    return VirialStore(columns['T'], columns['B'], columns['Berr'], columns['datasetOffsets'], \
+        columns['datasetSpecies'], columns['datasetReference'], columns['datasetClass'], \
+        columns['datasetSource'], manifest['speciesNames'], manifest['references'], \
+        manifest['referenceIDs'], manifest['classNames'], \
+        pointCodes=(columns['datasetCode'], columns['speciesCode'], columns['referenceCode'], columns['classCode']), \
+        datasetCompilation=columns['datasetCompilation'], compilations=manifest['compilations'])
+
+if __name__ == '__main__':
+    # build step: python virialStore.py writes the snapshot next to databaseExp.py
+    print('snapshot written to ' + buildSnapshot())
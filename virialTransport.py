@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+# Reading and writing of CHEMKIN transport files (tran.dat)
+# Every entry of a transport file is one line: the species name followed by the
+# geometry index (0 atom, 1 linear, 2 nonlinear molecule), the Lennard-Jones well depth
+# epsilon/k_B [K], the collision diameter sigma [Angstroms], the dipole moment mu
+# [Debyes], the polarizability alpha [Angstroms^3] and the rotational relaxation
+# collision number Z_rot at 298 K. Anything after a '!' is a comment.
+# Files are read one line at a time, so mechanisms of any size are never held in memory
+# as a whole; entries are evaluated with BcalcBatch a chunk at a time.
+#
+# Usage: python virialTransport.py tran.dat [--write updated.dat]
+# lists the entries of the database species next to the parameters fitted to their data
+# (lsqFit, with the dipole moment of the entry, so polar species are fitted as
+# Stockmayer fluids), and with --write writes the file with those parameters put in
+
+# Headers for Python
+import argparse
+import io
+import os
+import numpy as np
+from virialFunctions import BcalcBatch
+
+# the fields of a transport entry after the species name, in file order
+transportFields = ('geometry', 'epsilon', 'sigma', 'mu', 'alpha', 'zrot')
+# keyword lines that may frame the entries of a transport file
+transportKeywords = ('TRANSPORT', 'TRAN', 'END')
+# entries evaluated by one BcalcBatch call
+transportChunk = 4096
+# decimals the well depth and collision diameter are written with
+transportDecimals = 3
+
+def transportParse(line, lineNumber=None):
+    # the entry on one line of a transport file as a dict (name, the transportFields,
+    # comment), or None for blank, comment and keyword lines
+    data, bang, comment = line.partition('!')
+    tokens = data.split()
+    if (not tokens) or (tokens[0].upper() in transportKeywords):
+        return None
+    if (len(tokens) < 1 + len(transportFields)):
+        raise ValueError('transport entry ' + ('' if lineNumber is None else 'on line ' + str(lineNumber) + ' ') + \
+            'has ' + str(len(tokens) - 1) + ' fields, expected ' + str(len(transportFields)) + ': ' + line.rstrip())
+    entry = {'name': tokens[0], 'comment': comment.strip()}
+    try:
+        entry['geometry'] = int(float(tokens[1]))
+        for field, token in zip(transportFields[1:], tokens[2:]):
+            entry[field] = float(token)
+    except ValueError:
+        raise ValueError('transport entry ' + ('' if lineNumber is None else 'on line ' + str(lineNumber) + ' ') + \
+            'has a field that is not a number: ' + line.rstrip())
+    return entry
+
+def transportLines(path):
+    # every line of a transport file with its entry (None for other lines), one at a time
+    with io.open(path, encoding='utf-8', errors='replace', newline='') as transportFile:
+        for lineNumber, line in enumerate(transportFile):
+            yield line, transportParse(line, lineNumber + 1)
+
+def transportEntries(path):
+    # the entries of a transport file, one at a time
+    for line, entry in transportLines(path):
+        if entry is not None:
+            yield entry
+
+def transportSpeciesMap(speciesNames=None):
+    # map from the upper-case names mechanisms use (e.g. AR) to the species of the
+    # database (Ar); defaults to every species in databaseExp.py
+    if speciesNames is None:
+        from virialStore import databaseSpecies
+        speciesNames = databaseSpecies()
+    return dict((name.upper(), name) for name in speciesNames)
+
+def transportSpecies(path, speciesNames=None):
+    # the entries of a transport file that belong to species of the database, keyed by
+    # the database name
+    speciesMap = transportSpeciesMap(speciesNames)
+    found = {}
+    for entry in transportEntries(path):
+        name = speciesMap.get(entry['name'].upper())
+        if (name is not None) and (name not in found):
+            found[name] = entry
+    return found
+
+def transportBcalcChunks(path, T, calcMethod="Table", useDipole=False, chunkSize=transportChunk):
+    # B [cm^3/mol] at the temperatures T [K] of every entry of a transport file, as
+    # (names, B) per chunk of at most chunkSize entries, B having shape
+    # (len(names),) + T.shape; only one chunk is in memory at a time
+    # The notebook evaluates B without the dipole moment, and so does this unless
+    # useDipole is True (Stockmayer B, see BstarDipoleCalc).
+    T = np.asarray(T, dtype=float)
+    entries = []
+    for entry in transportEntries(path):
+        entries.append(entry)
+        if (len(entries) == chunkSize):
+            yield transportBcalcEntries(entries, T, calcMethod, useDipole)
+            entries = []
+    if entries:
+        yield transportBcalcEntries(entries, T, calcMethod, useDipole)
+
+def transportBcalcEntries(entries, T, calcMethod, useDipole):
+    sigma = np.array([entry['sigma'] for entry in entries])
+    epsilon = np.array([entry['epsilon'] for entry in entries])
+    mu = np.array([entry['mu'] for entry in entries]) if useDipole else 0.0
+    return [entry['name'] for entry in entries], BcalcBatch(T, sigma, epsilon, mu, calcMethod)
+
+def transportBcalc(path, T, calcMethod="Table", useDipole=False, chunkSize=transportChunk):
+    # transportBcalcChunks for the whole file: the names of all entries and their B,
+    # shape (number of entries,) + T.shape
+    names = []
+    B_chunks = []
+    for chunkNames, B_chunk in transportBcalcChunks(path, T, calcMethod, useDipole, chunkSize):
+        names.extend(chunkNames)
+        B_chunks.append(B_chunk)
+    if not B_chunks:
+        return names, np.zeros((0,) + np.shape(T))
+    return names, np.concatenate(B_chunks, axis=0)
+
+def transportReplace(line, values):
+    # line with the fields given in values (a dict from field name to number) replaced in
+    # place, right-aligned to where the old field ended, so the columns of the file stay
+    # where they were; everything else on the line is kept as it is
+    data, bang, comment = line.partition('!')
+    tokens = []
+    position = 0
+    for token in data.split():
+        start = data.index(token, position)
+        tokens.append((start, start + len(token)))
+        position = start + len(token)
+    pieces = []
+    position = 0
+    for field, value in sorted(values.items(), key=lambda item: transportFields.index(item[0])):
+        start, end = tokens[1 + transportFields.index(field)]
+        previousEnd = tokens[transportFields.index(field)][1]
+        text = '%.*f' % (transportDecimals, value)
+        width = max(end - previousEnd, len(text) + 1)
+        pieces.append(data[position:previousEnd])
+        pieces.append(text.rjust(width))
+        position = end
+    pieces.append(data[position:])
+    return ''.join(pieces) + bang + comment
+
+def writeTransport(source, destination, parameters, speciesNames=None, note=None):
+    # Copy the transport file source to destination line by line, putting in the sigma
+    # and epsilon of the database species in parameters, a dict from species name to
+    # (sigma, epsilon) or to a fit dict with 'mean' (from virialFit or the parameter
+    # registry); all other lines are copied unchanged, and mu is kept, so the parameters
+    # of a polar species should come from a fit with the mu of its entry
+    # If note is given it is added to the comment of every entry that was changed.
+    # The new file is written next to destination and renamed at the end, so source and
+    # destination may be the same file. Returns the database species that were changed.
+    speciesMap = transportSpeciesMap(speciesNames if speciesNames is not None else list(parameters))
+    writing = destination + '.writing'
+    changed = []
+    with io.open(writing, 'w', encoding='utf-8', newline='') as output:
+        for line, entry in transportLines(source):
+            name = None if entry is None else speciesMap.get(entry['name'].upper())
+            if (name is not None) and (name in parameters):
+                values = parameters[name]
+                if isinstance(values, dict):
+                    values = values['mean']
+                ending = line[len(line.rstrip('\r\n')):]
+                line = transportReplace(line.rstrip('\r\n'), {'sigma': values[0], 'epsilon': values[1]})
+                if note is not None:
+                    line = line + ('; ' if '!' in line else '    ! ') + note
+                line = line + ending
+                changed.append(name)
+            output.write(line)
+    os.rename(writing, destination)
+    return changed
+
+if __name__ == '__main__':
+    from virialFit import lsqFit
+    parser = argparse.ArgumentParser(description='Compare the entries of a CHEMKIN transport file with the virial data.')
+    parser.add_argument('path', help='transport file (tran.dat)')
+    parser.add_argument('--write', default=None, help='write the file with the fitted sigma and epsilon to this path')
+    arguments = parser.parse_args()
+    found = transportSpecies(arguments.path)
+    # the fit uses the dipole moment of the entry, which the written file keeps
+    fits = dict((name, lsqFit(name, mu=found[name]['mu'])) for name in found)
+    print('%-8s%12s%12s%12s%12s' % ('species', 'sigma', 'epsilon', 'fit sigma', 'fit epsilon'))
+    for name in sorted(found):
+        print('%-8s%12.3f%12.3f%12.3f%12.3f' % (name, found[name]['sigma'], found[name]['epsilon'], \
+            fits[name]['mean'][0], fits[name]['mean'][1]))
+    if arguments.write is not None:
+        changed = writeTransport(arguments.path, arguments.write, fits, note='sigma, epsilon fitted to virial data')
+        print('wrote ' + arguments.write + ' (' + str(len(changed)) + ' entries changed)')
